@@ -0,0 +1,60 @@
+"""
+Measures completing a value for a param with a lot of cached values, as a new carl process would, with nothing loaded:
+loading all of the param's values and searching them against ArgCache.search(), which only parses the part of the
+compacted log that matches and the lines appended since.  Run from the root of the repo with:
+
+    python -m benchmarks.arg_values [--values N] [--appended N]
+"""
+import argparse
+import os
+import tempfile
+import time
+from typing import Callable, List
+
+from curl_arguments_url import curl_arguments_url
+from curl_arguments_url.curl_arguments_url import ArgCache, ArgValuesHistory
+
+# matching all the values, a tenth, a hundredth and so on
+PREFIXES = ['', 'customer-0001', 'customer-00099', 'customer-000999', 'nothing']
+
+
+def time_search(search: Callable[[], List[str]], repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        search()
+    return (time.perf_counter() - start) / repeat
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=100000, help='Number of distinct values cached')
+    parser.add_argument('--appended', type=int, default=500, help='Number of values used since the log was compacted')
+    parser.add_argument('--backend', default='files', choices=['files', 'sqlite'])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    os.environ['CARL_CACHE_BACKEND'] = args.backend
+    os.environ['CARL_MAX_HISTORY'] = str(args.values)
+    print(f"{args.values} values, {args.appended} used since the log was compacted, per completion:")
+    print(f"{'prefix':<18}{'matches':>9}{'load all, search':>18}{'ArgCache.search()':>19}")
+    with tempfile.TemporaryDirectory() as dir_:
+        curl_arguments_url.CACHE_DIR = dir_
+        history = ArgValuesHistory(args.values)
+        for i in range(args.values):
+            history.record(f"customer-{i:08}", float(i % 97))
+        ArgCache('arg_values')['param'] = history
+        arg_cache = ArgCache('arg_values')
+        for i in range(args.appended):
+            arg_cache.append('param', f"customer-{i * 7:08}", 100.0)
+
+        for prefix in PREFIXES:
+            # a new cache each time, so nothing is loaded, like in a new process
+            matches = ArgCache('arg_values').search('param', prefix)
+            assert matches == ArgCache('arg_values')['param'].search(prefix)
+            load_elapsed = time_search(lambda: ArgCache('arg_values')['param'].search(prefix), args.repeat)
+            search_elapsed = time_search(lambda: ArgCache('arg_values').search('param', prefix), args.repeat)
+            print(f"{prefix!r:<18}{len(matches):>9}{load_elapsed * 1e3:>16.2f}ms{search_elapsed * 1e3:>17.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,63 @@
+"""
+Measures sending a lot of requests with a carl process for each (`carl URL METHOD ... --in-process`) against sending
+them all with one `carl utils batch`, to the Flask app the docker tests use, run locally.  Needs flask installed.  Run
+from the root of the repo with:
+
+    python -m benchmarks.batch [--requests N] [--concurrency N]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from benchmarks.http_executor import OPEN_API_FILE, start_flask_app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='Number of requests sent each way')
+    parser.add_argument('--concurrency', type=int, default=8, help='Requests sent at a time by the batch')
+    args = parser.parse_args()
+
+    server_url = start_flask_app()
+    with tempfile.TemporaryDirectory() as dir_:
+        open_api_dir = os.path.join(dir_, 'open_api')
+        os.makedirs(open_api_dir)
+        with open(OPEN_API_FILE) as fh:
+            spec = fh.read()
+        # so the spec's urls are the server's
+        with open(os.path.join(open_api_dir, os.path.basename(OPEN_API_FILE)), 'w') as fh:
+            fh.write(spec.replace('http://fake.com', server_url))
+        env = dict(os.environ, CARL_DIR=dir_, CARL_OPEN_API_DIR=open_api_dir,
+                   CARL_CACHE_DIR=os.path.join(dir_, 'cache'))
+        carl = [sys.executable, '-m', 'curl_arguments_url.cli']
+        url = server_url + '/posting/stuff'
+        # builds the spec caches
+        subprocess.check_call([*carl, 'utils', 'rebuild-spec-cache'], env=env)
+
+        start = time.perf_counter()
+        for i in range(args.requests):
+            subprocess.check_call([*carl, url, 'POST', '+arg_one', str(i), '+arg_two', str(i), '--in-process'],
+                                  env=env, stdout=subprocess.DEVNULL)
+        process_per_request_elapsed = time.perf_counter() - start
+
+        batch_input = ''.join(
+            json.dumps({'url': url, 'method': 'POST', 'params': {'arg_one': str(i), 'arg_two': i}}) + '\n'
+            for i in range(args.requests)
+        )
+        start = time.perf_counter()
+        batch_output = subprocess.run([*carl, 'utils', 'batch', '--concurrency', str(args.concurrency)], env=env,
+                                      input=batch_input, capture_output=True, text=True, check=True).stdout
+        batch_elapsed = time.perf_counter() - start
+        assert all(json.loads(line)['status'] == 200 for line in batch_output.splitlines())
+
+    print(f"{args.requests} requests to {server_url}")
+    print(f"a carl process each:  {process_per_request_elapsed:8.2f}s")
+    print(f"carl utils batch:     {batch_elapsed:8.2f}s  (concurrency {args.concurrency})")
+
+
+if __name__ == '__main__':
+    main()
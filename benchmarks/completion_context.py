@@ -0,0 +1,73 @@
+"""
+Measures working out what is being completed on long command lines (a param with hundreds of values), with the
+single-pass line_to_words() and get_completion_context() against the shlex and argparse parsing they replaced.  Run from
+the root of the repo with:
+
+    python -m benchmarks.completion_context [--values N]
+"""
+import argparse
+import shlex
+import timeit
+from typing import List, Optional
+
+from curl_arguments_url.cli import line_to_words
+from curl_arguments_url.curl_arguments_url import CarlParam, CarlParamReference, add_generic_args, \
+    get_completion_context
+
+
+def shlex_line_to_words(line: str) -> List[str]:
+    """ The previous line_to_words(), which could split the line up to three times """
+    line_ = line[:-1] if line[-1] == '\\' else line
+    for suffix in ('', "'", '"'):
+        try:
+            return shlex.split(line_ + suffix)
+        except ValueError:
+            pass
+    return shlex.split(line)
+
+
+def argparse_param_ref(words: List[str]) -> Optional[CarlParamReference]:
+    """ How the param being completed was found before get_completion_context() """
+    arg_parser = argparse.ArgumentParser(add_help=False)
+    arg_parser = add_generic_args(arg_parser)
+    arg_parser.add_argument('--help', '-h')
+    _, remaining_args = arg_parser.parse_known_args(words[:-1])
+    remaining_args.append(words[-1])
+
+    if len(remaining_args) <= 1 or remaining_args[-1].startswith('+'):
+        return None
+    elif len(remaining_args) >= 3 and remaining_args[-1].startswith('-') and remaining_args[-3].startswith('+'):
+        return None
+    else:
+        for arg in reversed(remaining_args[:-1]):
+            if arg.startswith('+'):
+                return CarlParam.param_ref_from_arg_name(arg)
+        return None
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=500, help='Number of values for the param on the line')
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--number', type=int, default=100)
+    args = parser.parse_args()
+
+    values = ' '.join(f"'value {i}'" for i in range(args.values))
+    # an open quote, which made the shlex version split the line more than once
+    line = f"carl fake.com/things POST -p +ids {values} -R +names \"nam"
+    words = line_to_words(line)
+    assert words == shlex_line_to_words(line)
+    assert get_completion_context(words[3:]).param_ref == argparse_param_ref(words[3:])
+
+    def time_it(func, arg) -> float:  # type: ignore
+        return min(timeit.repeat(lambda: func(arg), number=args.number, repeat=args.repeat)) / args.number
+
+    print(f"{len(words)} words")
+    print(f"shlex line_to_words():   {time_it(shlex_line_to_words, line) * 1e6:10.1f}us")
+    print(f"line_to_words():         {time_it(line_to_words, line) * 1e6:10.1f}us")
+    print(f"argparse:                {time_it(argparse_param_ref, words[3:]) * 1e6:10.1f}us")
+    print(f"get_completion_context(): {time_it(get_completion_context, words[3:]) * 1e6:9.1f}us")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Measures sending a lot of requests with a curl process for each against sending them all with one curl process and a
+config from `--print-curl-config`, to the Flask app the docker tests use, run locally.  Needs flask and curl installed.
+Run from the root of the repo with:
+
+    python -m benchmarks.curl_config [--requests N] [--parallel-max N]
+"""
+import argparse
+import os
+import subprocess
+import tempfile
+import time
+
+from benchmarks.http_executor import OPEN_API_FILE, start_flask_app
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, get_curl_config_lines
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=500, help='Number of requests sent each way')
+    parser.add_argument('--parallel-max', type=int, default=8, help='Requests sent at a time by the parallel config')
+    args = parser.parse_args()
+
+    server_url = start_flask_app()
+    swagger = SwaggerRepo(files=[OPEN_API_FILE], ephemeral=True)
+    requests = []
+    for i in range(args.requests):
+        request, _ = swagger.cli_args_to_request([
+            'fake.com/posting/stuff', 'POST', '+arg_one', str(i), '+arg_two', str(i)
+        ])
+        assert request is not None
+        requests.append(request._replace(url=request.url.replace('fake.com', server_url)))
+
+    start = time.perf_counter()
+    for request in requests:
+        subprocess.check_call([*request.to_curl_cmd(), '--silent', '--output', os.devnull])
+    process_per_request_elapsed = time.perf_counter() - start
+
+    with tempfile.TemporaryDirectory() as dir_:
+        elapsed_by_config = {}
+        for name, parallel_max in [('one curl, config', None), ('one curl, parallel config', args.parallel_max)]:
+            config_file = os.path.join(dir_, 'requests.curl')
+            with open(config_file, 'w') as fh:
+                fh.writelines(get_curl_config_lines(requests, parallel_max))
+            start = time.perf_counter()
+            subprocess.check_call(['curl', '--silent', '--config', config_file], stdout=subprocess.DEVNULL,
+                                  stderr=subprocess.DEVNULL)
+            elapsed_by_config[name] = time.perf_counter() - start
+
+    print(f"{args.requests} requests to {server_url}")
+    print(f"{'a curl process each:':<28}{process_per_request_elapsed:8.2f}s")
+    for name, elapsed in elapsed_by_config.items():
+        print(f"{name + ':':<28}{elapsed:8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,50 @@
+"""
+Measures the cost of decoding a cached endpoint, from the json in the cache to the SwaggerEndpoint which is used to
+build the parser and the completions.  Run from the root of the repo with:
+
+    python -m benchmarks.decode_cache [--paths N]
+"""
+import argparse
+import json
+import tempfile
+import timeit
+from typing import Any, Callable, List
+
+from benchmarks.generated_spec import write_spec
+from curl_arguments_url import spec_parser
+from curl_arguments_url.curl_arguments_url import EndpointToCache, SwaggerEndpoint
+
+
+def time_per_endpoint(decode: Callable[[str], Any], frozen_endpoints: List[str], repeat: int) -> float:
+    def decode_all() -> None:
+        for frozen_endpoint in frozen_endpoints:
+            decode(frozen_endpoint)
+
+    return min(timeit.repeat(decode_all, number=1, repeat=repeat)) / len(frozen_endpoints)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, default=2000, help='Number of paths in the generated spec')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as dir_:
+        spec_file = write_spec(dir_, args.paths)
+        spec_file_contents = spec_parser.parse_spec_file(spec_file, warnings=True)
+    frozen_endpoints = [json.dumps(e.to_obj()) for e in spec_file_contents.endpoints]
+    print(f"{len(frozen_endpoints)} endpoints, {len(spec_file_contents.endpoints[0].parameters)} params each")
+
+    json_only = time_per_endpoint(json.loads, frozen_endpoints, args.repeat)
+    to_model = time_per_endpoint(lambda e: EndpointToCache.from_obj(json.loads(e)), frozen_endpoints, args.repeat)
+    to_swagger_endpoint = time_per_endpoint(
+        lambda e: SwaggerEndpoint.from_cached_endpoint(EndpointToCache.from_obj(json.loads(e))),
+        frozen_endpoints, args.repeat
+    )
+    print(f"json.loads():           {json_only * 1e6:8.1f}us per endpoint")
+    print(f"EndpointToCache:        {to_model * 1e6:8.1f}us per endpoint")
+    print(f"SwaggerEndpoint:        {to_swagger_endpoint * 1e6:8.1f}us per endpoint")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,53 @@
+"""
+Generates large OpenApi specifications for the benchmarks, since the ones in tests/resources are too small to show
+anything
+"""
+import json
+import os
+from typing import Any, Dict, List
+
+PARAM_TYPES = ['string', 'integer', 'number', 'boolean']
+METHODS = ['get', 'post', 'put', 'delete']
+
+
+def generate_spec(paths: int, params_per_operation: int = 8, methods_per_path: int = 2) -> Dict[str, Any]:
+    spec_paths: Dict[str, Any] = {}
+    for path_i in range(paths):
+        operations: Dict[str, Any] = {}
+        for method in METHODS[:methods_per_path]:
+            parameters: List[Dict[str, Any]] = [{
+                'name': 'id',
+                'in': 'path',
+                'required': True,
+                'schema': {'type': 'integer'}
+            }]
+            for param_i in range(params_per_operation - 1):
+                schema: Dict[str, Any] = {'type': PARAM_TYPES[param_i % len(PARAM_TYPES)]}
+                if param_i % 5 == 0:
+                    schema = {'type': 'string', 'enum': [f"choice-{i}" for i in range(4)]}
+                parameters.append({
+                    'name': f"param_{param_i}",
+                    'in': 'header' if param_i % 7 == 0 else 'query',
+                    'description': f"Parameter {param_i} of {method} /resource-{path_i}",
+                    'schema': schema
+                })
+            operations[method] = {
+                'summary': f"{method.upper()} resource {path_i}",
+                'parameters': parameters
+            }
+        spec_paths[f"/group-{path_i % 100}/resource-{path_i}/{{id}}"] = operations
+
+    return {
+        'openapi': '3.0.0',
+        'info': {'title': 'Generated', 'version': '1.0.0'},
+        'servers': [{'url': 'https://generated.example.com'}],
+        'paths': spec_paths
+    }
+
+
+def write_spec(dir_: str, paths: int, **kwargs: Any) -> str:
+    """ Json is valid yaml, and much faster to write """
+    spec_file = os.path.join(dir_, f"generated-{paths}.json")
+    with open(spec_file, 'w') as fh:
+        json.dump(generate_spec(paths, **kwargs), fh)
+    return spec_file
@@ -0,0 +1,80 @@
+"""
+Measures sending requests with curl (how carl sends them by default) against sending them in-process (`--in-process`),
+with and without reusing connections, to the Flask app the docker tests use (tests/dockerfiles/flask_src/app.py), run
+locally.  Needs flask and curl installed.  Run from the root of the repo with:
+
+    python -m benchmarks.http_executor [--requests N]
+"""
+import argparse
+import importlib.util
+import logging
+import os
+import subprocess
+import threading
+import time
+from typing import Callable
+
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+from curl_arguments_url.http_executor import ConnectionPool
+
+FLASK_APP_PATH = os.path.join('tests', 'dockerfiles', 'flask_src', 'app.py')
+OPEN_API_FILE = os.path.join('tests', 'resources', 'open_api', 'openapi-test.yml')
+
+
+def start_flask_app() -> str:
+    """ Returns the server's url """
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)  # not a line for each request
+    spec = importlib.util.spec_from_file_location('flask_app', FLASK_APP_PATH)
+    assert spec is not None and spec.loader is not None
+    flask_app = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(flask_app)
+    server = make_server('127.0.0.1', 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}"
+
+
+def time_per_request(send: Callable[[], None], requests: int) -> float:
+    start = time.perf_counter()
+    for _ in range(requests):
+        send()
+    return (time.perf_counter() - start) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help='Number of requests sent each way')
+    args = parser.parse_args()
+
+    server_url = start_flask_app()
+    swagger = SwaggerRepo(files=[OPEN_API_FILE], ephemeral=True)
+    built_request, _ = swagger.cli_args_to_request([
+        'fake.com/posting/stuff', 'POST', '+arg_one', 'one', '+arg_two', '2'
+    ])
+    assert built_request is not None
+    request = built_request._replace(url=built_request.url.replace('fake.com', server_url))
+    curl_cmd = [*request.to_curl_cmd(), '--silent', '--output', os.devnull]
+
+    def send_with_curl() -> None:
+        subprocess.check_call(curl_cmd)
+
+    def send_with_new_pool() -> None:
+        pool = ConnectionPool()
+        pool.send(request)
+        pool.close()
+
+    shared_pool = ConnectionPool()
+
+    def send_with_shared_pool() -> None:
+        shared_pool.send(request)
+
+    send_with_shared_pool()  # warm up the app
+    print(f"{args.requests} requests to {server_url}")
+    print(f"curl:                    {time_per_request(send_with_curl, args.requests) * 1e3:8.2f}ms per request")
+    print(f"in-process, new conns:   {time_per_request(send_with_new_pool, args.requests) * 1e3:8.2f}ms per request")
+    print(f"in-process, kept alive:  {time_per_request(send_with_shared_pool, args.requests) * 1e3:8.2f}ms per request")
+
+
+if __name__ == '__main__':
+    main()
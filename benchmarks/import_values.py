@@ -0,0 +1,52 @@
+"""
+Measures seeding the cached values for a param with a lot of values, with import_values() against add_values(), which
+appends a line to the param's log for each value.  Run from the root of the repo with:
+
+    python -m benchmarks.import_values [--values N]
+"""
+import argparse
+import io
+import os
+import tempfile
+import time
+
+from curl_arguments_url import curl_arguments_url
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, read_values
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--values', type=int, default=20000, help='Number of distinct values to import')
+    parser.add_argument('--backend', default='files', choices=['files', 'sqlite'])
+    args = parser.parse_args()
+
+    os.environ['CARL_CACHE_BACKEND'] = args.backend
+    os.environ['CARL_MAX_HISTORY'] = str(args.values)
+    # every other value is a duplicate
+    values = [f"customer-{i // 2:08}" for i in range(args.values * 2)]
+    with tempfile.TemporaryDirectory() as dir_:
+        curl_arguments_url.CACHE_DIR = os.path.join(dir_, 'add')
+        swagger = SwaggerRepo(files=[])
+        start = time.perf_counter()
+        swagger.add_values('param', values)
+        add_elapsed = time.perf_counter() - start
+
+        curl_arguments_url.CACHE_DIR = os.path.join(dir_, 'import')
+        swagger = SwaggerRepo(files=[])
+        start = time.perf_counter()
+        swagger.import_values('param', read_values(io.StringIO(''.join(v + '\n' for v in values))))
+        import_elapsed = time.perf_counter() - start
+
+        start = time.perf_counter()
+        exported = sum(1 for _ in SwaggerRepo(files=[]).export_values('param'))
+        export_elapsed = time.perf_counter() - start
+        assert exported == args.values
+
+    print(f"{len(values)} values, {args.values} distinct")
+    print(f"add_values():    {add_elapsed:8.2f}s")
+    print(f"import_values(): {import_elapsed:8.2f}s")
+    print(f"export_values(): {export_elapsed:8.2f}s")
+
+
+if __name__ == '__main__':
+    main()
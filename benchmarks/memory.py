@@ -0,0 +1,52 @@
+"""
+Measures the memory used by the cached spec data for a large generated spec, as load_swagger_data() holds it when it
+thaws every file's urls and endpoints from the caches.  Run from the root of the repo with:
+
+    python -m benchmarks.memory [--paths N]
+"""
+import argparse
+import json
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, TextIO
+
+from benchmarks.generated_spec import write_spec
+from curl_arguments_url import spec_parser
+from curl_arguments_url.curl_arguments_url import EndpointToCache, UrlToCache
+
+
+def load_json(fh: TextIO) -> Dict[str, Any]:
+    return json.load(fh)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--paths', type=int, default=10000, help='Number of paths in the generated spec')
+    args = parser.parse_args()
+
+    # the generated spec is json, and parsing that with the pure python yaml parser would take most of the run
+    spec_parser.load_yaml = load_json  # type: ignore
+    with tempfile.TemporaryDirectory() as dir_:
+        spec_file_contents = spec_parser.parse_spec_file(write_spec(dir_, args.paths), warnings=True)
+    frozen_endpoints = json.dumps([e.to_obj() for e in spec_file_contents.endpoints])
+    frozen_urls = json.dumps([u.to_obj() for u in spec_file_contents.urls])
+    del spec_file_contents
+
+    tracemalloc.start()
+    start = time.perf_counter()
+    endpoints = [EndpointToCache.from_obj(e) for e in json.loads(frozen_endpoints)]
+    urls = [UrlToCache.from_obj(u) for u in json.loads(frozen_urls)]
+    elapsed = time.perf_counter() - start
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    param_count = sum(len(e.parameters) for e in endpoints)
+    print(f"{args.paths} paths: {len(urls)} urls, {len(endpoints)} endpoints, {param_count} params,"
+          f" thawed in {elapsed:.2f}s")
+    print(f"peak:     {peak / 2 ** 20:8.1f}MiB")
+    print(f"retained: {retained / 2 ** 20:8.1f}MiB ({retained / len(endpoints) / 2 ** 10:.2f}KiB per endpoint)")
+
+
+if __name__ == '__main__':
+    main()
@@ -1,8 +1,13 @@
 import os
+import threading
+from pathlib import Path
+from typing import Iterator
 
 import pytest
 
+from curl_arguments_url import curl_arguments_url
 from curl_arguments_url.curl_arguments_url import SwaggerRepo
+from tests.echo_server import EchoServer
 
 
 @pytest.fixture()
@@ -11,6 +16,14 @@ def content_root():
     return content_root
 
 
+@pytest.fixture()
+def cache_dir(tmp_path: Path, monkeypatch) -> str:
+    """ For tests of the caches which aren't ephemeral """
+    cache_dir = str(tmp_path / 'cache')
+    monkeypatch.setattr(curl_arguments_url, 'CACHE_DIR', cache_dir)
+    return cache_dir
+
+
 @pytest.fixture()
 def swagger_model(content_root):
     openapi_file = os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
@@ -41,3 +54,13 @@ def cache_param_values(swagger_model: SwaggerRepo) -> None:
             '+arg_list', f"{prefix}-A", f"{prefix}-B", f"{prefix}-C",
             '+arg_nested', '{"A": 1, "B": "' + prefix + '-B-nested"}'
         ])
+
+
+@pytest.fixture()
+def echo_server() -> Iterator[EchoServer]:
+    server = EchoServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
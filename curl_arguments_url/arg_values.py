@@ -0,0 +1,298 @@
+"""
+The values cached for each param, for completions: how they're ranked by frecency (how often and how recently they were
+used), and the log ArgCache stores them as.
+
+A param's log has a line for each time a value was used: its log score, a tab and then the value's json, so caching a
+value is a single append.  When it gets long, the log is compacted to a line per value: the json of the lower-cased
+value as a string, its log score, its place in the order the values were last used, and the value's json, separated by
+tabs.  The compacted lines are sorted, so the values with a given prefix are found with a binary search, and completions
+only need to parse those lines and the ones appended since (see search_log()).
+"""
+import heapq
+import json
+import math
+from bisect import bisect_left, insort
+from typing import Any, Dict, Hashable, Iterator, List, Optional, Sequence, Tuple, Union
+
+ParamValue = Union[str, int, float, Dict[str, Any], List[Any]]
+
+FRECENCY_HALF_LIFE_SECONDS = 7 * 24 * 60 * 60
+FRECENCY_DECAY_RATE = math.log(2) / FRECENCY_HALF_LIFE_SECONDS
+# a value which was cached before values had frecency, as though it was used at the epoch
+UNSCORED_LOG_SCORE = 0.0
+# a log is compacted once this many lines have been appended to it, so completions, which parse all of those lines,
+# stay quick however many values are cached
+MAX_APPENDED_LOG_LINES = 1000
+
+
+def param_value_to_str(value: ParamValue) -> str:
+    if isinstance(value, (str, int, float)):
+        return str(value)
+    else:
+        return json.dumps(value)
+
+
+def hashable_param_value(value: ParamValue) -> Hashable:
+    """ Equal to another value's if the values are equal, so the values can be put in sets """
+    if isinstance(value, dict):
+        return frozenset((k, hashable_param_value(v)) for k, v in value.items())
+    elif isinstance(value, list):
+        return tuple(hashable_param_value(v) for v in value)
+    else:
+        return value
+
+
+def get_frecency_log_score(timestamp: float) -> float:
+    """ The log of 2 ** (-age / half-life), with the age from the epoch so scores never need updating """
+    return timestamp * FRECENCY_DECAY_RATE
+
+
+def add_log_scores(log_score_1: float, log_score_2: float) -> float:
+    """ log(exp(log_score_1) + exp(log_score_2)), without the exps overflowing """
+    max_log_score = max(log_score_1, log_score_2)
+    return max_log_score + math.log1p(math.exp(-abs(log_score_1 - log_score_2)))
+
+
+class ArgValueEntry:
+    __slots__ = ('id_', 'value', 'value_str', 'log_score', 'sequence')
+
+    def __init__(self, id_: int, value: ParamValue, log_score: float, sequence: int):
+        self.id_ = id_
+        self.value = value
+        self.value_str = param_value_to_str(value)
+        self.log_score = log_score
+        # breaks ties in the log score, in favor of the most recently used
+        self.sequence = sequence
+
+    def rank(self) -> Tuple[float, int]:
+        return self.log_score, self.sequence
+
+
+class ArgValuesHistory:
+    """ A param's values with their frecency.  Past max_size values, the lowest ranked one is dropped """
+
+    def __init__(self, max_size: int) -> None:
+        self._max_size = max_size
+        self._entries: Dict[Hashable, ArgValueEntry] = {}
+        self._entries_by_id: Dict[int, ArgValueEntry] = {}
+        # (log score, sequence, id) for each time a value was used, so some are out of date
+        self._rank_heap: List[Tuple[float, int, int]] = []
+        # (lower-cased value, id), sorted.  Built the first time it's searched
+        self._prefix_index: Optional[List[Tuple[str, int]]] = None
+        self._next_id = 0
+        # how many uses were recorded, including values used more than once
+        self.record_count = 0
+        # how many of those were read from lines appended to the log since it was compacted
+        self.appended_count = 0
+
+    def record(self, value: ParamValue, log_score: float) -> None:
+        key = hashable_param_value(value)
+        entry = self._entries.get(key)
+        if entry is None:
+            entry = ArgValueEntry(self._next_id, value, log_score, self.record_count)
+            self._next_id += 1
+            self._entries[key] = entry
+            self._entries_by_id[entry.id_] = entry
+            if self._prefix_index is not None:
+                insort(self._prefix_index, (entry.value_str.lower(), entry.id_))
+        else:
+            entry.log_score = add_log_scores(entry.log_score, log_score)
+            entry.sequence = self.record_count
+        self.record_count += 1
+
+        heapq.heappush(self._rank_heap, (entry.log_score, entry.sequence, entry.id_))
+        while len(self._entries) > self._max_size:
+            self._remove_entry(self._pop_lowest_ranked())
+        if len(self._rank_heap) > 2 * len(self._entries) + 16:
+            self._rank_heap = [(e.log_score, e.sequence, e.id_) for e in self._entries.values()]
+            heapq.heapify(self._rank_heap)
+
+    def _pop_lowest_ranked(self) -> ArgValueEntry:
+        while True:
+            log_score, sequence, id_ = heapq.heappop(self._rank_heap)
+            entry = self._entries_by_id.get(id_)
+            if entry is not None and entry.sequence == sequence:
+                return entry
+
+    def _remove_entry(self, entry: ArgValueEntry) -> None:
+        del self._entries[hashable_param_value(entry.value)]
+        del self._entries_by_id[entry.id_]
+        if self._prefix_index is not None:
+            index_entry = (entry.value_str.lower(), entry.id_)
+            del self._prefix_index[bisect_left(self._prefix_index, index_entry)]
+
+    def remove(self, value_str: str) -> None:
+        """ Removes the values which are value_str as a string """
+        for entry in [e for e in self._entries.values() if e.value_str == value_str]:
+            self._remove_entry(entry)
+
+    def search(self, prefix: str) -> List[str]:
+        """ The values which start with the (case-insensitive) prefix, highest ranked first, as strings """
+        return [e.value_str for e in sorted(self.search_entries(prefix), key=ArgValueEntry.rank, reverse=True)]
+
+    def search_entries(self, prefix: str) -> List[ArgValueEntry]:
+        """ The entries of the values which start with the (case-insensitive) prefix, in no particular order """
+        if self._prefix_index is None:
+            self._prefix_index = sorted((e.value_str.lower(), e.id_) for e in self._entries.values())
+        folded_prefix = prefix.lower()
+        matches: List[ArgValueEntry] = []
+        for i in range(bisect_left(self._prefix_index, (folded_prefix,)), len(self._prefix_index)):
+            folded_value, id_ = self._prefix_index[i]
+            if not folded_value.startswith(folded_prefix):
+                break
+            matches.append(self._entries_by_id[id_])
+        return matches
+
+    def entries_by_sequence(self) -> List[Tuple[ParamValue, float]]:
+        """ The values and their log scores, least recently used first """
+        return [(e.value, e.log_score) for e in sorted(self._entries.values(), key=lambda e: e.sequence)]
+
+    def entries_by_rank(self) -> List[Tuple[ParamValue, float]]:
+        """ The values and their log scores, lowest ranked first """
+        return [(e.value, e.log_score) for e in sorted(self._entries.values(), key=ArgValueEntry.rank)]
+
+    def has_key(self, key: Hashable) -> bool:
+        """ Whether the value with the key (see hashable_param_value()) is cached """
+        return key in self._entries
+
+    def __iter__(self) -> Iterator[ParamValue]:
+        """ Highest ranked first """
+        for entry in sorted(self._entries.values(), key=ArgValueEntry.rank, reverse=True):
+            yield entry.value
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+def get_log_line(value: ParamValue, log_score: float) -> str:
+    """ What's appended to the log each time the value is used """
+    return f"{log_score!r}\t{json.dumps(value)}\n"
+
+
+def freeze_log(history: ArgValuesHistory) -> str:
+    """ The compacted log """
+    return ''.join(sorted(
+        f"{json.dumps(param_value_to_str(v).lower())}\t{log_score!r}\t{sequence}\t{json.dumps(v)}\n"
+        for sequence, (v, log_score) in enumerate(history.entries_by_sequence())
+    ))
+
+
+def needs_compaction(history: ArgValuesHistory, max_size: int) -> bool:
+    return history.record_count > 2 * max_size or history.appended_count > MAX_APPENDED_LOG_LINES
+
+
+def is_compacted_log_line(line: str) -> bool:
+    # json never has an unescaped tab, and an appended line only has the one after the log score
+    return line.count('\t') == 3
+
+
+def get_compacted_log_line_count(lines: List[str]) -> int:
+    """ The compacted lines come before all the appended ones, so the first appended one is found by a binary search """
+    low, high = 0, len(lines)
+    while low < high:
+        middle = (low + high) // 2
+        if is_compacted_log_line(lines[middle]):
+            low = middle + 1
+        else:
+            high = middle
+    return low
+
+
+class CompactedLogKeys(Sequence[str]):
+    """ The keys of a log's compacted lines, split off as they're needed, so they can be searched with bisect """
+
+    def __init__(self, lines: List[str], count: int):
+        self._lines = lines
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, i):  # type: ignore
+        key, _ = self._lines[i].split('\t', 1)
+        return key
+
+
+def thaw_log(frozen_log: str, max_size: int) -> ArgValuesHistory:
+    lines = frozen_log.split('\n')
+    compacted_count = get_compacted_log_line_count(lines)
+    return thaw_log_lines(lines[:compacted_count], lines, compacted_count, max_size)
+
+
+def thaw_log_lines(compacted_lines: List[str], lines: List[str], appended_start: int, max_size: int) \
+        -> ArgValuesHistory:
+    """ The history of the compacted lines, in the order they were used, then of the lines from appended_start on """
+    history = ArgValuesHistory(max_size)
+    compacted_uses = []
+    for line in compacted_lines:
+        _, log_score_str, sequence_str, value_json = line.split('\t')
+        compacted_uses.append((int(sequence_str), float(log_score_str), value_json))
+    for _, log_score, value_json in sorted(compacted_uses):
+        history.record(json.loads(value_json), log_score)
+
+    decoder = json.JSONDecoder()
+    for i in range(appended_start, len(lines)):
+        line = lines[i]
+        if line == '':
+            continue
+        if i == 0 and line.startswith('['):
+            # a log score never starts with "[", so this is either a list value cached before the values had
+            # frecency or, if anything follows it, from before the values were a log: a json list with the most
+            # recent first, with any values appended since then following it
+            value, end = decoder.raw_decode(line)
+            if end == len(line) and lines[-1] == '':
+                history.record(value, UNSCORED_LOG_SCORE)
+                continue
+            for old_value in reversed(value):
+                history.record(old_value, UNSCORED_LOG_SCORE)
+            line = line[end:]
+            if line == '':
+                continue
+        log_score_str, tab, value_json = line.partition('\t')
+        if tab:
+            history.record(json.loads(value_json), float(log_score_str))
+        else:
+            # the values were cached before they had frecency
+            history.record(json.loads(line), UNSCORED_LOG_SCORE)
+    history.appended_count = history.record_count - len(compacted_lines)
+    return history
+
+
+def search_log(frozen_log: str, prefix: str, max_size: int) -> Optional[List[str]]:
+    """ Like ArgValuesHistory.search(), but only parsing what matches.  None if the log is due to be compacted """
+    lines = frozen_log.split('\n')
+    compacted_count = get_compacted_log_line_count(lines)
+    appended_history = thaw_log_lines([], lines, compacted_count, max_size)
+    if appended_history.appended_count > MAX_APPENDED_LOG_LINES:
+        return None
+
+    keys = CompactedLogKeys(lines, compacted_count)
+    # json escapes each character on its own, so a key starts with the prefix's json if its value starts with the
+    # prefix.  The keys are ascii, so they sort before the prefix's json followed by \x7f if they start with it
+    key_prefix = json.dumps(prefix.lower())[:-1]
+    start = bisect_left(keys, key_prefix)
+    end = bisect_left(keys, key_prefix + '\x7f', start)
+    matching_fields = [lines[i].split('\t') for i in range(start, end)]
+    # decoded all at once, which is a lot quicker than one at a time
+    matching_values = json.loads('[' + ','.join(value_json for _, _, _, value_json in matching_fields) + ']')
+    # the log score and sequence of each value, like ArgValueEntry.rank(), and the value
+    ranks: List[Tuple[float, int, ParamValue]] = [
+        (float(log_score_str), int(sequence_str), value)
+        for (_, log_score_str, sequence_str, _), value in zip(matching_fields, matching_values)
+    ]
+
+    for entry in appended_history.search_entries(prefix):
+        # used after all the compacted values
+        rank = (entry.log_score, compacted_count + entry.sequence, entry.value)
+        entry_key = json.dumps(entry.value_str.lower())
+        value_key = hashable_param_value(entry.value)
+        for i in range(bisect_left(keys, entry_key, start, end), end):
+            if keys[i] != entry_key:
+                ranks.append(rank)
+                break
+            elif hashable_param_value(matching_values[i - start]) == value_key:
+                ranks[i - start] = (add_log_scores(ranks[i - start][0], entry.log_score), *rank[1:])
+                break
+        else:
+            ranks.append(rank)
+    return [param_value_to_str(value) for _, _, value in sorted(ranks, key=lambda r: r[:2], reverse=True)]
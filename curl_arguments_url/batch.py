@@ -0,0 +1,193 @@
+"""
+Batch mode (`carl utils batch`).  Reads carl invocations as JSONL, one object per line, like:
+
+    {"url": "fake.com/{thing}/do", "method": "GET", "params": {"thing": "one", "bang": ["a", "b"]}}
+
+with optional "body" (the base json body, like --body) and "curl_args" keys, and sends them all from one process, so
+they share one SwaggerRepo and its caches, and one pool of connections, instead of each paying for starting carl.
+
+The requests are built one at a time, since the SwaggerRepo isn't thread-safe, but are sent several at a time, and a
+JSONL result is yielded for each as soon as it's available (or in input order, if `ordered`).  Like `--in-process`,
+any response counts as success: only a bad invocation or not getting a response is an error.
+
+run_requests() also sends the requests of a command with --fan-out.
+"""
+import contextlib
+import io
+import json
+import subprocess
+import time
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Deque, Dict, Iterable, Iterator, List, NamedTuple, Optional, Tuple
+
+from curl_arguments_url.curl_arguments_url import CarlRequest, SwaggerRepo, DEFAULT_CONCURRENCY
+from curl_arguments_url.http_executor import ConnectionPool, InProcessError
+
+# what curl writes after the body, so the status can be split off of it
+CURL_STATUS_WRITE_OUT = '\n%{http_code}'
+# what argparse puts between the prog and the message of an error
+ARGPARSE_ERROR_PREFIX = ': error: '
+
+
+class BatchResult(NamedTuple):
+    # the line of the input, counting from 1
+    line: Optional[int] = None
+    # for --fan-out, the values of the params the request was fanned out for
+    params: Optional[Dict[str, Any]] = None
+    status: Optional[int] = None
+    # seconds
+    elapsed: Optional[float] = None
+    body: Optional[str] = None
+    error: Optional[str] = None
+
+    def to_obj(self) -> Dict[str, Any]:
+        return {k: v for k, v in self._asdict().items() if v is not None}
+
+
+class BatchError(Exception):
+    """ An invocation which couldn't be turned into a request """
+
+
+def param_value_to_cli_value(value: Any) -> str:
+    if isinstance(value, str):
+        return value
+    else:
+        # like "+arg_nested '{"A": 1}'" on the command line
+        return json.dumps(value)
+
+
+def invocation_to_cli_args(invocation: Any) -> List[str]:
+    if not isinstance(invocation, dict) or 'url' not in invocation or 'method' not in invocation:
+        raise BatchError('An invocation needs to be an object with at least a "url" and a "method"')
+    if not isinstance(invocation['url'], str) or not isinstance(invocation['method'], str):
+        raise BatchError('"url" and "method" need to be strings')
+    params = invocation.get('params', {})
+    curl_args = invocation.get('curl_args', [])
+    if not isinstance(params, dict) or not isinstance(curl_args, list):
+        raise BatchError('"params" needs to be an object and "curl_args" a list')
+    if not all(isinstance(curl_arg, str) for curl_arg in curl_args):
+        raise BatchError('"curl_args" need to be strings')
+    cli_args = [invocation['url'], invocation['method']]
+    try:
+        for param_name, value in params.items():
+            values = value if isinstance(value, list) else [value]
+            cli_args.extend(['+' + str(param_name), *(param_value_to_cli_value(v) for v in values)])
+        if 'body' in invocation:
+            cli_args.extend(['--body', json.dumps(invocation['body'])])
+    except (TypeError, ValueError) as e:
+        raise BatchError(f"Can't be serialized: {e}") from e
+    # always "--", so nothing after it is taken for a param
+    cli_args.extend(['--', *curl_args])
+    return cli_args
+
+
+def build_request(swagger: SwaggerRepo, line: str) -> CarlRequest:
+    try:
+        invocation = json.loads(line)
+    except json.JSONDecodeError as e:
+        raise BatchError(f"Isn't valid json: {e}") from e
+    cli_args = invocation_to_cli_args(invocation)
+
+    # argparse prints its errors and exits, which shouldn't end the whole batch.  It prints help for a value like "-h"
+    # to stdout, which shouldn't end up among the results
+    argparse_stderr = io.StringIO()
+    try:
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(argparse_stderr):
+            request, _ = swagger.cli_args_to_request(cli_args)
+    except SystemExit as e:
+        error_lines = argparse_stderr.getvalue().strip().splitlines()
+        if not error_lines:
+            raise BatchError('Invalid arguments') from e
+        # without the "<prog>: error: " prefix, whose prog depends on how carl was run
+        _, prefix, error = error_lines[-1].partition(ARGPARSE_ERROR_PREFIX)
+        raise BatchError(error if prefix else error_lines[-1]) from e
+    assert request is not None
+    return request
+
+
+def send_with_curl(request: CarlRequest) -> BatchResult:
+    """ For requests with curl_args, which can only be sent with curl """
+    cmd = [*request.to_curl_cmd(), '--silent', '--show-error', '--write-out', CURL_STATUS_WRITE_OUT]
+    try:
+        completed = subprocess.run(cmd, capture_output=True)
+    except OSError as e:
+        return BatchResult(error=f"Couldn't run curl: {e}")
+    if completed.returncode != 0:
+        return BatchResult(error=completed.stderr.decode(errors='replace').strip())
+    body, _, status = completed.stdout.rpartition(b'\n')
+    return BatchResult(status=int(status), body=body.decode(errors='replace'))
+
+
+def send_request(pool: ConnectionPool, result: BatchResult, request: CarlRequest) -> BatchResult:
+    """ The result is what identifies the request, which the status, timing and body are added to """
+    start = time.perf_counter()
+    if request.curl_args:
+        sent_result = send_with_curl(request)
+    else:
+        try:
+            response = pool.send(request)
+        except InProcessError as e:
+            sent_result = BatchResult(error=str(e))
+        else:
+            sent_result = BatchResult(status=response.status, body=response.body.decode(errors='replace'))
+    return sent_result._replace(line=result.line, params=result.params,
+                                elapsed=round(time.perf_counter() - start, 6))
+
+
+def completed_future(result: BatchResult) -> 'Future[BatchResult]':
+    future: 'Future[BatchResult]' = Future()
+    future.set_result(result)
+    return future
+
+
+def run_requests(requests: Iterable[Tuple[BatchResult, Optional[CarlRequest]]], pool: ConnectionPool,
+                 concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False) -> Iterator[BatchResult]:
+    """
+    Each request comes with what identifies it in its result, or with no request, its result is already an error.
+    The requests are taken as they're needed, so input can be streamed, keeping at most twice `concurrency` requests
+    built but without a result yielded
+    """
+    max_pending = concurrency * 2
+    pending: Deque['Future[BatchResult]'] = deque()
+
+    def pop_results(block: bool) -> Iterator[BatchResult]:
+        if ordered:
+            while pending and (block or pending[0].done()):
+                yield pending.popleft().result()
+                block = False
+        else:
+            done = {f for f in pending if f.done()}
+            if not done and block:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in [f for f in pending if f in done]:
+                pending.remove(future)
+                yield future.result()
+
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for result, request in requests:
+            if request is None:
+                pending.append(completed_future(result))
+            else:
+                pending.append(executor.submit(send_request, pool, result, request))
+
+            yield from pop_results(block=len(pending) >= max_pending)
+        while pending:
+            yield from pop_results(block=True)
+
+
+def get_batch_requests(swagger: SwaggerRepo, lines: Iterable[str]) \
+        -> Iterator[Tuple[BatchResult, Optional[CarlRequest]]]:
+    """ The request for each line, or if it couldn't be built, the error as its result """
+    for line_number, line in enumerate(lines, start=1):
+        if not line.strip():
+            continue
+        try:
+            yield BatchResult(line=line_number), build_request(swagger, line)
+        except BatchError as e:
+            yield BatchResult(line=line_number, error=str(e)), None
+
+
+def run_batch(swagger: SwaggerRepo, lines: Iterable[str], pool: ConnectionPool,
+              concurrency: int = DEFAULT_CONCURRENCY, ordered: bool = False) -> Iterator[BatchResult]:
+    return run_requests(get_batch_requests(swagger, lines), pool, concurrency, ordered)
@@ -0,0 +1,152 @@
+"""
+Load-testing mode (`--bench`).  Sends the same request over and over from carl itself, like `--in-process`, several at
+a time over kept-alive connections, for a number of requests or a duration, and reports the throughput and latencies.
+
+Sending the requests in-process means the latencies are the server's and the network's, not starting curl's.
+"""
+import math
+import threading
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+
+from curl_arguments_url.curl_arguments_url import CarlRequest, BenchArgs
+from curl_arguments_url.http_executor import ConnectionPool, InProcessError
+
+DEFAULT_BENCH_REQUESTS = 100
+PERCENTILES = [50, 90, 99]
+HISTOGRAM_WIDTH = 40
+HISTOGRAM_MANTISSAS = [1, 2, 5]
+
+
+class BenchReport(NamedTuple):
+    # seconds
+    elapsed: float
+    concurrency: int
+    # seconds, sorted, of every request which got a response
+    latencies: List[float]
+    status_counts: Dict[int, int]
+    # of the requests which didn't get a response
+    error_counts: Dict[str, int]
+
+    @property
+    def request_count(self) -> int:
+        return len(self.latencies) + sum(self.error_counts.values())
+
+    def get_percentile(self, percentile: float) -> float:
+        """ Nearest rank, so it's always one of the latencies """
+        rank = max(math.ceil(percentile / 100 * len(self.latencies)), 1)
+        return self.latencies[rank - 1]
+
+
+class BenchBudget:
+    """ Hands out requests to the workers, until the requests or the time run out """
+
+    def __init__(self, requests: Optional[int], duration: Optional[float]):
+        self.requests_left = requests
+        self.deadline = time.perf_counter() + duration if duration is not None else None
+        self._lock = threading.Lock()
+
+    def take(self) -> bool:
+        if self.deadline is not None and time.perf_counter() >= self.deadline:
+            return False
+        if self.requests_left is None:
+            return True
+        with self._lock:
+            if self.requests_left <= 0:
+                return False
+            self.requests_left -= 1
+            return True
+
+
+def send_until_done(pool: ConnectionPool, request: CarlRequest, budget: BenchBudget) \
+        -> List[Tuple[float, Optional[int], Optional[str]]]:
+    """ The latency and the status, or the error, of each request this worker sent """
+    results: List[Tuple[float, Optional[int], Optional[str]]] = []
+    while budget.take():
+        start = time.perf_counter()
+        try:
+            response = pool.send(request)
+        except InProcessError as e:
+            # the cause, without the url, so the same error is counted together
+            results.append((time.perf_counter() - start, None, repr(e.__cause__ or e)))
+        else:
+            results.append((time.perf_counter() - start, response.status, None))
+    return results
+
+
+def run_bench(request: CarlRequest, pool: ConnectionPool, bench_args: BenchArgs) -> BenchReport:
+    requests = bench_args.requests
+    if requests is None and bench_args.duration is None:
+        requests = DEFAULT_BENCH_REQUESTS
+    budget = BenchBudget(requests, bench_args.duration)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=bench_args.concurrency) as executor:
+        futures = [executor.submit(send_until_done, pool, request, budget) for _ in range(bench_args.concurrency)]
+        results = [result for future in futures for result in future.result()]
+    elapsed = time.perf_counter() - start
+
+    return BenchReport(
+        elapsed=elapsed,
+        concurrency=bench_args.concurrency,
+        latencies=sorted(latency for latency, status, _ in results if status is not None),
+        status_counts=dict(Counter(status for _, status, _ in results if status is not None)),
+        error_counts=dict(Counter(error for _, _, error in results if error is not None))
+    )
+
+
+def format_latency(seconds: float) -> str:
+    if seconds < 1:
+        return f"{seconds * 1e3:.2f}ms"
+    else:
+        return f"{seconds:.2f}s"
+
+
+def get_histogram_bucket(latency: float) -> int:
+    """ The buckets start at 1, 2 and 5 times each power of 10, so any spread of latencies takes a few lines """
+    exponent = math.floor(math.log10(max(latency, 1e-6)))
+    mantissa = latency / 10 ** exponent
+    return exponent * 3 + (2 if mantissa >= 5 else 1 if mantissa >= 2 else 0)
+
+
+def get_histogram_bucket_start(bucket: int) -> float:
+    return HISTOGRAM_MANTISSAS[bucket % 3] * 10.0 ** (bucket // 3)
+
+
+def get_histogram_lines(latencies: List[float]) -> Iterable[str]:
+    bucket_counts = Counter(get_histogram_bucket(latency) for latency in latencies)
+    max_count = max(bucket_counts.values())
+    for bucket in range(min(bucket_counts), max(bucket_counts) + 1):
+        count = bucket_counts.get(bucket, 0)
+        bar = '#' * math.ceil(count / max_count * HISTOGRAM_WIDTH)
+        bucket_range = f"{format_latency(get_histogram_bucket_start(bucket)):>9} -" \
+                       f" {format_latency(get_histogram_bucket_start(bucket + 1)):<9}"
+        yield f"  {bucket_range} |{bar:<{HISTOGRAM_WIDTH}} {count}"
+
+
+def get_bench_report_lines(report: BenchReport) -> Iterable[str]:
+    throughput = report.request_count / report.elapsed if report.elapsed else 0.0
+    yield f"{report.request_count} requests in {report.elapsed:.2f}s, {throughput:.1f} requests/s," \
+          f" concurrency {report.concurrency}"
+    if report.latencies:
+        yield ''
+        columns = [('min', report.latencies[0])] + \
+            [(f"p{p}", report.get_percentile(p)) for p in PERCENTILES] + [('max', report.latencies[-1])]
+        yield 'latency  ' + ' '.join(f"{name:>9}" for name, _ in columns)
+        yield '         ' + ' '.join(f"{format_latency(latency):>9}" for _, latency in columns)
+        yield ''
+        yield from get_histogram_lines(report.latencies)
+    if report.status_counts:
+        yield ''
+        yield 'status     count'
+        for status, count in sorted(report.status_counts.items()):
+            # like curl without --fail, any response is a success, but the errors are flagged
+            flag = '' if 200 <= status < 400 else '  (error)'
+            yield f"{status:<6} {count:>9}{flag}"
+    if report.error_counts:
+        yield ''
+        yield 'no response'
+        for error, count in sorted(report.error_counts.items(), key=lambda x: -x[1]):
+            yield f"  {error}: {count}"
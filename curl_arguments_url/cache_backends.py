@@ -0,0 +1,348 @@
+"""
+Where FileCache stores its frozen values.  A CacheStore is the storage for all the caches (a directory or a database),
+and its CacheBackends are the storage for each individual cache.
+
+Any number of carl processes can use a store at once (say, under `xargs -P`): each write replaces an entry in one step,
+so readers see either the old or the new value, and read-modify-writes are done in a transaction(), which excludes the
+other processes' transactions.
+"""
+import fcntl
+import io
+import os
+import shutil
+import tempfile
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from typing import ContextManager, Dict, Iterator, NamedTuple, Optional, TextIO
+
+# written to and then renamed over the entry they're for, so they're not entries themselves
+TEMP_FILE_PREFIX = '.tmp-'
+# an entry which was used more recently than this isn't touch()ed again, so reads don't each need a write
+TOUCH_INTERVAL_SECONDS = 60.0
+
+
+class CacheEntryInfo(NamedTuple):
+    key_hash: str
+    size: int
+    # when the entry was last written or touch()ed, as a timestamp
+    last_used: float
+
+
+class CacheBackend(ABC):
+    @abstractmethod
+    def open(self, key_hash: str) -> Optional[TextIO]:
+        """ Returns None if nothing is stored for the key """
+        ...
+
+    @abstractmethod
+    def write(self, key_hash: str, frozen_value: str) -> None:
+        ...
+
+    @abstractmethod
+    def append(self, key_hash: str, frozen_value: str) -> None:
+        """ Adds to the end of what's stored for the key (or stores it, if there is nothing) """
+        ...
+
+    @abstractmethod
+    def touch(self, key_hash: str) -> None:
+        """ Marks the entry as used now, for evicting the least recently used entries, without changing it """
+        ...
+
+    @abstractmethod
+    def delete(self, key_hash: str) -> bool:
+        """ Returns whether there was anything to delete """
+        ...
+
+    @abstractmethod
+    def exists(self, key_hash: str) -> bool:
+        ...
+
+    @abstractmethod
+    def clear(self) -> None:
+        ...
+
+    @abstractmethod
+    def entries(self) -> Iterator[CacheEntryInfo]:
+        ...
+
+
+class CacheStore(ABC):
+    def __init__(self, root_dir: str):
+        self._root_dir = root_dir
+        self._lock_files: Dict[str, TextIO] = {}
+        self._lock_depths: Dict[str, int] = {}
+
+    @abstractmethod
+    def get_backend(self, name: str) -> CacheBackend:
+        ...
+
+    @abstractmethod
+    def transaction(self) -> ContextManager[None]:
+        """
+        Groups reads and writes to all the caches in the store, which no other process's transaction can interleave
+        with.  Transactions can be nested, and are only committed when the outermost one ends
+        """
+        ...
+
+    @contextmanager
+    def lock(self, name: str) -> Iterator[None]:
+        """
+        An exclusive lock across all the processes using the store, by flock()ing a file in its directory.  The lock
+        can be taken again while it's held, since a second flock() from the same process would wait for the first
+        """
+        depth = self._lock_depths.get(name, 0)
+        if depth == 0:
+            os.makedirs(self._root_dir, exist_ok=True)
+            lock_file = open(os.path.join(self._root_dir, f"{name}.lock"), 'a')
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+            except BaseException:
+                lock_file.close()
+                raise
+            self._lock_files[name] = lock_file
+        self._lock_depths[name] = depth + 1
+        try:
+            yield
+        finally:
+            self._lock_depths[name] -= 1
+            if self._lock_depths[name] == 0:
+                # closing the file releases the lock
+                self._lock_files.pop(name).close()
+
+
+class DirCacheBackend(CacheBackend):
+    """ Each key is a file in the directory """
+
+    def __init__(self, dir_: str):
+        self._dir = dir_
+
+    def _get_filename(self, key_hash: str) -> str:
+        return os.path.join(self._dir, key_hash)
+
+    def open(self, key_hash: str) -> Optional[TextIO]:
+        try:
+            return open(self._get_filename(key_hash), 'r')
+        except FileNotFoundError:
+            return None
+
+    def write(self, key_hash: str, frozen_value: str) -> None:
+        """ Written to a temporary file which is renamed over the entry, so it's never seen half-written """
+        os.makedirs(self._dir, exist_ok=True)
+        fd, temp_path = tempfile.mkstemp(dir=self._dir, prefix=TEMP_FILE_PREFIX)
+        try:
+            with os.fdopen(fd, 'w') as fh:
+                fh.write(frozen_value)
+            os.replace(temp_path, self._get_filename(key_hash))
+        except BaseException:
+            os.remove(temp_path)
+            raise
+
+    def append(self, key_hash: str, frozen_value: str) -> None:
+        """
+        With O_APPEND, each write() goes to the end of the file even if another process appended since it was opened,
+        so appends from different processes don't need a lock to not clobber or interleave with each other, as long as
+        each is a single write()
+        """
+        os.makedirs(self._dir, exist_ok=True)
+        fd = os.open(self._get_filename(key_hash), os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o666)
+        try:
+            os.write(fd, frozen_value.encode())
+        finally:
+            os.close(fd)
+
+    def touch(self, key_hash: str) -> None:
+        filename = self._get_filename(key_hash)
+        try:
+            if os.stat(filename).st_mtime < time.time() - TOUCH_INTERVAL_SECONDS:
+                os.utime(filename)
+        except FileNotFoundError:
+            pass
+
+    def delete(self, key_hash: str) -> bool:
+        try:
+            os.remove(self._get_filename(key_hash))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def exists(self, key_hash: str) -> bool:
+        return os.path.exists(self._get_filename(key_hash))
+
+    def clear(self) -> None:
+        shutil.rmtree(self._dir, ignore_errors=True)
+
+    def entries(self) -> Iterator[CacheEntryInfo]:
+        try:
+            dir_entries = list(os.scandir(self._dir))
+        except FileNotFoundError:
+            return
+        for dir_entry in dir_entries:
+            if dir_entry.name.startswith(TEMP_FILE_PREFIX):
+                continue
+            try:
+                stat = dir_entry.stat()
+            except FileNotFoundError:
+                continue  # deleted by another process since the scan
+            yield CacheEntryInfo(key_hash=dir_entry.name, size=stat.st_size, last_used=stat.st_mtime)
+
+
+class DirCacheStore(CacheStore):
+    def get_backend(self, name: str) -> CacheBackend:
+        return DirCacheBackend(os.path.join(self._root_dir, name))
+
+    def transaction(self) -> ContextManager[None]:
+        """ Not all-or-nothing, but does keep other processes from interleaving their transactions """
+        return self.lock('cache')
+
+
+class SqliteCacheBackend(CacheBackend):
+    """ Each cache is a table in the database """
+
+    def __init__(self, store: 'SqliteCacheStore', name: str):
+        self._store = store
+        # the names are ours, not user input, but quote them anyway
+        self._table = '"' + name.replace('"', '""') + '"'
+        self._store.connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {self._table}"
+            f" (key_hash TEXT PRIMARY KEY, value TEXT NOT NULL, last_used REAL NOT NULL DEFAULT 0)"
+        )
+        columns = [row[1] for row in self._store.connection.execute(f"PRAGMA table_info({self._table})")]
+        if 'last_used' not in columns:
+            # created before the entries had a last_used
+            self._store.connection.execute(
+                f"ALTER TABLE {self._table} ADD COLUMN last_used REAL NOT NULL DEFAULT 0"
+            )
+
+    def open(self, key_hash: str) -> Optional[TextIO]:
+        row = self._store.connection.execute(
+            f"SELECT value FROM {self._table} WHERE key_hash = ?", (key_hash,)
+        ).fetchone()
+        if row is None:
+            return None
+        else:
+            return io.StringIO(row[0])
+
+    def write(self, key_hash: str, frozen_value: str) -> None:
+        self._store.connection.execute(
+            f"INSERT OR REPLACE INTO {self._table} (key_hash, value, last_used) VALUES (?, ?, ?)",
+            (key_hash, frozen_value, time.time())
+        )
+
+    def append(self, key_hash: str, frozen_value: str) -> None:
+        with self._store.transaction():
+            cursor = self._store.connection.execute(
+                f"UPDATE {self._table} SET value = value || ?, last_used = ? WHERE key_hash = ?",
+                (frozen_value, time.time(), key_hash)
+            )
+            if cursor.rowcount == 0:
+                self.write(key_hash, frozen_value)
+
+    def touch(self, key_hash: str) -> None:
+        # checked first, since the update would wait for any other process's transaction
+        now = time.time()
+        row = self._store.connection.execute(
+            f"SELECT last_used FROM {self._table} WHERE key_hash = ?", (key_hash,)
+        ).fetchone()
+        if row is not None and row[0] < now - TOUCH_INTERVAL_SECONDS:
+            self._store.connection.execute(
+                f"UPDATE {self._table} SET last_used = ? WHERE key_hash = ?", (now, key_hash)
+            )
+
+    def delete(self, key_hash: str) -> bool:
+        cursor = self._store.connection.execute(f"DELETE FROM {self._table} WHERE key_hash = ?", (key_hash,))
+        return cursor.rowcount > 0
+
+    def exists(self, key_hash: str) -> bool:
+        row = self._store.connection.execute(
+            f"SELECT 1 FROM {self._table} WHERE key_hash = ?", (key_hash,)
+        ).fetchone()
+        return row is not None
+
+    def clear(self) -> None:
+        self._store.connection.execute(f"DELETE FROM {self._table}")
+
+    def entries(self) -> Iterator[CacheEntryInfo]:
+        cursor = self._store.connection.execute(
+            f"SELECT key_hash, length(CAST(value AS BLOB)), last_used FROM {self._table}"
+        )
+        for key_hash, size, last_used in cursor.fetchall():
+            yield CacheEntryInfo(key_hash=key_hash, size=size, last_used=last_used)
+
+    def migrate_from_dir(self, dir_: str) -> None:
+        """ Moves the values a DirCacheBackend stored in dir_ into this table """
+        with self._store.transaction():
+            for key_hash in os.listdir(dir_):
+                if key_hash.startswith(TEMP_FILE_PREFIX):
+                    continue
+                with open(os.path.join(dir_, key_hash), 'r') as fh:
+                    self.write(key_hash, fh.read())
+        shutil.rmtree(dir_, ignore_errors=True)
+
+
+class SqliteCacheStore(CacheStore):
+    """
+    All the caches in a single database file.  The database is in WAL mode, so readers (like completions) aren't
+    blocked while the spec caches are being rebuilt
+    """
+    DB_FILE_NAME = 'cache.sqlite3'
+    BUSY_TIMEOUT_SECONDS = 60.0
+
+    def __init__(self, root_dir: str):
+        import sqlite3  # only imported if this backend is used
+
+        super().__init__(root_dir)
+        os.makedirs(root_dir, exist_ok=True)
+        # autocommit, unless in a transaction().  Another process's transaction can hold the database for as long as a
+        # spec rebuild takes, so wait for it
+        self.connection = sqlite3.connect(
+            os.path.join(root_dir, self.DB_FILE_NAME), isolation_level=None, check_same_thread=False,
+            timeout=self.BUSY_TIMEOUT_SECONDS
+        )
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self._transaction_depth = 0
+
+    def get_backend(self, name: str) -> CacheBackend:
+        backend = SqliteCacheBackend(self, name)
+        dir_ = os.path.join(self._root_dir, name)
+        if os.path.isdir(dir_):
+            # left from when the cache was using the "files" backend
+            backend.migrate_from_dir(dir_)
+        return backend
+
+    @contextmanager
+    def transaction(self) -> Iterator[None]:
+        if self._transaction_depth == 0:
+            # takes the write lock up front, since a transaction which has read can't wait for another to finish
+            # writing: it would be reading out-of-date values
+            self.connection.execute('BEGIN IMMEDIATE')
+        self._transaction_depth += 1
+        try:
+            yield
+        except BaseException:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.connection.execute('ROLLBACK')
+            raise
+        else:
+            self._transaction_depth -= 1
+            if self._transaction_depth == 0:
+                self.connection.execute('COMMIT')
+
+
+CACHE_STORE_TYPES = {
+    'files': DirCacheStore,
+    'sqlite': SqliteCacheStore,
+}
+
+_cache_stores: Dict[str, CacheStore] = {}
+
+
+def get_cache_store(backend_type: str, root_dir: str) -> CacheStore:
+    """ There is only one store per type and directory, so all the caches share, say, a database connection """
+    if backend_type not in CACHE_STORE_TYPES:
+        raise ValueError(f"Unknown cache backend {backend_type!r}, should be one of {list(CACHE_STORE_TYPES)}")
+    store_key = backend_type + ':' + root_dir
+    if store_key not in _cache_stores:
+        _cache_stores[store_key] = CACHE_STORE_TYPES[backend_type](root_dir)
+    return _cache_stores[store_key]
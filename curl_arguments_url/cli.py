@@ -1,10 +1,14 @@
 """Console script for curl_arguments_url."""
+import json
 import sys
 import shlex
-import subprocess
-from typing import List, Optional
+from typing import List, Optional, Iterable, Iterator, Tuple
 
-from curl_arguments_url.curl_arguments_url import SwaggerRepo
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, UTILS_COMPLETION_ITEM, ZSH_COMPLETION_ITEM, \
+    DAEMON_SOCKET_ENV, read_values, CacheStats, CACHE_STATS_ENV, boolean_type, CarlRequest, BatchArgs, \
+    FanOut, read_fan_out_rows, GenericArgs, get_curl_config_lines, BenchArgs, REBUILD_CACHE_COMPLETION, \
+    MAX_HISTORY_ENV
+from curl_arguments_url.daemon import request_completion_lines, run_daemon, CLIENT_TIMEOUT
 
 
 ZSH_SCRIPT = """\
@@ -13,16 +17,56 @@ ZSH_SCRIPT = """\
 autoload -U compinit
 compinit
 
+_carl_daemon_completions() {
+    # Asks the completion daemon (carl utils daemon) for the completions.  Fails if it isn't running
+    local socket=${CARL_DAEMON_SOCKET:-__CARL_DAEMON_SOCKET__}
+    local fd line status_line
+    [[ -S "$socket" ]] || return 1
+    zmodload zsh/net/socket 2>/dev/null || return 1
+    zsocket "$socket" 2>/dev/null || return 1
+    fd=$REPLY
+
+    print -rn -- "$CURRENT"$'\\0'"${words[*]}"$'\\0' >&$fd
+    # a wedged daemon shouldn't hang the shell, so give up on it after a while and run carl instead
+    if ! IFS= read -r -t __CARL_DAEMON_TIMEOUT__ status_line <&$fd || [[ "$status_line" != OK ]]; then
+        exec {fd}>&-
+        return 1
+    fi
+    # the daemon writes the completions along with the status, so they're available as soon as it is
+    while IFS= read -r -t __CARL_DAEMON_TIMEOUT__ line <&$fd; do
+        completions+=("$line")
+    done
+    exec {fd}>&-
+}
+
 _carl() {
     local -a completions
     local -a completions_with_descriptions
     local -a response
+    local -a segment_completions
+    local line tag
     (( ! $+commands[carl] )) && return 1
+    setopt localoptions extendedglob
 
-    completions=("${(@f)$(carl utils zsh-completion "$CURRENT" "${words[*]}")}")
+    if ! _carl_daemon_completions; then
+        completions=("${(@f)$(carl utils zsh-completion "$CURRENT" "${words[*]}")}")
+    fi
+
+    if (( CURRENT == 2 )); then
+        # url segments (CARL_URL_COMPLETION=segments) end in "/", and shouldn't be followed by a space, so the next
+        # segment can be completed
+        for line in "${completions[@]}"; do
+            # the tag is everything before the first unescaped ":"
+            tag=${(M)line##(\\\\?|[^:\\\\])#}
+            if [[ "$tag" == */ ]]; then
+                segment_completions+=("$line")
+            fi
+        done
+        completions=(${completions:|segment_completions})
+    fi
 
-    if [ -n "$completions" ]; then
-        _describe -V unsorted completions -U
+    if [ -n "$completions" ] || [ -n "$segment_completions" ]; then
+        _describe -V unsorted completions -U -- segment_completions -U -S ''
     fi
 }
 
@@ -30,30 +74,226 @@ compdef _carl carl;
 """
 
 
+SHELL_WHITESPACE = ' \t\r\n'
+
+
 def line_to_words(line: str) -> List[str]:
     """
-    Parses the original line.  Preferrables, zsh would do this for you but de-escaping the values is challenging
-    to say the least.  At least here I can write unit tests.  I'm basically allowing shlex to do all the work except
-    if there is an open quote or a trailing "\"
+    Splits the original line into words like shlex.split() would, in a single pass.  Preferrables, zsh would do this
+    for you but de-escaping the values is challenging to say the least.  At least here I can write unit tests.  Unlike
+    shlex.split(), an open quote or a trailing "\\" (which are common, since this is the line being completed) aren't
+    errors: the quote is closed and the backslash is ignored
+    """
+    words: List[str] = []
+    word: List[str] = []
+    in_word = False
+    quote: Optional[str] = None
+    chars = iter(line)
+    for char in chars:
+        if quote == "'":
+            if char == quote:
+                quote = None
+            else:
+                word.append(char)
+        elif quote == '"':
+            if char == quote:
+                quote = None
+            elif char == '\\':
+                escaped_char = next(chars, '')
+                # like in the shell, a backslash only escapes another backslash or a quote in double quotes
+                if escaped_char not in ('', '\\', '"'):
+                    word.append(char)
+                word.append(escaped_char)
+            else:
+                word.append(char)
+        elif char in SHELL_WHITESPACE:
+            if in_word:
+                words.append(''.join(word))
+                word = []
+                in_word = False
+        elif char == '\\':
+            escaped_char = next(chars, '')
+            if escaped_char:
+                word.append(escaped_char)
+                in_word = True
+        else:
+            if char in ('"', "'"):
+                quote = char
+            else:
+                word.append(char)
+            in_word = True
+
+    if in_word:
+        words.append(''.join(word))
+    return words
+
+
+def get_zsh_script() -> str:
+    return ZSH_SCRIPT.replace('__CARL_DAEMON_SOCKET__', shlex.quote(DAEMON_SOCKET_ENV.default)) \
+        .replace('__CARL_DAEMON_TIMEOUT__', str(CLIENT_TIMEOUT))
+
+
+def get_zsh_completion_lines(swagger: SwaggerRepo, word_index: int, line: str) -> Iterable[str]:
+    index = word_index - 1
+    words = line_to_words(line)
+    completions = swagger.get_completions(
+        index=index,
+        words=words
+    )
+    for completion in completions:
+        tag = completion.tag.replace(':', r'\:')
+        if completion.description is not None:
+            yield f"{tag}:{completion.description}"
+        else:
+            yield tag
+
+
+def get_daemon_zsh_completion_lines(argv: List[str]) -> Optional[List[str]]:
+    """
+    If this is a completion request and the daemon is running, get the completions from the daemon rather than
+    loading the caches here
     """
-    if line[-1] == '\\':
-        # trailing backslashes would cause errors
-        line_ = line[:-1]
+    if len(argv) == 5 and argv[1:3] == [UTILS_COMPLETION_ITEM.tag, ZSH_COMPLETION_ITEM.tag] and argv[3].isdigit():
+        return request_completion_lines(DAEMON_SOCKET_ENV.get_value(), int(argv[3]), argv[4])
     else:
-        line_ = line
+        return None
+
+
+def format_bytes(bytes_: int) -> str:
+    if bytes_ < 1024:
+        return f"{bytes_}B"
+    size = bytes_ / 1024
+    for unit in ('KiB', 'MiB'):
+        if size < 1024:
+            return f"{size:.1f}{unit}"
+        size /= 1024
+    return f"{size:.1f}GiB"
+
+
+def get_cache_stats_lines(cache_stats: List[CacheStats]) -> Iterable[str]:
+    yield f"{'cache':<24} {'entries':>8} {'size':>10} {'hits':>8} {'misses':>8} {'hit rate':>8}"
+    for stats in cache_stats:
+        lookups = stats.hits + stats.misses
+        hit_rate = f"{stats.hits / lookups:.1%}" if lookups else '-'
+        yield f"{stats.name:<24} {stats.entries:>8} {format_bytes(stats.bytes):>10} {stats.hits:>8} {stats.misses:>8}" \
+              f" {hit_rate:>8}"
+
+
+def run_request_in_process(request: CarlRequest) -> int:
+    """ Prints the response body, like curl """
+    # imported here, since it's not needed for completions
+    from curl_arguments_url.http_executor import InProcessError, get_connection_pool
+
+    try:
+        response = get_connection_pool().send(request)
+    except InProcessError as e:
+        print(f"carl: {e}", file=sys.stderr)
+        return 1
+    sys.stdout.buffer.write(response.body)
+    sys.stdout.buffer.flush()
+    return 0
+
 
-    for suffix in ('', "'", '"'):
-        # Try parsing.  If first it doesn't succeed, try with a closing quote, since that might be the problem
-        try:
-            return shlex.split(line_ + suffix)
-        except ValueError:
+def print_curl_config(requests: Iterable[CarlRequest], parallel_max: Optional[int] = None) -> int:
+    try:
+        sys.stdout.writelines(get_curl_config_lines(requests, parallel_max))
+    except ValueError as e:
+        print(f"carl: {e}", file=sys.stderr)
+        return 1
+    return 0
+
+
+def print_batch_curl_config(swagger: SwaggerRepo, lines: Iterable[str], batch_args: BatchArgs) -> int:
+    """ Invocations which can't be put in the config are reported and left out.  Returns 1 if there were any """
+    # imported here, since it's not needed for completions
+    from curl_arguments_url.batch import get_batch_requests
+
+    failed = False
+
+    def get_requests() -> Iterator[CarlRequest]:
+        nonlocal failed
+        for result, request in get_batch_requests(swagger, lines):
+            if request is not None and request.curl_args:
+                curl_args = ' '.join(request.curl_args)
+                result = result._replace(error=f"Can't put arguments to curl in a config: {curl_args}")
+            if result.error is not None:
+                print(f"carl: line {result.line}: {result.error}", file=sys.stderr)
+                failed = True
+            elif request is not None:
+                yield request
+
+    print_curl_config(get_requests(), parallel_max=batch_args.concurrency)
+    return 1 if failed else 0
+
+
+def print_batch_results(swagger: SwaggerRepo, lines: Iterable[str], batch_args: BatchArgs) -> int:
+    # imported here, since it's not needed for completions
+    from curl_arguments_url.batch import run_batch
+    from curl_arguments_url.http_executor import get_connection_pool
+
+    if batch_args.curl_config:
+        return print_batch_curl_config(swagger, lines, batch_args)
+    for result in run_batch(swagger, lines, get_connection_pool(), batch_args.concurrency, batch_args.ordered):
+        print(json.dumps(result.to_obj()), flush=True)
+    return 0
+
+
+def print_fan_out_results(fan_out: FanOut, rows_lines: Optional[Iterable[str]], generic_args: GenericArgs) -> int:
+    """ Returns 1 if any of the requests failed """
+    # imported here, since it's not needed for completions
+    from curl_arguments_url.batch import BatchResult, run_requests
+    from curl_arguments_url.http_executor import get_connection_pool
+
+    rows = read_fan_out_rows(rows_lines, fan_out.params_by_name) if rows_lines is not None else None
+    if generic_args.print_curl_config:
+        return print_curl_config((r for _, r in fan_out.get_requests(rows)), parallel_max=fan_out.concurrency)
+    print_cmd = generic_args.print_cmd
+
+    def get_requests() -> Iterator[Tuple[BatchResult, Optional[CarlRequest]]]:
+        for params, request in fan_out.get_requests(rows):
+            if print_cmd:
+                print(" ".join(shlex.quote(a) for a in request.to_curl_cmd()), flush=True)
+            yield BatchResult(params=params), request
+
+    if not generic_args.run_cmd:
+        for _ in get_requests():
             pass
+        return 0
+    failed = False
+    for result in run_requests(get_requests(), get_connection_pool(), fan_out.concurrency):
+        failed = failed or result.error is not None
+        print(json.dumps(result.to_obj()), flush=True)
+    return 1 if failed else 0
 
-    # hopefully don't get here, but in case we do, raise an honest exception which shows the problem with the
-    # original string
-    shlex.split(line)
 
-    raise Exception("Shouldn't get here, but this exception keeps mypy happy")
+def run_bench_from_args(request: CarlRequest, bench_args: BenchArgs) -> int:
+    """ Returns 1 if any of the requests didn't get a response """
+    # imported here, since it's not needed for completions
+    from curl_arguments_url.bench import get_bench_report_lines, run_bench
+    from curl_arguments_url.http_executor import get_connection_pool
+
+    report = run_bench(request, get_connection_pool(), bench_args)
+    for line in get_bench_report_lines(report):
+        print(line)
+    return 1 if report.error_counts else 0
+
+
+def run_fan_out(fan_out: FanOut, generic_args: GenericArgs) -> int:
+    if fan_out.file is None:
+        return print_fan_out_results(fan_out, None, generic_args)
+    elif fan_out.file == '-':
+        return print_fan_out_results(fan_out, sys.stdin, generic_args)
+    else:
+        with open(fan_out.file, newline='') as fh:
+            return print_fan_out_results(fan_out, fh, generic_args)
+
+
+def run_batch_from_args(swagger: SwaggerRepo, batch_args: BatchArgs) -> int:
+    if batch_args.file == '-':
+        return print_batch_results(swagger, sys.stdin, batch_args)
+    else:
+        with open(batch_args.file) as fh:
+            return print_batch_results(swagger, fh, batch_args)
 
 
 def main(passed_argv: Optional[List[str]] = None) -> int:
@@ -62,36 +302,51 @@ def main(passed_argv: Optional[List[str]] = None) -> int:
         argv = sys.argv
     else:
         argv = passed_argv
-    swagger = SwaggerRepo()
 
-    cmd, generic_args = swagger.cli_args_to_cmd(argv[1:])
+    daemon_completion_lines = get_daemon_zsh_completion_lines(argv)
+    if daemon_completion_lines is not None:
+        for completion_line in daemon_completion_lines:
+            print(completion_line)
+        return 0
+
+    # the caches are about to be cleared and rebuilt with the --jobs asked for, so don't build them first
+    swagger = SwaggerRepo(refresh=argv[1:3] != [UTILS_COMPLETION_ITEM.tag, REBUILD_CACHE_COMPLETION.tag])
 
-    if not generic_args.util:
+    request, generic_args = swagger.cli_args_to_request(argv[1:])
+
+    if request is not None and generic_args.fan_out is not None:
+        return run_fan_out(generic_args.fan_out, generic_args)
+    elif request is not None:
+        if generic_args.print_curl_config:
+            return print_curl_config([request])
         if generic_args.print_cmd:
-            print(" ".join(shlex.quote(a) for a in cmd))
-        try:
-            if generic_args.run_cmd:
-                subprocess.check_call(cmd)
-        except subprocess.CalledProcessError as e:
-            return e.returncode
-        else:
+            print(" ".join(shlex.quote(a) for a in request.to_curl_cmd()))
+        if not generic_args.run_cmd:
             return 0
+        elif generic_args.bench_args is not None:
+            return run_bench_from_args(request, generic_args.bench_args)
+        elif generic_args.in_process:
+            return run_request_in_process(request)
+        else:
+            # imported here, since it's not needed for completions
+            import subprocess
+
+            try:
+                subprocess.check_call(request.to_curl_cmd())
+            except subprocess.CalledProcessError as e:
+                return e.returncode
+            else:
+                return 0
     else:
         if generic_args.zsh_completion_args is not None:
-            index = generic_args.zsh_completion_args.word_index - 1
-            words = line_to_words(generic_args.zsh_completion_args.line)
-            completions = swagger.get_completions(
-                index=index,
-                words=words
-            )
-            for completion in completions:
-                tag = completion.tag.replace(':', r'\:')
-                if completion.description is not None:
-                    print(f"{tag}:{completion.description}")
-                else:
-                    print(tag)
+            for completion_line in get_zsh_completion_lines(
+                swagger,
+                word_index=generic_args.zsh_completion_args.word_index,
+                line=generic_args.zsh_completion_args.line
+            ):
+                print(completion_line)
         elif generic_args.zsh_print_script:
-            print(ZSH_SCRIPT)
+            print(get_zsh_script())
         elif generic_args.values_list_params:
             for param in swagger.get_params_with_cached_values():
                 print(param)
@@ -105,12 +360,37 @@ def main(passed_argv: Optional[List[str]] = None) -> int:
             print(f"Value {value!r} removed for param +{param_name}")
         elif generic_args.rebuild_cache:
             swagger.clear_all_spec_caches()
-            SwaggerRepo(warnings=True)  # rebuilds the caches
+            SwaggerRepo(warnings=True, jobs=generic_args.jobs)  # rebuilds the caches
         elif generic_args.values_add_args is not None:
             swagger.add_values(
                 param_name=generic_args.values_add_args.param_name,
                 values=generic_args.values_add_args.values
             )
+        elif generic_args.values_import_args is not None:
+            import_args = generic_args.values_import_args
+            if import_args.file == '-':
+                imported = swagger.import_values(import_args.param_name, read_values(sys.stdin, import_args.jsonl))
+            else:
+                with open(import_args.file) as fh:
+                    imported = swagger.import_values(import_args.param_name, read_values(fh, import_args.jsonl))
+            print(f"{imported.read} values imported for param +{import_args.param_name}", file=sys.stderr)
+            if imported.dropped:
+                print(f"WARNING: only {imported.kept} of them were kept, since at most {MAX_HISTORY_ENV.get_value()}"
+                      f" values are cached for a param.  Set ${MAX_HISTORY_ENV.env_name} to keep more", file=sys.stderr)
+        elif generic_args.values_export_args is not None:
+            sys.stdout.writelines(swagger.export_values(
+                generic_args.values_export_args.param_name,
+                jsonl=generic_args.values_export_args.jsonl
+            ))
+        elif generic_args.cache_stats:
+            for stats_line in get_cache_stats_lines(swagger.get_cache_stats()):
+                print(stats_line)
+            if not boolean_type(CACHE_STATS_ENV.get_value()):
+                print(f"Hits and misses are only recorded when ${CACHE_STATS_ENV.env_name} is set", file=sys.stderr)
+        elif generic_args.batch_args is not None:
+            return run_batch_from_args(swagger, generic_args.batch_args)
+        elif generic_args.daemon_args is not None:
+            run_daemon(generic_args.daemon_args.socket_path, swagger, get_zsh_completion_lines)
         else:
             raise NotImplementedError()
 
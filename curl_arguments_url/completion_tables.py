@@ -0,0 +1,51 @@
+"""
+Everything completing an endpoint's params needs, worked out when the cache is built.  Like the url prefix index, each
+entry of a table is the lower-cased arg name, a tab and then the json of its CompletionTableEntry, so the table is
+sorted by arg name and the args with a given prefix can be found with a binary search.
+"""
+import json
+from bisect import bisect_left
+from typing import Iterable, List, NamedTuple, Optional
+
+from curl_arguments_url.arg_values import ParamValue, param_value_to_str
+
+COMPLETION_TABLE_SEPARATOR = '\t'
+
+# pairs of the lower-cased enum and the enum, as strings
+EnumIndex = List[List[str]]
+
+
+class CompletionTableEntry(NamedTuple):
+    tag: str
+    description: Optional[str]
+    param_type: str
+    enum_index: Optional[EnumIndex]
+
+
+def build_completion_table(entries: Iterable[CompletionTableEntry]) -> List[str]:
+    return sorted(entry.tag.lower() + COMPLETION_TABLE_SEPARATOR + json.dumps(entry) for entry in entries)
+
+
+def search_completion_table(table: List[str], prefix: str) -> Iterable[CompletionTableEntry]:
+    """ Only parses the entries which match the (case-insensitive) prefix """
+    folded_prefix = prefix.lower()
+    for i in range(bisect_left(table, folded_prefix), len(table)):
+        entry = table[i]
+        if not entry.startswith(folded_prefix):
+            break
+        _, entry_json = entry.split(COMPLETION_TABLE_SEPARATOR, 1)
+        yield CompletionTableEntry(*json.loads(entry_json))
+
+
+def build_enum_index(enums: List[ParamValue]) -> EnumIndex:
+    """ Sorted, so the enums with a given (case-insensitive) prefix can be found with a binary search """
+    return sorted([enum.lower(), enum] for enum in map(param_value_to_str, enums))
+
+
+def search_enum_index(enum_index: EnumIndex, prefix: str) -> Iterable[str]:
+    folded_prefix = prefix.lower()
+    for i in range(bisect_left(enum_index, [folded_prefix]), len(enum_index)):
+        folded_enum, enum = enum_index[i]
+        if not folded_enum.startswith(folded_prefix):
+            break
+        yield enum
@@ -1,6 +1,7 @@
 """Main module."""
 import argparse
-import io
+import atexit
+import csv
 import itertools
 import json
 import os
@@ -8,29 +9,30 @@ import re
 import shutil
 import sys
 import textwrap
+import time
 from abc import ABC, abstractmethod
+from bisect import bisect_left
 from collections import defaultdict, OrderedDict
+from contextlib import nullcontext
 from copy import deepcopy
-from datetime import datetime
 from enum import Enum
 from hashlib import md5
 from typing import Iterable, NamedTuple, Tuple, Sequence, List, Union, Dict, Optional, TypeVar, Generic, \
-    Callable, Any, MutableMapping, cast, Set
+    Callable, Any, MutableMapping, cast, Set, TextIO, ContextManager, Collection, Hashable, Iterator
 
-from jsonref import replace_refs as replace_json_refs  # type: ignore
-from pydantic import BaseModel, validator
 from typing_extensions import Literal
 from urllib.parse import urlencode
-import yaml
-import yaml.parser
 
-from curl_arguments_url.models import open_api
+from curl_arguments_url.arg_values import ArgValuesHistory, ParamValue, get_frecency_log_score, freeze_log, \
+    get_log_line, hashable_param_value, needs_compaction, param_value_to_str, search_log, thaw_log
+from curl_arguments_url.completion_tables import CompletionTableEntry, EnumIndex, build_completion_table, \
+    build_enum_index, search_completion_table, search_enum_index
+from curl_arguments_url.cache_backends import CacheStore, CacheEntryInfo, get_cache_store as get_cache_store_
 from curl_arguments_url.models.methods import Method
-from curl_arguments_url.yaml import load_yaml
+from curl_arguments_url.snapshot import Snapshot, write_snapshot
 
 REMAINING_ARG = 'passed_to_curl'
-
-ParamValue = Union[str, int, float, Dict[str, Any], List[Any]]
+HELP_FLAGS = ('-h', '--help')
 
 
 class EnvVariable:
@@ -62,6 +64,67 @@ CACHE_DIR_ENV = EnvVariable(
     description='Directory containing the cache. Default $CARL_DIR/cache'
 )
 CACHE_DIR = CACHE_DIR_ENV.get_value()
+DAEMON_SOCKET_ENV = EnvVariable(
+    'CARL_DAEMON_SOCKET', os.path.join(CARL_DIR, 'daemon.sock'),
+    description='Unix socket the completion daemon (carl utils daemon) listens on. Default: $CARL_DIR/daemon.sock'
+)
+JOBS_ENV = EnvVariable(
+    'CARL_JOBS', '1',
+    description='Number of processes used to parse the OpenApi specifications when the cache is rebuilt.  0 means one'
+                ' per CPU. Default: 1'
+)
+
+CACHE_BACKEND_ENV = EnvVariable(
+    'CARL_CACHE_BACKEND', 'files',
+    description='How the cache is stored: "files" (a file per entry) or "sqlite" (a single database, migrated from the'
+                ' files the first time it\'s used). Default: files'
+)
+SPEC_SNAPSHOT_ENV = EnvVariable(
+    'CARL_SPEC_SNAPSHOT', '1',
+    description='Whether to compile the spec cache into a single memory-mapped snapshot file, which completions and'
+                ' commands read instead of the cache. Default: 1'
+)
+URL_COMPLETION_ENV = EnvVariable(
+    'CARL_URL_COMPLETION', 'full',
+    description='How urls are completed: "full" (every url which matches) or "segments" (a path segment at a time,'
+                ' for specs with too many urls to list). Default: full'
+)
+URL_COMPLETION_SEGMENTS = 'segments'
+MAX_HISTORY_ENV = EnvVariable(
+    'CARL_MAX_HISTORY', '200',
+    description='How many values are cached for each param, for completions.  When there are more, the values with'
+                ' the lowest frecency (how often and how recently they were used) are dropped. Default: 200'
+)
+CACHE_MAX_ENTRIES_ENV = EnvVariable(
+    'CARL_CACHE_MAX_ENTRIES', '5000',
+    description='How many params can have values cached.  When there are more, the values for the params which were'
+                ' least recently used are dropped.  0 means no limit. Default: 5000'
+)
+CACHE_MAX_BYTES_ENV = EnvVariable(
+    'CARL_CACHE_MAX_BYTES', str(64 * 2 ** 20),
+    description='How many bytes the cached values for all the params can take up, with the least recently used'
+                ' params\' values dropped when they take more.  0 means no limit. Default: 67108864 (64MiB)'
+)
+CACHE_STATS_ENV = EnvVariable(
+    'CARL_CACHE_STATS', '0',
+    description='Whether to record the hits and misses of each cache, which `carl utils cache-stats` reports.'
+                ' Default: 0'
+)
+SPEC_SNAPSHOT_FILE_NAME = 'spec.snapshot'
+SNAPSHOT_URLS_TABLE = 'urls'
+SNAPSHOT_METHODS_TABLE = 'methods'
+SNAPSHOT_ENDPOINTS_TABLE = 'endpoints'
+SNAPSHOT_URL_TREE_TABLE = 'url_tree'
+SNAPSHOT_COMPLETION_TABLES_TABLE = 'completions'
+SNAPSHOT_TABLES = [
+    SNAPSHOT_URLS_TABLE, SNAPSHOT_METHODS_TABLE, SNAPSHOT_ENDPOINTS_TABLE, SNAPSHOT_URL_TREE_TABLE,
+    SNAPSHOT_COMPLETION_TABLES_TABLE
+]
+
+
+def get_cache_store() -> CacheStore:
+    return get_cache_store_(CACHE_BACKEND_ENV.get_value(), CACHE_DIR)
+
 
 T = TypeVar('T')
 V = TypeVar('V')
@@ -72,16 +135,21 @@ ArgType = Callable[[str], T]
 class FileCache(ABC, Generic[T, V]):
     __manually_close_file__ = False
 
-    def __init__(self, dir_: str):
-        self._dir = os.path.join(CACHE_DIR, dir_)
+    def __init__(self, name: str):
+        self.name = name
+        self._store = get_cache_store()
+        self._backend = self._store.get_backend(name)
         self._process_cache: Dict[T, V] = {}
+        # lookups in this process, for `carl utils cache-stats`
+        self.hits = 0
+        self.misses = 0
 
     @abstractmethod
     def freeze(self, value: V) -> str:
         ...
 
     @abstractmethod
-    def thaw(self, frozen_value: io.TextIOWrapper) -> V:
+    def thaw(self, frozen_value: TextIO) -> V:
         ...
 
     @abstractmethod
@@ -89,35 +157,40 @@ class FileCache(ABC, Generic[T, V]):
         ...
 
     def clear(self) -> None:
-        shutil.rmtree(self._dir, ignore_errors=True)
+        self._backend.clear()
         self._process_cache.clear()
 
-    def _get_key_filename(self, key: T) -> str:
+    def _get_key_hash(self, key: T) -> str:
         key_stringified = self.freeze_key(key).encode()
-        key_hash = md5(key_stringified).hexdigest()
-        return os.path.join(self._dir, key_hash)
+        return md5(key_stringified).hexdigest()
 
     def __getitem__(self, key: T) -> V:
         if key not in self._process_cache:
-            key_filename = self._get_key_filename(key)
-            if os.path.exists(key_filename):
-                fh = open(key_filename, 'r')
+            fh = self._backend.open(self._get_key_hash(key))
+            if fh is not None:
                 try:
                     self._process_cache[key] = self.thaw(fh)
                 finally:
                     if not self.__manually_close_file__:
                         fh.close()
             else:
+                self.misses += 1
                 raise KeyError(key)
+        self.hits += 1
         return self._process_cache[key]
 
     def __setitem__(self, key: T, value: V) -> None:
         self._process_cache[key] = value
-        os.makedirs(self._dir, exist_ok=True)
-        key_filename = self._get_key_filename(key)
         frozen_value = self.freeze(value)
-        with open(key_filename, 'w') as fh:
-            fh.write(frozen_value)
+        self._backend.write(self._get_key_hash(key), frozen_value)
+
+    def __delitem__(self, key: T) -> None:
+        self._process_cache.pop(key, None)
+        if not self._backend.delete(self._get_key_hash(key)):
+            raise KeyError(key)
+
+    def __contains__(self, key: T) -> bool:
+        return key in self._process_cache or self._backend.exists(self._get_key_hash(key))
 
     def get(self, key: T, default: U) -> Union[V, U]:
         try:
@@ -125,6 +198,36 @@ class FileCache(ABC, Generic[T, V]):
         except KeyError:
             return default
 
+    def clear_process_cache(self) -> None:
+        self._process_cache.clear()
+
+    def entries(self) -> List[CacheEntryInfo]:
+        return list(self._backend.entries())
+
+    def evict_least_recently_used(self, max_entries: int, max_bytes: int, keys: Iterable[T]) -> List[T]:
+        """ Deletes the least recently used entries, except the newest, and returns their keys """
+        evicted_hashes: Set[str] = set()
+        total_bytes = 0
+        for i, entry in enumerate(sorted(self._backend.entries(), key=lambda e: e.last_used, reverse=True)):
+            total_bytes += entry.size
+            if i > 0 and ((max_entries and i >= max_entries) or (max_bytes and total_bytes > max_bytes)):
+                self._backend.delete(entry.key_hash)
+                evicted_hashes.add(entry.key_hash)
+
+        evicted_keys: List[T] = []
+        if evicted_hashes:
+            for key in keys:
+                if self._get_key_hash(key) in evicted_hashes:
+                    self._process_cache.pop(key, None)
+                    evicted_keys.append(key)
+        return evicted_keys
+
+
+def clear_process_cache(cache: Any) -> None:
+    """ Ephemeral caches are just dicts, so they don't have a process cache to clear """
+    if isinstance(cache, FileCache):
+        cache.clear_process_cache()
+
 
 def boolean_type(val: Optional[str]) -> bool:
     if val and val.lower() in ('1', 't', 'true'):
@@ -135,9 +238,30 @@ def boolean_type(val: Optional[str]) -> bool:
         raise TypeError(f"Value {val!r} can't be converted to boolean")
 
 
-class SpecialSwaggerTypeStrs:
-    object = 'object'
-    array = 'array'
+def non_negative_int_type(val: str) -> int:
+    try:
+        int_val = int(val)
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"{val!r} isn't an integer")
+    if int_val < 0:
+        raise argparse.ArgumentTypeError(f"{val!r} is less than 0")
+    return int_val
+
+
+def positive_int_type(val: str) -> int:
+    int_val = non_negative_int_type(val)
+    if int_val == 0:
+        raise argparse.ArgumentTypeError(f"{val!r} is less than 1")
+    return int_val
+
+
+def get_jobs() -> int:
+    """ A bad $CARL_JOBS shouldn't break every command, completions included, so it's warned about and ignored """
+    try:
+        return non_negative_int_type(JOBS_ENV.get_value())
+    except argparse.ArgumentTypeError as e:
+        print(f"WARNING: ${JOBS_ENV.env_name} is ignored: {e}", file=sys.stderr)
+        return int(JOBS_ENV.default)
 
 
 class ArgTypeEnum(Enum):
@@ -148,10 +272,17 @@ class ArgTypeEnum(Enum):
     json = 'json'
 
 
-class ArgTypeModel(BaseModel):
+class ArgTypeModel(NamedTuple):
     type_: ArgTypeEnum
     is_array: bool = False
 
+    def to_obj(self) -> Dict[str, Any]:
+        return {'type_': self.type_.value, 'is_array': self.is_array}
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'ArgTypeModel':
+        return cls(type_=ArgTypeEnum(obj['type_']), is_array=obj['is_array'])
+
     def converter(self, value: str) -> Any:
         return ARG_TYPE_FUNCS[self.type_](value)
 
@@ -191,7 +322,15 @@ class CarlParamReference(NamedTuple):
 BODY_ARG_SUFFIX = 'BODY'
 
 
-class CarlParam(BaseModel):
+def get_param_type_suffix(param_type: ParamType) -> str:
+    """ For "+param:SUFFIX" """
+    if param_type == ParamType.json_body:
+        return BODY_ARG_SUFFIX
+    else:
+        return param_type.value.upper()
+
+
+class CarlParam(NamedTuple):
     name: str
     param_type: ParamType
     description: Optional[str] = None
@@ -201,19 +340,26 @@ class CarlParam(BaseModel):
     enums: Optional[List[ParamValue]] = None
     default: Optional[ParamValue] = None
 
-    @validator('required_', pre=True)
-    def required(cls, v: Any) -> bool:
-        return bool(v)
+    def to_obj(self) -> Dict[str, Any]:
+        return {
+            **self._asdict(),
+            'param_type': self.param_type.value,
+            'type_': self.type_.to_obj()
+        }
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'CarlParam':
+        return cls(**{
+            **obj,
+            'param_type': ParamType(obj['param_type']),
+            'type_': ArgTypeModel.from_obj(obj['type_'])
+        })
 
     def get_arg_name(self) -> str:
         if not self.include_location:
             return f"+{self.name}"
         else:
-            if self.param_type == ParamType.json_body:
-                type_str = BODY_ARG_SUFFIX
-            else:
-                type_str = self.param_type.value.upper()
-            return f"+{self.name}:{type_str}"
+            return f"+{self.name}:{get_param_type_suffix(self.param_type)}"
 
     @classmethod
     def param_ref_from_arg_name(cls, arg_name: str) -> CarlParamReference:
@@ -224,13 +370,10 @@ class CarlParam(BaseModel):
         param_type: Optional[ParamType] = None
         possible_param_type: ParamType
         for possible_param_type in ParamType.__members__.values():
-            if possible_param_type == ParamType.json_body:
-                suffix = BODY_ARG_SUFFIX
-            else:
-                suffix = possible_param_type.value.upper()
+            suffix = get_param_type_suffix(possible_param_type)
             if param_name.endswith(f":{suffix}"):
-                # strip the suffix
-                param_name = param_name[:-len(suffix)]
+                # strip the suffix, including the ":"
+                param_name = param_name[:-len(suffix) - 1]
                 param_type = possible_param_type
 
         return CarlParamReference(
@@ -241,8 +384,6 @@ class CarlParam(BaseModel):
 
 EndpointParams = Dict[str, List[CarlParam]]
 
-MAX_HISTORY = 200
-
 ArgPairs = List[Tuple[CarlParam, ParamValue]]
 
 
@@ -279,10 +420,27 @@ class ParamArg():
             return repr([param_value_to_str(v) for v in self.values])
 
     def __hash__(self) -> int:
-        return hash(json.dumps({
-            'param': self.param.json(),
-            'values': [param_value_to_str(v) for v in self.values]
-        }))
+        return hash((id(self.param), tuple(hashable_param_value(v) for v in self.values)))
+
+
+class EnumChoices(Collection[ParamArg]):
+    """ The enums of a param as argparse choices, checked with a set lookup """
+
+    def __init__(self, param: CarlParam):
+        self.param = param
+        self._enums = param.enums or []
+        self._enum_set = {hashable_param_value(e) for e in self._enums}
+
+    def __contains__(self, param_arg: object) -> bool:
+        return isinstance(param_arg, ParamArg) and param_arg.param is self.param \
+            and all(hashable_param_value(v) in self._enum_set for v in param_arg.values)
+
+    def __iter__(self) -> Iterator[ParamArg]:
+        for enum in self._enums:
+            yield ParamArg(self.param, [enum])
+
+    def __len__(self) -> int:
+        return len(self._enums)
 
 
 class SwaggerModel:
@@ -290,12 +448,27 @@ class SwaggerModel:
     properties: List[CarlParam]
 
 
-class EndpointToCache(BaseModel):
+class EndpointToCache(NamedTuple):
     endpoint_url: str
     method: Method
     parameters: List[CarlParam]
-    summary: Optional[str]
-    description: Optional[str]
+    summary: Optional[str] = None
+    description: Optional[str] = None
+
+    def to_obj(self) -> Dict[str, Any]:
+        return {
+            **self._asdict(),
+            'method': self.method.value,
+            'parameters': [p.to_obj() for p in self.parameters]
+        }
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'EndpointToCache':
+        return cls(**{
+            **obj,
+            'method': Method(obj['method']),
+            'parameters': [CarlParam.from_obj(p) for p in obj['parameters']]
+        })
 
 
 class SwaggerEndpoint:
@@ -339,26 +512,25 @@ class SwaggerEndpoint:
             if len(params_with_same_name) > 1:
                 new_params: List[CarlParam] = []
                 for param in params_with_same_name:
-                    new_param = param.copy()
-                    new_param.include_location = True
+                    new_param = param._replace(include_location=True)
                     new_params.append(new_param)
                 self.params[name] = new_params
             else:
                 self.params[name] = params_with_same_name
 
-    def add_args_from_params(self, parser: argparse.ArgumentParser, use_requires: bool) \
-            -> argparse.ArgumentParser:
+    def add_args_from_params(self, parser: argparse.ArgumentParser, use_requires: bool,
+                             fan_out_params: Sequence[str] = ()) -> argparse.ArgumentParser:
         """
         Note: this is a very crude approximation of the swagger param model.
         See https://swagger.io/docs/specification/describing-parameters/ for what the possibilities really are
         """
         for params_for_name in self.params.values():
             for param in params_for_name:
-                nargs: Union[int, Literal['+']] = '+' if param.type_.is_array else 1
                 arg_name = param.get_arg_name()
-                choices: Optional[str]
+                nargs: Union[int, Literal['+']] = '+' if param.type_.is_array or arg_name[1:] in fan_out_params else 1
+                enums: Optional[EnumChoices]
                 if use_requires and param.enums:
-                    enums = [ParamArg(param, [e]) for e in param.enums]
+                    enums = EnumChoices(param)
                 else:
                     enums = None
                 required = use_requires and param.required_
@@ -377,26 +549,49 @@ class SwaggerEndpoint:
 DISPLAY_DESCRIPTION_IDEAL_LENGTH = 100
 
 
-class UrlToCache(BaseModel):
+class UrlToCache(NamedTuple):
     url: str
-    summary: Optional[str]
-    description: Optional[str]
+    summary: Optional[str] = None
+    description: Optional[str] = None
+
+    def to_obj(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'UrlToCache':
+        return cls(**obj)
 
 
-class TimeCache(FileCache[None, float]):
-    def freeze(self, value: float) -> str:
-        return str(value)
+class SpecFileFingerprint(NamedTuple):
+    mtime: float
+    size: int
+    content_hash: str
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> float:
-        return float(frozen_value.read())
+    def to_obj(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'SpecFileFingerprint':
+        return cls(**obj)
+
+
+class SpecFingerprintsCache(FileCache[None, Dict[str, SpecFileFingerprint]]):
+    def freeze(self, value: Dict[str, SpecFileFingerprint]) -> str:
+        return json.dumps({file: fingerprint.to_obj() for file, fingerprint in value.items()})
+
+    def thaw(self, frozen_value: TextIO) -> Dict[str, SpecFileFingerprint]:
+        return {
+            file: SpecFileFingerprint.from_obj(fingerprint)
+            for file, fingerprint in json.loads(frozen_value.read()).items()
+        }
 
     def freeze_key(self, key: None) -> str:
-        return 'TIME-CACHE-KEY'
+        return 'SPEC-FINGERPRINTS-KEY'
 
-    def get_value(self) -> float:
-        return self.get(None, 0)
+    def get_value(self) -> Dict[str, SpecFileFingerprint]:
+        return self.get(None, {})
 
-    def set_value(self, value: float) -> None:
+    def set_value(self, value: Dict[str, SpecFileFingerprint]) -> None:
         self[None] = value
 
 
@@ -404,7 +599,7 @@ class ParamsWithCachedValuesCache(FileCache[None, List[str]]):
     def freeze(self, value: List[str]) -> str:
         return json.dumps(value)
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> List[str]:
+    def thaw(self, frozen_value: TextIO) -> List[str]:
         return json.loads(frozen_value.read())
 
     def freeze_key(self, key: None) -> str:
@@ -424,13 +619,13 @@ class UrlsCache(FileCache[None, Iterable[UrlToCache]]):
         return_val = ''
         for v in value:
             # still json dumping, in cas there is a newline
-            return_val += v.json() + "\n"
+            return_val += json.dumps(v.to_obj()) + "\n"
         return return_val
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> Iterable[UrlToCache]:
+    def thaw(self, frozen_value: TextIO) -> Iterable[UrlToCache]:
         try:
             for line in frozen_value:
-                yield UrlToCache.parse_raw(line)
+                yield UrlToCache.from_obj(json.loads(line))
         finally:
             frozen_value.close()
 
@@ -447,17 +642,163 @@ class UrlsCache(FileCache[None, Iterable[UrlToCache]]):
         self[None] = value
 
 
-class MethodsToCache(BaseModel):
+class UrlsPrefixIndexCache(FileCache[None, List[str]]):
+    """ See build_url_prefix_index() """
+
+    def freeze(self, value: List[str]) -> str:
+        return freeze_index(value)
+
+    def thaw(self, frozen_value: TextIO) -> List[str]:
+        return thaw_index(frozen_value.read())
+
+    def freeze_key(self, key: None) -> str:
+        return 'URLS-PREFIX-INDEX-KEY'
+
+    def get_value(self) -> List[str]:
+        return self.get(None, [])
+
+    def set_value(self, value: List[str]) -> None:
+        self[None] = value
+
+
+URL_PREFIX_INDEX_SEPARATOR = '\t'
+
+
+def freeze_index(entries: List[str]) -> str:
+    return ''.join(entry + '\n' for entry in entries)
+
+
+def thaw_index(frozen_index: str) -> List[str]:
+    # not using .splitlines(), which also splits on characters json doesn't escape
+    return frozen_index.split('\n')[:-1]
+
+
+def build_url_prefix_index(urls: Iterable[UrlToCache]) -> List[str]:
+    """ The lower-cased url, a tab and the url's json, sorted so a prefix is found with a binary search """
+    return sorted(url.url.lower() + URL_PREFIX_INDEX_SEPARATOR + json.dumps(url.to_obj()) for url in urls)
+
+
+def search_url_prefix_index(index: List[str], prefix: str) -> Iterable[UrlToCache]:
+    """ Only parses the urls which match the (case-insensitive) prefix """
+    folded_prefix = prefix.lower()
+    for i in range(bisect_left(index, folded_prefix), len(index)):
+        entry = index[i]
+        if not entry.startswith(folded_prefix):
+            break
+        _, url_json = entry.split(URL_PREFIX_INDEX_SEPARATOR, 1)
+        yield UrlToCache.from_obj(json.loads(url_json))
+
+
+class UrlSegment(NamedTuple):
+    prefix: str
+    url_count: int
+
+
+class UrlTreeNode(NamedTuple):
+    """ One level of the url tree (see build_url_tree()) """
+    segments: List[UrlSegment]
+    urls: List[UrlToCache]
+
+    def to_obj(self) -> Dict[str, Any]:
+        return {'segments': [list(s) for s in self.segments], 'urls': [u.to_obj() for u in self.urls]}
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'UrlTreeNode':
+        return cls(
+            segments=[UrlSegment(*s) for s in obj['segments']],
+            urls=[UrlToCache.from_obj(u) for u in obj['urls']]
+        )
+
+
+class UrlTreeCache(FileCache[str, UrlTreeNode]):
+    """ The nodes of the url tree, keyed by their lower-cased prefix """
+
+    def freeze(self, value: UrlTreeNode) -> str:
+        return json.dumps(value.to_obj())
+
+    def thaw(self, frozen_value: TextIO) -> UrlTreeNode:
+        return UrlTreeNode.from_obj(json.loads(frozen_value.read()))
+
+    def freeze_key(self, key: str) -> str:
+        return key
+
+
+def get_url_segment_prefixes(url: str) -> List[str]:
+    """ The prefixes of the url which end in a "/", shortest first, starting with the host """
+    scheme_end = url.find('://')
+    start = scheme_end + len('://') if scheme_end >= 0 else 0
+    prefixes: List[str] = []
+    slash = url.find('/', start)
+    while slash >= 0:
+        prefixes.append(url[:slash + 1])
+        slash = url.find('/', slash + 1)
+    return prefixes
+
+
+def build_url_tree(urls: Iterable[UrlToCache]) -> Dict[str, UrlTreeNode]:
+    """ Maps each lower-cased prefix to its children.  A segment with only one url under it is that url """
+    child_segments: Dict[str, Dict[str, str]] = defaultdict(dict)
+    url_counts: Dict[str, int] = defaultdict(int)
+    first_urls: Dict[str, UrlToCache] = {}
+    end_urls: Dict[str, List[UrlToCache]] = defaultdict(list)
+    for url in urls:
+        node = ''
+        # not url.url itself, when it ends in "/": it ends at the level above, rather than being its own node
+        for prefix in get_url_segment_prefixes(url.url[:-1]):
+            child = prefix.lower()
+            child_segments[node].setdefault(child, prefix)
+            url_counts[child] += 1
+            first_urls.setdefault(child, url)
+            node = child
+        end_urls[node].append(url)
+
+    tree: Dict[str, UrlTreeNode] = {}
+    for node in sorted(set(child_segments) | set(end_urls)):
+        node_urls = list(end_urls.get(node, []))
+        segments: List[UrlSegment] = []
+        for child, prefix in child_segments.get(node, {}).items():
+            if url_counts[child] == 1:
+                node_urls.append(first_urls[child])
+            else:
+                segments.append(UrlSegment(prefix=prefix, url_count=url_counts[child]))
+        tree[node] = UrlTreeNode(segments=segments, urls=node_urls)
+    return tree
+
+
+class SpecFileUrlsCache(FileCache[str, List[UrlToCache]]):
+    """ The urls contributed by each spec file, keyed by the file's path """
+
+    def freeze(self, value: List[UrlToCache]) -> str:
+        return json.dumps([u.to_obj() for u in value])
+
+    def thaw(self, frozen_value: TextIO) -> List[UrlToCache]:
+        return [UrlToCache.from_obj(u) for u in json.loads(frozen_value.read())]
+
+    def freeze_key(self, key: str) -> str:
+        return key
+
+
+class MethodsToCache(NamedTuple):
     url: UrlToCache
     methods: List[Method]
 
+    def to_obj(self) -> Dict[str, Any]:
+        return {'url': self.url.to_obj(), 'methods': [m.value for m in self.methods]}
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'MethodsToCache':
+        return cls(
+            url=UrlToCache.from_obj(obj['url']),
+            methods=[Method(m) for m in obj['methods']]
+        )
+
 
 class MethodsCache(FileCache[str, MethodsToCache]):
     def freeze(self, value: MethodsToCache) -> str:
-        return value.json()
+        return json.dumps(value.to_obj())
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> MethodsToCache:
-        return MethodsToCache.parse_raw(frozen_value.read())
+    def thaw(self, frozen_value: TextIO) -> MethodsToCache:
+        return MethodsToCache.from_obj(json.loads(frozen_value.read()))
 
     def freeze_key(self, key: str) -> str:
         return key
@@ -468,15 +809,103 @@ EndpointKey = Tuple[str, Method]
 
 class EndpointCache(FileCache[EndpointKey, EndpointToCache]):
     def freeze(self, value: EndpointToCache) -> str:
-        return value.json()
+        return json.dumps(value.to_obj())
+
+    def thaw(self, frozen_value: TextIO) -> EndpointToCache:
+        return EndpointToCache.from_obj(json.loads(frozen_value.read()))
+
+    def freeze_key(self, key: EndpointKey) -> str:
+        url, method = key
+        return get_endpoint_key(url, method)
+
+
+class CompletionTableCache(FileCache[EndpointKey, List[str]]):
+    """ See completion_tables """
+
+    def freeze(self, value: List[str]) -> str:
+        return freeze_index(value)
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> EndpointToCache:
-        return EndpointToCache.parse_raw(frozen_value.read())
+    def thaw(self, frozen_value: TextIO) -> List[str]:
+        return thaw_index(frozen_value.read())
 
     def freeze_key(self, key: EndpointKey) -> str:
         url, method = key
-        method_str = method.value
-        return json.dumps([url, method_str])
+        return get_endpoint_key(url, method)
+
+
+def build_endpoint_completion_table(endpoint: EndpointToCache) -> List[str]:
+    return build_completion_table(
+        CompletionTableEntry(
+            tag=param.get_arg_name(), description=param.description, param_type=param.param_type.value,
+            enum_index=build_enum_index(param.enums) if param.enums is not None else None
+        )
+        for params_for_name in SwaggerEndpoint.from_cached_endpoint(endpoint).params.values()
+        for param in params_for_name
+    )
+
+
+class SpecFileEndpointsCache(FileCache[str, List[EndpointToCache]]):
+    """ The endpoints contributed by each spec file, keyed by the file's path """
+
+    def freeze(self, value: List[EndpointToCache]) -> str:
+        return json.dumps([e.to_obj() for e in value])
+
+    def thaw(self, frozen_value: TextIO) -> List[EndpointToCache]:
+        return [EndpointToCache.from_obj(e) for e in json.loads(frozen_value.read())]
+
+    def freeze_key(self, key: str) -> str:
+        return key
+
+
+class HelpTextKey(NamedTuple):
+    """ Everything the rendered help text depends on, besides the spec data """
+    prog: str
+    terminal_width: int
+    text_width: int
+
+
+class HelpText(NamedTuple):
+    usage: str
+    help: str
+    # so an unknown url can be reported the way argparse would, with all the valid choices
+    urls: List[str]
+
+    def to_obj(self) -> Dict[str, Any]:
+        return self._asdict()
+
+    @classmethod
+    def from_obj(cls, obj: Dict[str, Any]) -> 'HelpText':
+        return cls(**obj)
+
+
+class HelpTextCache(FileCache[HelpTextKey, HelpText]):
+    def freeze(self, value: HelpText) -> str:
+        return json.dumps(value.to_obj())
+
+    def thaw(self, frozen_value: TextIO) -> HelpText:
+        return HelpText.from_obj(json.loads(frozen_value.read()))
+
+    def freeze_key(self, key: HelpTextKey) -> str:
+        return json.dumps(key)
+
+
+class CachedHelpArgumentParser(argparse.ArgumentParser):
+    """ Serves help and usage which were rendered when the spec caches were built """
+
+    def __init__(self, *args: Any, help_text: HelpText, **kwargs: Any):
+        super().__init__(*args, **kwargs)
+        self.help_text = help_text
+
+    def format_usage(self) -> str:
+        return self.help_text.usage
+
+    def format_help(self) -> str:
+        return self.help_text.help
+
+
+class SpecFileContents(NamedTuple):
+    urls: List[UrlToCache]
+    endpoints: List[EndpointToCache]
 
 
 class CompletionArgs(NamedTuple):
@@ -494,9 +923,42 @@ class ValuesAddArgs(NamedTuple):
     values: List[str]
 
 
+class ValuesImportArgs(NamedTuple):
+    param_name: str
+    file: str
+    jsonl: bool
+
+
+class ValuesExportArgs(NamedTuple):
+    param_name: str
+    jsonl: bool
+
+
+class DaemonArgs(NamedTuple):
+    socket_path: str
+
+
+class BenchArgs(NamedTuple):
+    # None for as many as can be sent in the duration
+    requests: Optional[int]
+    # seconds
+    duration: Optional[float]
+    concurrency: int
+
+
+class BatchArgs(NamedTuple):
+    file: str
+    concurrency: int
+    ordered: bool
+    curl_config: bool = False
+
+
 class GenericArgs(NamedTuple):
     print_cmd: bool = False
     run_cmd: bool = False
+    in_process: bool = False
+    print_curl_config: bool = False
+    bench_args: Optional[BenchArgs] = None
     util: bool = False
     zsh_completion_args: Optional[CompletionArgs] = None
     zsh_print_script: bool = False
@@ -504,7 +966,14 @@ class GenericArgs(NamedTuple):
     values_ls_for_param: Optional[str] = None
     values_rm_args: Optional[ValuesRmArgs] = None
     values_add_args: Optional[ValuesAddArgs] = None
+    values_import_args: Optional[ValuesImportArgs] = None
+    values_export_args: Optional[ValuesExportArgs] = None
     rebuild_cache: bool = False
+    cache_stats: bool = False
+    jobs: Optional[int] = None
+    daemon_args: Optional[DaemonArgs] = None
+    batch_args: Optional[BatchArgs] = None
+    fan_out: Optional['FanOut'] = None
 
 
 class CompletionItem(NamedTuple):
@@ -512,12 +981,156 @@ class CompletionItem(NamedTuple):
     description: Optional[str]
 
 
+class CarlRequest(NamedTuple):
+    """ What a command comes to, which can be sent with curl or in-process (see http_executor) """
+    method: str
+    url: str
+    headers: List[Tuple[str, str]]
+    # json
+    body: Optional[str] = None
+    # passed to curl after the rest of the command
+    curl_args: List[str] = []
+
+    def get_all_headers(self) -> List[Tuple[str, str]]:
+        if self.body is not None:
+            return [*self.headers, ('Content-Type', 'application/json')]
+        else:
+            return self.headers
+
+    def to_curl_cmd(self) -> List[str]:
+        cmd = ['curl', '-X', self.method, self.url]
+        for name, value in self.get_all_headers():
+            cmd.extend(['-H', f"{name}: {value}"])
+        if self.body is not None:
+            cmd.extend(['--data-binary', self.body])
+        cmd.extend(self.curl_args)
+        return cmd
+
+    def to_curl_config(self) -> List[str]:
+        """ The same as to_curl_cmd(), as the lines of a curl config file (see `curl --config`) """
+        if self.curl_args:
+            # which of them take values can't be known, so they can't be put into lines
+            raise ValueError(f"Can't put arguments to curl in a config: {' '.join(self.curl_args)}")
+        lines = [f"request = {curl_config_quote(self.method)}\n", f"url = {curl_config_quote(self.url)}\n"]
+        for name, value in self.get_all_headers():
+            lines.append(f"header = {curl_config_quote(f'{name}: {value}')}\n")
+        if self.body is not None:
+            lines.append(f"data-binary = {curl_config_quote(self.body)}\n")
+        return lines
+
+
+CURL_CONFIG_ESCAPES = str.maketrans({'\\': '\\\\', '"': '\\"', '\n': '\\n', '\r': '\\r', '\t': '\\t', '\v': '\\v'})
+
+
+def curl_config_quote(value: str) -> str:
+    """ A double-quoted curl config value, which is the only kind that can have spaces, quotes or newlines """
+    return '"' + value.translate(CURL_CONFIG_ESCAPES) + '"'
+
+
+def get_curl_config_lines(requests: Iterable[CarlRequest], parallel_max: Optional[int] = None) -> Iterator[str]:
+    """ One curl config for all the requests, sending up to parallel_max at a time """
+    if parallel_max is not None:
+        yield 'parallel\n'
+        yield f"parallel-max = {parallel_max}\n"
+    for i, request in enumerate(requests):
+        if i > 0:
+            yield 'next\n'
+        yield from request.to_curl_config()
+
+
+# the values of a param (by its arg name, without the "+") for a request, from --fan-out or a row of --fan-out-file
+FanOutParams = Dict[str, List[ParamValue]]
+
+
+class FanOut(NamedTuple):
+    """ A command with --fan-out or --fan-out-file, sent as a request for each combination of values """
+    url_template: str
+    method: str
+    param_arg_pairs: ArgPairs
+    body_json: Dict[str, Any]
+    curl_args: List[str]
+    fan_out_params: List[str]
+    # all the endpoint's params, by arg name without the "+", for the --fan-out-file's columns
+    params_by_name: Dict[str, CarlParam]
+    file: Optional[str]
+    concurrency: int
+
+    def get_fan_out_values(self) -> List[FanOutParams]:
+        """ Each combination of the --fan-out params' values """
+        values_by_name: Dict[str, List[ParamValue]] = {name: [] for name in self.fan_out_params}
+        for param, value in self.param_arg_pairs:
+            arg_name = param.get_arg_name()[1:]
+            if arg_name in values_by_name:
+                values_by_name[arg_name].append(value)
+        return [
+            {name: [value] for name, value in zip(self.fan_out_params, values)}
+            for values in itertools.product(*values_by_name.values())
+        ]
+
+    def get_requests(self, rows: Optional[Iterable[FanOutParams]] = None) \
+            -> Iterator[Tuple[Dict[str, ParamValue], CarlRequest]]:
+        """ Each request, with the values of the params it was fanned out for """
+        fan_out_values = self.get_fan_out_values()
+        for row in (rows if rows is not None else [{}]):
+            for values in fan_out_values:
+                request_params = {**values, **row}
+                param_arg_pairs = [
+                    (param, value) for param, value in self.param_arg_pairs
+                    if param.get_arg_name()[1:] not in request_params
+                ]
+                for name, values_ in request_params.items():
+                    param_arg_pairs.extend((self.params_by_name[name], v) for v in values_)
+                request = arg_pairs_to_request(
+                    self.url_template, self.method, param_arg_pairs, self.body_json, self.curl_args
+                )
+                yield {n: v[0] if len(v) == 1 else v for n, v in request_params.items()}, request
+
+
 UTILS_COMPLETION_ITEM = CompletionItem('utils', 'Utilities')
 
 
-class CarlServer(NamedTuple):
-    url: str
-    params: List[CarlParam]
+class CacheStats(NamedTuple):
+    name: str
+    entries: int
+    bytes: int
+    hits: int
+    misses: int
+
+
+class ImportedValues(NamedTuple):
+    # distinct values read
+    read: int
+    # of those, the ones still cached, since at most CARL_MAX_HISTORY are
+    kept: int
+
+    @property
+    def dropped(self) -> int:
+        return self.read - self.kept
+
+
+class CacheHitsCache(FileCache[None, Dict[str, Tuple[int, int]]]):
+    """ Each process's cache hits and misses, appended as a line of json (see CARL_CACHE_STATS) """
+
+    def freeze(self, value: Dict[str, Tuple[int, int]]) -> str:
+        return json.dumps(value) + '\n'
+
+    def thaw(self, frozen_value: TextIO) -> Dict[str, Tuple[int, int]]:
+        hits_and_misses: Dict[str, Tuple[int, int]] = {}
+        for line in frozen_value:
+            for name, (hits, misses) in json.loads(line).items():
+                total_hits, total_misses = hits_and_misses.get(name, (0, 0))
+                hits_and_misses[name] = (total_hits + hits, total_misses + misses)
+        return hits_and_misses
+
+    def freeze_key(self, key: None) -> str:
+        return 'CACHE-HITS-KEY'
+
+    def get_value(self) -> Dict[str, Tuple[int, int]]:
+        return self.get(None, {})
+
+    def append(self, hits_and_misses: Dict[str, Tuple[int, int]]) -> None:
+        self._process_cache.pop(None, None)
+        self._backend.append(self._get_key_hash(None), self.freeze(hits_and_misses))
 
 
 class MockSingletonCache(dict):
@@ -532,280 +1145,402 @@ class MockSingletonCache(dict):
         self[None] = value
 
 
+class MockArgCache(dict):
+    def append(self, key: str, value: ParamValue, log_score: float) -> None:
+        self.setdefault(key, ArgValuesHistory(get_max_history())).record(value, log_score)
+
+    def search(self, key: str, prefix: str) -> List[str]:
+        return self[key].search(prefix) if key in self else []
+
+
 class SwaggerRepo:
 
-    def __init__(self, files: Optional[List[str]] = None, ephemeral: bool = False, warnings: bool = True):
+    def __init__(self, files: Optional[List[str]] = None, ephemeral: bool = False, warnings: bool = True,
+                 jobs: Optional[int] = None, refresh: bool = True):
+        if jobs is None:
+            jobs = get_jobs()
+        self.jobs = jobs or (os.cpu_count() or 1)
+
+        self.cache_store: Optional[CacheStore]
         if not ephemeral:
-            self.time_cache = TimeCache('time')
+            self.cache_store = get_cache_store()
+            self.spec_fingerprints_cache = SpecFingerprintsCache('spec_fingerprints')
+            self.spec_file_urls_cache = SpecFileUrlsCache('spec_file_urls')
+            self.spec_file_endpoints_cache = SpecFileEndpointsCache('spec_file_endpoints')
             self.urls_cache = UrlsCache('urls')
+            self.urls_prefix_index_cache = UrlsPrefixIndexCache('urls_prefix_index')
+            self.url_tree_cache = UrlTreeCache('url_tree')
             self.params_with_cached_values_cache = ParamsWithCachedValuesCache('params_with_cached_values')
             self.methods_cache = MethodsCache('methods')
             self.endpoint_cache = EndpointCache('endpoint')
+            # versioned, since the tables in the unversioned cache store enums as a list, not an EnumIndex
+            self.completion_table_cache = CompletionTableCache('completion_table_v2')
+            self.help_text_cache = HelpTextCache('help_text')
             self.arg_value_cache = ArgCache('arg_values')
+            if boolean_type(CACHE_STATS_ENV.get_value()):
+                atexit.register(self.record_cache_hits)
         else:
             # this is a testing case, so make all caches are ephemeral
             # casting dicts should be OK, since they should have a subset of the
             # functions implemented in FileCache
-            self.time_cache = cast(TimeCache, MockSingletonCache(0))
+            self.cache_store = None
+            self.spec_fingerprints_cache = cast(SpecFingerprintsCache, MockSingletonCache({}))
+            self.spec_file_urls_cache = cast(SpecFileUrlsCache, {})
+            self.spec_file_endpoints_cache = cast(SpecFileEndpointsCache, {})
             self.urls_cache = cast(UrlsCache, MockSingletonCache([]))
+            self.urls_prefix_index_cache = cast(UrlsPrefixIndexCache, MockSingletonCache([]))
+            self.url_tree_cache = cast(UrlTreeCache, {})
             self.params_with_cached_values_cache = cast(ParamsWithCachedValuesCache, MockSingletonCache([]))
             self.methods_cache = cast(MethodsCache, {})
             self.endpoint_cache = cast(EndpointCache, {})
-            self.arg_value_cache = cast(ArgCache, {})
+            self.completion_table_cache = cast(CompletionTableCache, {})
+            self.help_text_cache = cast(HelpTextCache, {})
+            self.arg_value_cache = cast(ArgCache, MockArgCache())
+
+        self.use_spec_snapshot = not ephemeral and boolean_type(SPEC_SNAPSHOT_ENV.get_value())
+        self.spec_snapshot: Optional[Snapshot] = None
 
-        if files is None:
+        self._files = files
+        if refresh:
+            self.refresh(warnings=warnings)
+
+    def refresh(self, warnings: bool = False) -> None:
+        if self._files is None:
             os.makedirs(OPEN_API_DIR, exist_ok=True)
             swagger_files = list(get_files_in_dir(OPEN_API_DIR))
         else:
-            swagger_files = files
+            swagger_files = self._files
 
         if len(swagger_files) == 0:
             # make sure the cached data is clear
             self.clear_all_spec_caches()
         else:
-            cache_time = self.time_cache.get_value()
-            yaml_files_time = max(os.path.getmtime(f) for f in swagger_files)
-            if yaml_files_time > cache_time:
-                self.clear_all_spec_caches()
-                self.load_swagger_data(swagger_files=swagger_files, warnings=warnings)
+            self.refresh_spec_caches(swagger_files, warnings=warnings)
+
+    def reload(self, warnings: bool = False) -> None:
+        """ Picks up changes to the spec files and cached values, for long-running processes """
+        fingerprints = self.spec_fingerprints_cache.get_value()
+        clear_process_cache(self.spec_fingerprints_cache)
+        if self.spec_fingerprints_cache.get_value() != fingerprints:
+            # another process rebuilt the spec caches
+            self.clear_spec_process_caches()
+        clear_process_cache(self.params_with_cached_values_cache)
+        clear_process_cache(self.arg_value_cache)
+
+        self.refresh(warnings=warnings)
+
+    def clear_spec_process_caches(self) -> None:
+        for spec_cache in (self.spec_file_urls_cache, self.spec_file_endpoints_cache, self.urls_prefix_index_cache,
+                           self.url_tree_cache, self.methods_cache, self.endpoint_cache, self.completion_table_cache,
+                           self.help_text_cache):
+            clear_process_cache(spec_cache)
+
+    def get_caches(self) -> List[FileCache]:
+        """ Not for ephemeral repos, whose caches are just dicts """
+        return [
+            self.spec_fingerprints_cache, self.spec_file_urls_cache, self.spec_file_endpoints_cache, self.urls_cache,
+            self.urls_prefix_index_cache, self.url_tree_cache, self.params_with_cached_values_cache,
+            self.methods_cache, self.endpoint_cache, self.completion_table_cache, self.help_text_cache,
+            self.arg_value_cache
+        ]
+
+    def record_cache_hits(self) -> None:
+        hits_and_misses = {
+            cache.name: (cache.hits, cache.misses) for cache in self.get_caches() if cache.hits or cache.misses
+        }
+        if hits_and_misses:
+            CacheHitsCache('cache_hits').append(hits_and_misses)
+
+    def get_cache_stats(self) -> List[CacheStats]:
+        hits_and_misses = CacheHitsCache('cache_hits').get_value()
+        cache_stats: List[CacheStats] = []
+        for cache in self.get_caches():
+            entries = cache.entries()
+            hits, misses = hits_and_misses.get(cache.name, (0, 0))
+            cache_stats.append(CacheStats(
+                name=cache.name,
+                entries=len(entries),
+                bytes=sum(e.size for e in entries),
+                hits=hits,
+                misses=misses
+            ))
+        return cache_stats
+
+    def enforce_cache_budget(self) -> None:
+        """ Drops the least recently used params' values, past CARL_CACHE_MAX_ENTRIES/_BYTES """
+        if self.cache_store is None:
+            return
+        params_with_cached_values = self.params_with_cached_values_cache.get_value()
+        evicted_params = self.arg_value_cache.evict_least_recently_used(
+            max_entries=int(CACHE_MAX_ENTRIES_ENV.get_value()),
+            max_bytes=int(CACHE_MAX_BYTES_ENV.get_value()),
+            keys=params_with_cached_values
+        )
+        if evicted_params:
+            self.params_with_cached_values_cache.set_value([
+                p for p in params_with_cached_values if p not in evicted_params
+            ])
 
     def clear_all_spec_caches(self) -> None:
-        self.time_cache.clear()
+        self.spec_fingerprints_cache.clear()
+        self.spec_file_urls_cache.clear()
+        self.spec_file_endpoints_cache.clear()
         self.urls_cache.clear()
+        self.urls_prefix_index_cache.clear()
+        self.url_tree_cache.clear()
         self.methods_cache.clear()
         self.endpoint_cache.clear()
+        self.completion_table_cache.clear()
+        self.help_text_cache.clear()
+        if self.cache_store is not None:
+            self.close_spec_snapshot()
+            try:
+                os.remove(get_spec_snapshot_path())
+            except FileNotFoundError:
+                pass
 
-    def load_swagger_data(self, swagger_files: Optional[Iterable[str]], warnings: bool = False):
-        cache_time = datetime.now().timestamp()
-        multi_swagger_data = self.parse_swagger_files(swagger_files, warnings=warnings)
+    def refresh_spec_caches(self, swagger_files: List[str], warnings: bool = False) -> None:
+        """ Reloads the spec files which changed since the caches were built, holding the spec lock """
+        cached_fingerprints = self.spec_fingerprints_cache.get_value()
+        fingerprints, stale_files, removed_files = get_stale_spec_files(swagger_files, cached_fingerprints)
+
+        if fingerprints != cached_fingerprints:
+            with self.spec_lock():
+                # another process may have rebuilt the caches while this one was waiting for the lock
+                clear_process_cache(self.spec_fingerprints_cache)
+                if self.spec_fingerprints_cache.get_value() != cached_fingerprints:
+                    self.clear_spec_process_caches()
+                    cached_fingerprints = self.spec_fingerprints_cache.get_value()
+                    fingerprints, stale_files, removed_files = get_stale_spec_files(swagger_files, cached_fingerprints)
+
+                # parsed before the transaction, which would keep other processes from caching values (or anything
+                # else) for as long as parsing takes
+                stale_file_contents = list(self.parse_spec_files(stale_files, warnings=warnings))
+                with self.cache_transaction():
+                    if stale_files or removed_files:
+                        self.load_swagger_data(
+                            swagger_files=swagger_files,
+                            stale_files=stale_files,
+                            removed_files=removed_files,
+                            warnings=warnings,
+                            stale_file_contents=stale_file_contents
+                        )
+                    if fingerprints != cached_fingerprints:
+                        self.spec_fingerprints_cache.set_value(fingerprints)
+        if self.use_spec_snapshot:
+            self.refresh_spec_snapshot(get_fingerprints_digest(fingerprints))
+
+    def refresh_spec_snapshot(self, digest: bytes) -> None:
+        """ Opens the snapshot, first recompiling it if the spec files have changed """
+        if self.spec_snapshot is not None and self.spec_snapshot.digest == digest:
+            return
+        self.close_spec_snapshot()
+
+        snapshot_path = get_spec_snapshot_path()
+        spec_snapshot = Snapshot.open(snapshot_path)
+        if spec_snapshot is None or spec_snapshot.digest != digest:
+            if spec_snapshot is not None:
+                spec_snapshot.close()
+            with self.spec_lock():
+                spec_snapshot = Snapshot.open(snapshot_path)
+                if spec_snapshot is None or spec_snapshot.digest != digest:
+                    # not already compiled by another process while this one was waiting for the lock
+                    if spec_snapshot is not None:
+                        spec_snapshot.close()
+                    self.write_spec_snapshot(snapshot_path, digest)
+                    spec_snapshot = Snapshot.open(snapshot_path)
+        self.spec_snapshot = spec_snapshot
+
+    def write_spec_snapshot(self, snapshot_path: str, digest: bytes) -> None:
+        """ Compiles the merged spec caches into the snapshot """
+        urls: List[Tuple[str, str]] = []
+        methods: List[Tuple[str, str]] = []
+        endpoints: List[Tuple[str, str]] = []
+        completion_tables: List[Tuple[str, str]] = []
+        for url_to_cache in self.urls_cache.get_value():
+            urls.append((get_url_search_key(url_to_cache.url), json.dumps(url_to_cache.to_obj())))
+            cached_methods = self.methods_cache.get(url_to_cache.url, None)
+            if cached_methods is None:
+                continue
+            methods.append((url_to_cache.url, json.dumps(cached_methods.to_obj())))
+            for method in cached_methods.methods:
+                endpoint = self.endpoint_cache[url_to_cache.url, method]
+                endpoints.append((get_endpoint_key(url_to_cache.url, method), json.dumps(endpoint.to_obj())))
+                completion_tables.append((
+                    get_endpoint_key(url_to_cache.url, method), freeze_index(build_endpoint_completion_table(endpoint))
+                ))
 
-        urls_to_cache: MutableMapping[str, UrlToCache] = OrderedDict()
-        methods_to_cache: MutableMapping[str, MethodsToCache] = {}
-        for swagger_data_ in multi_swagger_data:
-            root_description = swagger_data_.info.description
-            root_summary = swagger_data_.info.summary or swagger_data_.info.title
-
-            carl_servers = list(self.to_carl_servers(swagger_data_.servers))
-            for path_str, path_spec in swagger_data_.get_lazy_paths(warnings=warnings):
-                # Note: this doesn't deal with relative servers, we might need to deal with that
-                # when fetching the spec
-                carl_servers_for_path: List[CarlServer]
-                if path_spec.servers:
-                    servers_for_path = list(self.to_carl_servers(path_spec.servers))
-                else:
-                    servers_for_path = carl_servers
-
-                path_description = path_spec.description or root_description
-                path_summary = path_spec.summary or root_summary
-
-                for method in Method.__members__.values():
-                    operation = self._get_operation(path_spec, method)
-                    if operation:
-                        if operation.servers:
-                            servers_for_op = list(self.to_carl_servers(operation.servers))
-                        else:
-                            servers_for_op = servers_for_path
-                        op_params: List[CarlParam] = []
-                        for parameter in operation.parameters or []:
-                            if isinstance(parameter, open_api.Parameter):
-                                param_type = self.schema_to_arg_type(parameter.param_schema)
-                                enums: Optional[ParamValue]
-                                if isinstance(parameter.param_schema, open_api.Schema):
-                                    enums = parameter.param_schema.enum
-                                else:
-                                    enums = None
-                                op_params.append(CarlParam(
-                                    name=parameter.name,
-                                    param_type=ParamType(parameter.param_in),
-                                    description=parameter.description,
-                                    required_=parameter.required,
-                                    type_=param_type,
-                                    enums=enums
-                                ))
-                            else:  # is a Reference
-                                # Hopefully we have already resolved the references
-                                pass
-                        if isinstance(operation.requestBody, open_api.RequestBody):
-                            params_from_body = self._get_params_from_body(operation.requestBody)
-                            op_params.extend(params_from_body)
-
-                        op_description = operation.description or path_description
-                        op_summary = operation.summary or path_summary
-                        for server in servers_for_op:
-                            endpoint_url = server.url + path_str
-                            parameters = server.params + op_params
-                            self.endpoint_cache[endpoint_url, method] = EndpointToCache(
-                                endpoint_url=endpoint_url,
-                                method=method,
-                                parameters=parameters,
-                                summary=op_summary,
-                                description=op_description
-                            )
-                            url_to_cache = UrlToCache(
-                                url=endpoint_url,
-                                summary=path_summary,
-                                description=path_description
-                            )
-                            if endpoint_url not in urls_to_cache:
-                                urls_to_cache[endpoint_url] = url_to_cache
-
-                            if endpoint_url in methods_to_cache:
-                                methods_to_cache[endpoint_url].methods.append(method)
-                            else:
-                                methods_to_cache[endpoint_url] = MethodsToCache(
-                                    url=url_to_cache,
-                                    methods=[method]
-                                )
-
-        for url, methods in methods_to_cache.items():
-            self.methods_cache[url] = methods
-
-        self.time_cache.set_value(cache_time)
-        self.urls_cache.set_value(urls_to_cache.values())
+        url_tree = build_url_tree(self.urls_cache.get_value())
+
+        write_snapshot(snapshot_path, digest, {
+            SNAPSHOT_URLS_TABLE: urls,
+            SNAPSHOT_METHODS_TABLE: methods,
+            SNAPSHOT_ENDPOINTS_TABLE: endpoints,
+            SNAPSHOT_URL_TREE_TABLE: ((node_key, json.dumps(node.to_obj())) for node_key, node in url_tree.items()),
+            SNAPSHOT_COMPLETION_TABLES_TABLE: completion_tables
+        })
+
+    def close_spec_snapshot(self) -> None:
+        if self.spec_snapshot is not None:
+            self.spec_snapshot.close()
+            self.spec_snapshot = None
+
+    def get_cached_methods(self, url: str) -> Optional[MethodsToCache]:
+        if self.spec_snapshot is not None:
+            methods_json = self.spec_snapshot.get(SNAPSHOT_METHODS_TABLE, url)
+            return MethodsToCache.from_obj(json.loads(methods_json)) if methods_json is not None else None
+        else:
+            return self.methods_cache.get(url, None)
+
+    def get_cached_endpoint(self, url: str, method: Method) -> EndpointToCache:
+        if self.spec_snapshot is not None:
+            endpoint_json = self.spec_snapshot.get(SNAPSHOT_ENDPOINTS_TABLE, get_endpoint_key(url, method))
+            if endpoint_json is None:
+                raise KeyError((url, method))
+            return EndpointToCache.from_obj(json.loads(endpoint_json))
+        else:
+            return self.endpoint_cache[url, method]
+
+    def get_completion_table(self, url: str, method: Method) -> List[str]:
+        if self.spec_snapshot is not None:
+            frozen_table = self.spec_snapshot.get(SNAPSHOT_COMPLETION_TABLES_TABLE, get_endpoint_key(url, method))
+            if frozen_table is None:
+                raise KeyError((url, method))
+            return thaw_index(frozen_table)
+        else:
+            completion_table = self.completion_table_cache.get((url, method), None)
+            if completion_table is None:
+                # the cache was built before it had completion tables
+                completion_table = build_endpoint_completion_table(self.endpoint_cache[url, method])
+                self.completion_table_cache[url, method] = completion_table
+            return completion_table
+
+    def search_urls(self, prefix: str) -> Iterable[UrlToCache]:
+        """ The urls which start with the prefix, ignoring case """
+        if self.spec_snapshot is not None:
+            for _, url_json in self.spec_snapshot.iter_prefix(SNAPSHOT_URLS_TABLE, prefix.lower()):
+                yield UrlToCache.from_obj(json.loads(url_json))
+        else:
+            yield from search_url_prefix_index(self.urls_prefix_index_cache.get_value(), prefix)
 
-    def parse_swagger_files(self, swagger_files: Optional[Iterable[str]], warnings: bool) \
-            -> Iterable[open_api.OpenApiLazy]:
-        if swagger_files is not None:
-            for file in swagger_files:
-                with open(file, 'r') as fh:
-                    loaded: Optional[Dict[str, Any]]
-                    try:
-                        loaded = load_yaml(fh)
-                    except yaml.parser.ParserError as e:
-                        if warnings:
-                            print('WARNING: ' + str(e), file=sys.stderr)
-                        loaded = None
-                    if loaded is not None:
-                        try:
-                            loaded = cast(Dict[str, Any], replace_json_refs(loaded, merge_props=True))
-                            loaded['unparsed_paths'] = loaded.pop('paths', {})
-                            yield open_api.OpenApiLazy.parse_obj(loaded)
-                        except Exception as e:
-                            if warnings:
-                                print(f"WARNING: Error in file {file!r}: {str(e)}", file=sys.stderr)
-                            else:
-                                # fail silently
-                                pass
-                    elif warnings:
-                        print(f"WARNING: Yaml error in file {file!r}", file=sys.stderr)
-                    else:
-                        # fail silently
-                        pass
-
-    @staticmethod
-    def to_carl_servers(servers: List[open_api.Server]) -> Iterable[CarlServer]:
-        for server in servers:
-            server_params: List[CarlParam] = []
-            defaulted_url: Optional[str] = None
-            if server.variables is not None:
-                defaults: Dict[str, str] = {}
-                for variable_name, variable_spec in server.variables.items():
-                    # this casting shouldn't be necessary, but mypy isn't happy it without it
-                    variable_enums = cast(Optional[List[ParamValue]], variable_spec.enum)
-                    server_params.append(CarlParam(
-                        name=variable_name,
-                        param_type=ParamType.path,
-                        description=variable_spec.description,
-                        enums=variable_enums,
-                        required_=False,
-                        default=variable_spec.default
-                    ))
-                    if variable_spec.default is not None:
-                        defaults[variable_name] = variable_spec.default
-                try:
-                    defaulted_url = server.url.format(**defaults)
-                except KeyError:
-                    pass
-            if defaulted_url is not None:
-                yield CarlServer(defaulted_url, [])
-            yield CarlServer(server.url, server_params)
-
-    @staticmethod
-    def _get_operation(path_spec: open_api.PathItem, method: Method) -> Optional[open_api.Operation]:
-        # maybe someday make this more type-safe
-        return getattr(path_spec, method.value.lower())
-
-    @staticmethod
-    def schema_to_arg_type(schema: Optional[open_api.Schema]) -> ArgTypeModel:
-        if schema is None:
-            return ArgTypeModel(type_=ArgTypeEnum.string)
-        schema_type = schema.type
-        schema_items = schema.items
-        if schema_type is None or schema_type == []:
-            # default
-            return ArgTypeModel(type_=ArgTypeEnum.string)
+    def get_url_tree_node(self, node_key: str) -> Optional[UrlTreeNode]:
+        if self.spec_snapshot is not None:
+            node_json = self.spec_snapshot.get(SNAPSHOT_URL_TREE_TABLE, node_key)
+            return UrlTreeNode.from_obj(json.loads(node_json)) if node_json is not None else None
         else:
-            schema_type_: str
-            if isinstance(schema_type, List):
-                # don't know how to handle multiple types yet
-                schema_type_ = schema_type[0]
-            else:
-                schema_type_ = schema_type
+            return self.url_tree_cache.get(node_key, None)
 
-            if schema_type_ == SpecialSwaggerTypeStrs.object:
-                return ArgTypeModel(type_=ArgTypeEnum.json)
-            elif schema_type_ == SpecialSwaggerTypeStrs.array:
-                if schema_items is None:
-                    return ArgTypeModel(type_=ArgTypeEnum.string, is_array=True)
-                else:
-                    items_type = SwaggerRepo.schema_to_arg_type(open_api.Schema(
-                        type=schema_items.type,
-                        items=None
-                    ))
-                    if items_type.is_array:
-                        return ArgTypeModel(
-                            type_=ArgTypeEnum.json,
-                            is_array=True
-                        )
-                    else:
-                        return ArgTypeModel(
-                            type_=items_type.type_,
-                            is_array=True
-                        )
-            else:
-                arg_type_enum = ArgTypeEnum(schema_type_)
-                return ArgTypeModel(
-                    type_=arg_type_enum,
-                    is_array=False
-                )
+    def cache_transaction(self) -> ContextManager[None]:
+        """ Holds off other processes' writes, for a read-modify-write of the cache store """
+        if self.cache_store is not None:
+            return self.cache_store.transaction()
+        else:
+            return nullcontext()
 
-    def _get_params_from_body(self, request_body: open_api.RequestBody) -> Iterable[CarlParam]:
-        for json_mime_type in ('application/json', 'json'):
-            if json_mime_type in request_body.content:
-                schema = request_body.content[json_mime_type].media_type_schema
-                if isinstance(schema, open_api.Schema) \
-                        and schema.type == SpecialSwaggerTypeStrs.object \
-                        and schema.properties:
-                    if schema.required is not None:
-                        required_props = set(schema.required)
-                    else:
-                        required_props = set()
-                    for prop_name, prop_schema in schema.properties.items():
-                        carl_param_type = self.schema_to_arg_type(prop_schema)
-                        if isinstance(prop_schema, open_api.Schema):
-                            description = prop_schema.description
-                            enums = prop_schema.enum
-                        else:
-                            description = None
-                            enums = None
-
-                        yield CarlParam(
-                            name=prop_name,
-                            param_type=ParamType.json_body,
-                            description=description,
-                            required_=(prop_name in required_props),
-                            type_=carl_param_type,
-                            enums=enums
-                        )
-                else:
-                    # Can't handle these yet
-                    pass
-            else:
-                # Can't handle anything else yet
-                pass
+    def spec_lock(self) -> ContextManager[None]:
+        """ Held while the spec caches are being rebuilt, so only one process rebuilds them """
+        if self.cache_store is not None:
+            return self.cache_store.lock('spec')
+        else:
+            return nullcontext()
+
+    def load_swagger_data(self, swagger_files: List[str], stale_files: Optional[List[str]] = None,
+                          removed_files: Sequence[str] = (), warnings: bool = False,
+                          stale_file_contents: Optional[Iterable[SpecFileContents]] = None) -> None:
+        """ Parses the stale files and rebuilds the entries of the urls they contribute to """
+        if stale_files is None:
+            stale_files = swagger_files
+        if stale_file_contents is None:
+            stale_file_contents = self.parse_spec_files(stale_files, warnings=warnings)
+
+        affected_urls: Set[str] = set()
+        for file in itertools.chain(removed_files, stale_files):
+            for url_to_cache in self.spec_file_urls_cache.get(file, []):
+                affected_urls.add(url_to_cache.url)
+        for file in removed_files:
+            if file in self.spec_file_urls_cache:
+                del self.spec_file_urls_cache[file]
+            if file in self.spec_file_endpoints_cache:
+                del self.spec_file_endpoints_cache[file]
+        for file, spec_file_contents in zip(stale_files, stale_file_contents):
+            self.spec_file_urls_cache[file] = spec_file_contents.urls
+            self.spec_file_endpoints_cache[file] = spec_file_contents.endpoints
+            for url_to_cache in spec_file_contents.urls:
+                affected_urls.add(url_to_cache.url)
+
+        urls_to_cache: MutableMapping[str, UrlToCache] = OrderedDict()
+        files_with_affected_urls: List[str] = []
+        for file in swagger_files:
+            file_urls = self.spec_file_urls_cache.get(file, [])
+            for url_to_cache in file_urls:
+                if url_to_cache.url not in urls_to_cache:
+                    urls_to_cache[url_to_cache.url] = url_to_cache
+            if any(u.url in affected_urls for u in file_urls):
+                files_with_affected_urls.append(file)
+
+        endpoints_to_cache: Dict[EndpointKey, EndpointToCache] = {}
+        methods_for_urls: Dict[str, List[Method]] = defaultdict(list)
+        for file in files_with_affected_urls:
+            for endpoint in self.spec_file_endpoints_cache[file]:
+                if endpoint.endpoint_url in affected_urls:
+                    endpoint_key = (endpoint.endpoint_url, endpoint.method)
+                    if endpoint_key not in endpoints_to_cache:
+                        methods_for_urls[endpoint.endpoint_url].append(endpoint.method)
+                    endpoints_to_cache[endpoint_key] = endpoint
+
+        for url in affected_urls:
+            previously_cached_methods = self.methods_cache.get(url, None)
+            methods = methods_for_urls.get(url, [])
+            if previously_cached_methods is not None:
+                for method in previously_cached_methods.methods:
+                    if method not in methods:
+                        del self.endpoint_cache[url, method]
+                        if (url, method) in self.completion_table_cache:
+                            del self.completion_table_cache[url, method]
+            if methods:
+                self.methods_cache[url] = MethodsToCache(url=urls_to_cache[url], methods=methods)
+            elif previously_cached_methods is not None:
+                del self.methods_cache[url]
+
+        for endpoint_key, endpoint in endpoints_to_cache.items():
+            self.endpoint_cache[endpoint_key] = endpoint
+            self.completion_table_cache[endpoint_key] = build_endpoint_completion_table(endpoint)
+
+        self.urls_cache.set_value(urls_to_cache.values())
+        self.urls_prefix_index_cache.set_value(build_url_prefix_index(urls_to_cache.values()))
+        # the tree is small next to the endpoints, so it's simpler to rebuild all of it than work out what changed
+        self.url_tree_cache.clear()
+        for node_key, node in build_url_tree(urls_to_cache.values()).items():
+            self.url_tree_cache[node_key] = node
+
+        # any help text rendered for other terminal widths is out of date
+        self.help_text_cache.clear()
+        self.help_text_cache[get_help_text_key()] = self.render_help_text()
+
+    def parse_spec_files(self, files: List[str], warnings: bool) -> Iterable[SpecFileContents]:
+        """ Parses the files across `self.jobs` processes, returning the contents in the files' order """
+        # imported here, since parsing is the only thing that needs yaml, jsonref, etc.
+        from curl_arguments_url import spec_parser
+
+        if self.jobs <= 1 or len(files) <= 1:
+            for file in files:
+                yield spec_parser.parse_spec_file(file, warnings=warnings)
+        else:
+            from concurrent.futures import ProcessPoolExecutor
+
+            with ProcessPoolExecutor(max_workers=min(self.jobs, len(files))) as executor:
+                yield from executor.map(spec_parser.parse_spec_file, files, itertools.repeat(warnings))
 
     def cli_args_to_cmd(self, cli_args: Sequence[str]) \
             -> Tuple[Sequence[str], GenericArgs]:
+        request, generic_args = self.cli_args_to_request(cli_args)
+        if request is not None:
+            return request.to_curl_cmd(), generic_args
+        else:
+            return [], generic_args
+
+    def cli_args_to_request(self, cli_args: Sequence[str]) -> Tuple[Optional[CarlRequest], GenericArgs]:
+        """ The request is None for `carl utils ...` """
         # url is always the first arg
         url: Optional[str] = cli_args[0] if len(cli_args) >= 1 else None
 
@@ -813,7 +1548,7 @@ class SwaggerRepo:
         if url is None:
             valid_url_chosen = None
         else:
-            cached_methods = self.methods_cache.get(url, None)
+            cached_methods = self.get_cached_methods(url)
             if cached_methods is not None:
                 valid_url_chosen = cached_methods.url
             else:
@@ -821,14 +1556,13 @@ class SwaggerRepo:
 
         if not valid_url_chosen and url != UTILS_COMPLETION_ITEM.tag:
             # either this is a --help request or an error
-            no_url_parser = get_arg_parser()
-            url_subparsers = no_url_parser.add_subparsers(dest='url', required=True)
-
-            url_subparsers = add_utils_parser(url_subparsers)
-            possible_urls = self.urls_cache.get_value()
-            for possible_url in possible_urls:
-                possible_url_desc = possible_url.description or possible_url.summary
-                url_subparsers.add_parser(possible_url.url, help=possible_url_desc)
+            no_url_parser: argparse.ArgumentParser
+            if len(cli_args) == 2 and cli_args[0] in HELP_FLAGS:
+                # `carl --help <prefix>`: only the urls starting with the prefix
+                no_url_parser = get_no_url_parser(self.search_urls(cli_args[1]))
+                cli_args = cli_args[:1]
+            else:
+                no_url_parser = self.get_cached_help_no_url_parser()
 
             # This should give either the correct error or correct help message
             no_url_parser.parse_args(cli_args)
@@ -867,7 +1601,7 @@ class SwaggerRepo:
                 )
             else:
                 values_add_args = None
-            return [], GenericArgs(
+            return None, GenericArgs(
                 util=True,
                 zsh_completion_args=namespace_to_zsh_completion_args(parsed_args),
                 zsh_print_script=(parsed_args.util_type == ZSH_PRINT_SCRIPT_COMPLETION.tag),
@@ -878,15 +1612,25 @@ class SwaggerRepo:
                 values_ls_for_param=values_ls_for_param,
                 values_rm_args=values_rm_args,
                 values_add_args=values_add_args,
-                rebuild_cache=(parsed_args.util_type == REBUILD_CACHE_COMPLETION.tag)
+                values_import_args=namespace_to_values_import_args(parsed_args),
+                values_export_args=namespace_to_values_export_args(parsed_args),
+                rebuild_cache=(parsed_args.util_type == REBUILD_CACHE_COMPLETION.tag),
+                cache_stats=(parsed_args.util_type == CACHE_STATS_COMPLETION.tag),
+                jobs=getattr(parsed_args, 'jobs', None),
+                daemon_args=namespace_to_daemon_args(parsed_args),
+                batch_args=namespace_to_batch_args(parsed_args)
             )
         elif valid_url_chosen is not None:
             url_desc = valid_url_chosen.description or valid_url_chosen.summary
             use_requires = get_use_requires(cli_args)
+            fan_out_params = get_fan_out_params(cli_args)
             arg_parser = self.get_path_arg_parser(
                 url=valid_url_chosen.url,
                 url_desc=url_desc,
-                use_requires=use_requires
+                use_requires=use_requires,
+                # the method is always the second arg
+                selected_method=cli_args[1] if len(cli_args) >= 2 else None,
+                fan_out_params=fan_out_params
             )
 
             args = arg_parser.parse_args(cli_args)
@@ -896,53 +1640,127 @@ class SwaggerRepo:
             remaining: List[str] = getattr(args, REMAINING_ARG) or []
             param_arg_pairs = param_args_to_pairs(args)
             self.cache_param_arg_pairs(param_arg_pairs)
-
-            headers, param_arg_pairs = format_headers(param_arg_pairs)
             initial_post_data: Dict[str, Any] = args.body_json
-            post_data, param_arg_pairs = format_post_data(param_arg_pairs, initial_post_data)
-            formatted_url = format_url(url_, param_arg_pairs)
 
-            method_: str = method.value
+            fan_out: Optional[FanOut]
+            if fan_out_params or args.fan_out_file is not None:
+                endpoint = SwaggerEndpoint.from_cached_endpoint(self.get_cached_endpoint(url_, method))
+                params_by_name = {
+                    p.get_arg_name()[1:]: p for params_for_name in endpoint.params.values() for p in params_for_name
+                }
+                passed_params = {p.get_arg_name()[1:] for p, _ in param_arg_pairs}
+                for fan_out_param in fan_out_params:
+                    if fan_out_param not in passed_params:
+                        arg_parser.error(f"--fan-out {fan_out_param}: +{fan_out_param} has no values to fan out")
+                fan_out = FanOut(
+                    url_template=url_,
+                    method=method.value,
+                    param_arg_pairs=param_arg_pairs,
+                    body_json=initial_post_data,
+                    curl_args=remaining,
+                    fan_out_params=fan_out_params,
+                    params_by_name=params_by_name,
+                    file=args.fan_out_file,
+                    concurrency=args.concurrency
+                )
+            else:
+                fan_out = None
+
+            bench_args: Optional[BenchArgs]
+            if args.bench:
+                if fan_out is not None:
+                    arg_parser.error("--bench can't be used with --fan-out or --fan-out-file")
+                if remaining:
+                    arg_parser.error(f"--bench sends requests in-process, so it can't take arguments to curl:"
+                                     f" {' '.join(remaining)}")
+                bench_args = BenchArgs(
+                    requests=args.bench_requests,
+                    duration=args.bench_duration,
+                    concurrency=args.concurrency
+                )
+            else:
+                bench_args = None
 
             generic_args = GenericArgs(
                 print_cmd=args.print_cmd,
-                run_cmd=args.run_cmd
+                run_cmd=args.run_cmd,
+                in_process=args.in_process,
+                print_curl_config=args.print_curl_config,
+                bench_args=bench_args,
+                fan_out=fan_out
             )
 
-            return ['curl', '-X', method_, formatted_url, *headers, *post_data, *remaining], generic_args
+            request = arg_pairs_to_request(url_, method.value, param_arg_pairs, initial_post_data, remaining)
+            return request, generic_args
         else:
             raise NotImplementedError()
 
+    def render_help_text(self) -> HelpText:
+        possible_urls = list(self.urls_cache.get_value())
+        no_url_parser = get_no_url_parser(possible_urls)
+        return HelpText(
+            usage=no_url_parser.format_usage(),
+            help=no_url_parser.format_help(),
+            urls=[u.url for u in possible_urls]
+        )
+
+    def get_cached_help_no_url_parser(self) -> argparse.ArgumentParser:
+        help_text_key = get_help_text_key()
+        help_text = self.help_text_cache.get(help_text_key, None)
+        if help_text is None:
+            # first time at this terminal width
+            help_text = self.render_help_text()
+            self.help_text_cache[help_text_key] = help_text
+
+        no_url_parser = get_arg_parser(help_text=help_text)
+        url_subparsers = no_url_parser.add_subparsers(
+            dest='url', required=True, parser_class=argparse.ArgumentParser
+        )
+        add_utils_parser(url_subparsers)
+        # argparse only needs the names of the urls, to list them when an unknown one is given
+        url_choices = cast(Dict[str, Any], url_subparsers.choices)
+        url_choices.update(dict.fromkeys(help_text.urls))
+        return no_url_parser
+
     def cache_param_arg_pairs(self, param_args: ArgPairs) -> None:
-        param_names: List[str] = []
-        for param, value in param_args:
-            key = param.name
-            param_names.append(key)
-            arg_history: List[ParamValue] = self.arg_value_cache.get(key, [])
-
-            new_history: List[ParamValue] = [value] + [a for a in arg_history if a != value]
-            new_history = new_history[:MAX_HISTORY]
-            self.arg_value_cache[key] = new_history
-        existing_param_names = self.params_with_cached_values_cache.get_value()
-        params_with_cached_values = list(set(param_names + existing_param_names))
-        params_with_cached_values = sorted(params_with_cached_values)
-        self.params_with_cached_values_cache.set_value(params_with_cached_values)
-
-    def get_path_arg_parser(self, url: str, use_requires: bool, url_desc: Optional[str] = None) \
-            -> argparse.ArgumentParser:
-        methods = self.methods_cache[url].methods
+        """ Appends each value to its param's log, without reading what's cached """
+        param_names: Set[str] = set()
+        log_score = get_frecency_log_score(time.time())
+        with self.cache_transaction():
+            for param, value in param_args:
+                param_names.add(param.name)
+                self.arg_value_cache.append(param.name, value, log_score)
+            clear_process_cache(self.params_with_cached_values_cache)
+            existing_param_names = self.params_with_cached_values_cache.get_value()
+            if not param_names.issubset(existing_param_names):
+                self.params_with_cached_values_cache.set_value(sorted(param_names.union(existing_param_names)))
+                self.enforce_cache_budget()
+
+    def get_path_arg_parser(self, url: str, use_requires: bool, url_desc: Optional[str] = None,
+                            selected_method: Optional[str] = None,
+                            fan_out_params: Sequence[str] = ()) -> argparse.ArgumentParser:
+        """ Only the selected method's parser gets the endpoint's arguments """
+        cached_methods = self.get_cached_methods(url)
+        if cached_methods is None:
+            raise KeyError(url)
+        methods = cached_methods.methods
         arg_parser = get_arg_parser()
         url_subparsers = arg_parser.add_subparsers(dest='url', required=True)
         url_parser = url_subparsers.add_parser(url, help=url_desc)
         method_subparsers = url_parser.add_subparsers(dest='method', required=True)
         for method in methods:
-            endpoint = self.endpoint_cache[url, method]
+            if method.value != selected_method:
+                method_subparsers.add_parser(method.value)
+                continue
+            endpoint = self.get_cached_endpoint(url, method)
             method_desc = endpoint.description or endpoint.summary
             method_parser = method_subparsers.add_parser(method.value, description=method_desc, prefix_chars='+-')
             method_parser = add_generic_args(method_parser)
 
             swagger_endpoint = SwaggerEndpoint.from_cached_endpoint(endpoint)
-            method_parser = swagger_endpoint.add_args_from_params(method_parser, use_requires=use_requires)
+            method_parser = swagger_endpoint.add_args_from_params(
+                method_parser, use_requires=use_requires, fan_out_params=fan_out_params
+            )
 
             method_parser.add_argument(REMAINING_ARG, nargs='*',
                                        help='Extra argument passed to curl, often after "--"')
@@ -956,6 +1774,7 @@ class SwaggerRepo:
             else:
                 words_.append(word)
         items_to_return: List[CompletionItem] = []
+        sort_by_tag = True
         if index == 0:
             items_to_return.append(CompletionItem(tag='carl', description=None))
         elif index == 1:
@@ -963,9 +1782,10 @@ class SwaggerRepo:
             prefix: str = words_[1] or ''
             if UTILS_COMPLETION_ITEM.tag.lower().startswith(prefix.lower()):
                 items_to_return.append(UTILS_COMPLETION_ITEM)
-            possible_urls = self.urls_cache.get_value()
-            for possible_url in possible_urls:
-                if possible_url.url.lower().startswith(prefix.lower()):
+            if URL_COMPLETION_ENV.get_value() == URL_COMPLETION_SEGMENTS:
+                items_to_return.extend(self.get_url_segment_completions(prefix))
+            else:
+                for possible_url in self.search_urls(prefix):
                     description = possible_url.summary or possible_url.description
                     items_to_return.append(CompletionItem(
                         tag=possible_url.url,
@@ -978,7 +1798,7 @@ class SwaggerRepo:
             url = words_[1]
             prefix = words_[2]
 
-            cached_methods = self.methods_cache.get(url, None)
+            cached_methods = self.get_cached_methods(url)
             possible_methods: List[Method]
             if cached_methods is not None:
                 possible_methods = cached_methods.methods
@@ -987,7 +1807,7 @@ class SwaggerRepo:
 
             for method in possible_methods:
                 if method.value.lower().startswith(prefix.lower()):
-                    endpoint = self.endpoint_cache[url, method]
+                    endpoint = self.get_cached_endpoint(url, method)
                     description = endpoint.summary or endpoint.description
                     items_to_return.append(CompletionItem(
                         tag=method.value,
@@ -1000,89 +1820,81 @@ class SwaggerRepo:
             except ValueError:
                 return []
 
-            param_ref = self.get_param_ref_this_is_value_for(words_[3:index + 1])
+            context = get_completion_context(words_[3:index + 1])
             prefix = words_[index]
-            if param_ref is None:
+            if context.type_ == CompletionContextType.param:
                 items_to_return.extend(self.get_param_completions(url, method, prefix=prefix))
-            else:
-                enums = self.get_enums(url, method, param_ref)
-                if enums is not None:
-                    items_to_return.extend(get_completions_from_param_values(
-                        enums, prefix=prefix
-                    ))
+            elif context.type_ == CompletionContextType.param_value:
+                param_ref = cast(CarlParamReference, context.param_ref)
+                enum_index = self.get_enum_index(url, method, param_ref)
+                if enum_index is not None:
+                    items_to_return.extend(
+                        CompletionItem(tag=enum, description=None) for enum in search_enum_index(enum_index, prefix)
+                    )
                 else:
                     items_to_return.extend(self.get_completions_for_values_for_param(param_ref.param_name, prefix))
+                    # the cached values come ranked by frecency
+                    sort_by_tag = False
         else:
             items_to_return.append(CompletionItem(
                 tag=words_[index],
                 description=None
             ))
 
-        return sorted(items_to_return, key=lambda x: x.tag)
-
-    def get_enums(self, url: str, method: Method, param_ref: CarlParamReference) -> Optional[List[ParamValue]]:
-        cached_endpoint = self.endpoint_cache[url, Method(method)]
-        endpoint = SwaggerEndpoint.from_cached_endpoint(cached_endpoint)
-        param: Optional[CarlParam]
-        if param_ref.param_name in endpoint.params:
-            params_for_name = endpoint.params[param_ref.param_name]
-            if param_ref.param_type is not None:
-                for param_for_name in params_for_name:
-                    if param_for_name.param_type == param_ref.param_type:
-                        param = param_for_name
-                        break
-                else:
-                    param = None
-            elif len(params_for_name) == 1:
-                param = params_for_name[0]
-            else:
-                param = None
+        if sort_by_tag:
+            return sorted(items_to_return, key=lambda x: x.tag)
         else:
-            param = None
-
-        if param:
-            return param.enums
+            return items_to_return
+
+    def get_url_segment_completions(self, prefix: str) -> List[CompletionItem]:
+        """ Completes the url one segment at a time, from the url tree """
+        folded_prefix = prefix.lower()
+        for node_key in reversed([''] + get_url_segment_prefixes(folded_prefix)):
+            node = self.get_url_tree_node(node_key)
+            if node is not None:
+                break
         else:
-            return None
+            return []
+
+        segments = [s for s in node.segments if s.prefix.lower().startswith(folded_prefix)]
+        urls = [u for u in node.urls if u.url.lower().startswith(folded_prefix)]
+        if len(segments) == 1 and not urls:
+            # there's only one way to go, so go down a level instead of making the user complete again
+            return self.get_url_segment_completions(segments[0].prefix)
+
+        items: List[CompletionItem] = [
+            CompletionItem(tag=segment.prefix, description=f"{segment.url_count} urls") for segment in segments
+        ]
+        for url in urls:
+            items.append(CompletionItem(tag=url.url, description=url.summary or url.description))
+        return items
+
+    def get_enum_index(self, url: str, method: Method, param_ref: CarlParamReference) -> Optional[EnumIndex]:
+        """ A param with a type also matches "+param", if it's the only param with that name """
+        completion_table = self.get_completion_table(url, method)
+        arg_names = [f"+{param_ref.param_name}"]
+        if param_ref.param_type is not None:
+            arg_names.insert(0, f"+{param_ref.param_name}:{get_param_type_suffix(param_ref.param_type)}")
+        for arg_name in arg_names:
+            for entry in search_completion_table(completion_table, arg_name):
+                if entry.tag == arg_name and param_ref.param_type in (None, ParamType(entry.param_type)):
+                    return entry.enum_index
+        return None
 
     def get_completions_for_values_for_param(self, param_name: str, prefix,
                                              always_return_something: bool = True) \
             -> List[CompletionItem]:
-        values = self.get_ls_values_for_param(param_name)
         items_to_return: List[CompletionItem] = []
-        for value in values:
-            if value.lower().startswith(prefix.lower()):
-                items_to_return.append(CompletionItem(
-                    tag=str(value),
-                    description=None
-                ))
+        for value in self.arg_value_cache.search(param_name, prefix):
+            items_to_return.append(CompletionItem(
+                tag=value,
+                description=None
+            ))
         if always_return_something and len(items_to_return) == 0:
             # if nothing in the cache matches, return the item itself so it doesn't get blanked out
             items_to_return = [CompletionItem(tag=prefix, description=None)]
         return items_to_return
 
-    def get_param_ref_this_is_value_for(self, words: List[str]) -> Optional[CarlParamReference]:
-        # Get Rid of Generic Args, except from the last word
-        arg_parser = argparse.ArgumentParser(add_help=False)
-        arg_parser = add_generic_args(arg_parser)
-        arg_parser.add_argument('--help', '-h')
-        remaining_args: List[str]
-        _, remaining_args = arg_parser.parse_known_args(words[:-1])
-        remaining_args.append(words[-1])
-
-        if len(remaining_args) <= 1 or remaining_args[-1].startswith('+'):
-            # not enough remaining args, or this is a param
-            return None
-        elif len(remaining_args) >= 3 and remaining_args[-1].startswith('-') \
-                and remaining_args[-3].startswith('+'):
-            # special case: ... "+foo value -" should autocomplete to generic args
-            return None
-        else:
-            for arg in reversed(remaining_args[:-1]):
-                if arg.startswith('+'):
-                    return CarlParam.param_ref_from_arg_name(arg)
-            return None
-
     def get_param_completions(self, url: str, method: Method, prefix: str):
         if prefix == '' or prefix.startswith('-'):
             for generic_arg in GENERIC_OPTIONAL_ARGS:
@@ -1093,16 +1905,11 @@ class SwaggerRepo:
                             description=generic_arg.kwargs['help']
                         )
         if prefix == '' or prefix.startswith('+'):
-            cached_endpoint = self.endpoint_cache[url, Method(method)]
-            endpoint = SwaggerEndpoint.from_cached_endpoint(cached_endpoint)
-            for params_for_name in endpoint.params.values():
-                for param in params_for_name:
-                    tag = param.get_arg_name()
-                    if tag.lower().startswith(prefix.lower()):
-                        yield CompletionItem(
-                            tag=tag,
-                            description=param.description
-                        )
+            for entry in search_completion_table(self.get_completion_table(url, method), prefix):
+                yield CompletionItem(
+                    tag=entry.tag,
+                    description=entry.description
+                )
 
     def get_params_with_cached_values(self) -> Iterable[str]:
         return self.params_with_cached_values_cache.get_value()
@@ -1118,7 +1925,8 @@ class SwaggerRepo:
         elif index == 1 and words[0] == VALUES_COMPLETION.tag:
             yield from _from_list(words[1], VALUE_TYPES_COMPLETION)
         elif index == 2 and words[1] in (
-                VALUES_LS_COMPLETION.tag, VALUES_RM_COMPLETION.tag, VALUES_ADD_COMPLETION.tag
+                VALUES_LS_COMPLETION.tag, VALUES_RM_COMPLETION.tag, VALUES_ADD_COMPLETION.tag,
+                VALUES_IMPORT_COMPLETION.tag, VALUES_EXPORT_COMPLETION.tag
         ):
             params_with_cached_values = self.params_with_cached_values_cache.get_value()
             for param_name in params_with_cached_values:
@@ -1137,26 +1945,29 @@ class SwaggerRepo:
             return []
 
     def get_ls_values_for_param(self, param_name: str) -> Iterable[str]:
-        values: List[ParamValue] = self.arg_value_cache.get(param_name, [])
+        """ Highest frecency first """
+        values: Iterable[ParamValue] = self.arg_value_cache.get(param_name, [])
         for value in values:
             yield param_value_to_str(value)
 
     def remove_cached_value_for_param(self, param_name: str, value: str) -> None:
-        existing_values = self.arg_value_cache[param_name]
-        new_values: List[ParamValue] = []
-        for existing_value in existing_values:
-            existing_value_str = param_value_to_str(existing_value)
-            if existing_value_str != value:
-                new_values.append(existing_value_str)
-        self.arg_value_cache[param_name] = new_values
-
-        if len(new_values) == 0:
-            # remove from the list of params with cached values
-            params_with_cached_values = self.params_with_cached_values_cache.get_value()
-            params_with_cached_values = [
-                p for p in params_with_cached_values if p != param_name
-            ]
-            self.params_with_cached_values_cache.set_value(params_with_cached_values)
+        with self.cache_transaction():
+            clear_process_cache(self.arg_value_cache)
+            clear_process_cache(self.params_with_cached_values_cache)
+            history = self.arg_value_cache[param_name]
+            history.remove(value)
+
+            if len(history) > 0:
+                self.arg_value_cache[param_name] = history
+            else:
+                # don't leave an empty entry in the cache
+                del self.arg_value_cache[param_name]
+                # remove from the list of params with cached values
+                params_with_cached_values = self.params_with_cached_values_cache.get_value()
+                params_with_cached_values = [
+                    p for p in params_with_cached_values if p != param_name
+                ]
+                self.params_with_cached_values_cache.set_value(params_with_cached_values)
 
     def add_values(self, param_name: str, values: List[str]) -> None:
         # it's easiest to use cache_param_arg_pairs() to be consistent
@@ -1172,12 +1983,92 @@ class SwaggerRepo:
 
         self.cache_param_arg_pairs(arg_pairs)
 
+    def import_values(self, param_name: str, values: Iterable[ParamValue]) -> ImportedValues:
+        """ Merges the values into the param's history and writes it once, later values ranking higher """
+        log_score = get_frecency_log_score(time.time())
+        # read into a history of their own first, so the other processes aren't kept waiting while they're read
+        imported_history = ArgValuesHistory(get_max_history())
+        seen: Set[Hashable] = set()
+        for value in values:
+            key = hashable_param_value(value)
+            if key not in seen:
+                seen.add(key)
+                imported_history.record(value, log_score)
+
+        with self.cache_transaction():
+            clear_process_cache(self.arg_value_cache)
+            clear_process_cache(self.params_with_cached_values_cache)
+            history: ArgValuesHistory = self.arg_value_cache.get(param_name, ArgValuesHistory(get_max_history()))
+            for value, _ in imported_history.entries_by_sequence():
+                history.record(value, log_score)
+            self.arg_value_cache[param_name] = history
+            params_with_cached_values = self.params_with_cached_values_cache.get_value()
+            if len(history) > 0 and param_name not in params_with_cached_values:
+                self.params_with_cached_values_cache.set_value(sorted([param_name, *params_with_cached_values]))
+            self.enforce_cache_budget()
+        return ImportedValues(read=len(seen), kept=sum(1 for key in seen if history.has_key(key)))
+
+    def export_values(self, param_name: str, jsonl: bool = False) -> Iterator[str]:
+        """ A line for each value, lowest ranked first, so importing them again keeps them in the same order """
+        history: ArgValuesHistory = self.arg_value_cache.get(param_name, ArgValuesHistory(get_max_history()))
+        for value, _ in history.entries_by_rank():
+            if jsonl:
+                yield json.dumps(value) + '\n'
+            else:
+                yield param_value_to_str(value) + '\n'
+
 
-def param_value_to_str(value: ParamValue) -> str:
-    if any(isinstance(value, t) for t in (str, int, float)):
-        return str(value)
+def read_values(lines: Iterable[str], jsonl: bool = False) -> Iterator[ParamValue]:
+    """ The values for import_values(), one per line, as strings or (for jsonl) as json """
+    for line_number, line in enumerate(lines, start=1):
+        line = line.rstrip('\r\n')
+        if line.strip() == '':
+            continue
+        if jsonl:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Line {line_number} isn't valid json: {e}") from e
+        else:
+            yield line
+
+
+def read_fan_out_rows(lines: Iterable[str], params_by_name: Dict[str, CarlParam]) -> Iterator[FanOutParams]:
+    """ The rows of a --fan-out-file, as jsonl or csv with a header of the param names """
+    lines_ = iter(lines)
+    first_line = next(lines_, '')
+    lines_ = itertools.chain([first_line], lines_)
+    rows: Iterator[Tuple[int, Dict[str, Any]]]
+    if first_line.lstrip().startswith('{'):
+        def get_jsonl_rows() -> Iterator[Tuple[int, Dict[str, Any]]]:
+            for line_number, line in enumerate(lines_, start=1):
+                if line.strip() == '':
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError as e:
+                    raise ValueError(f"Line {line_number} isn't valid json: {e}") from e
+                if not isinstance(row, dict):
+                    raise ValueError(f"Line {line_number} isn't a json object")
+                yield line_number, row
+        rows = get_jsonl_rows()
     else:
-        return json.dumps(value)
+        reader = csv.DictReader(lines_)
+        # the header is line 1
+        rows = ((i, {k: v for k, v in row.items() if v}) for i, row in enumerate(reader, start=2))
+
+    for line_number, row in rows:
+        fan_out_params: FanOutParams = {}
+        for name, value in row.items():
+            if name not in params_by_name:
+                raise ValueError(f"Line {line_number}: {name!r} isn't a param of the endpoint")
+            param = params_by_name[name]
+            values = value if isinstance(value, list) else [value]
+            try:
+                fan_out_params[name] = [param.type_.converter(v) if isinstance(v, str) else v for v in values]
+            except ValueError as e:
+                raise ValueError(f"Line {line_number}: invalid value for +{name}: {e}") from e
+        yield fan_out_params
 
 
 def get_width():
@@ -1202,16 +2093,70 @@ def get_completions_from_param_values(param_values: Iterable[ParamValue], prefix
 
 
 def get_files_in_dir(dir_name: str) -> Iterable[str]:
-    for sub_dir_name, _, file_names in os.walk(dir_name):
-        for file_name in file_names:
+    # sorted, so which file takes precedence for a url doesn't depend on the order the file system lists them in
+    for sub_dir_name, sub_dir_names, file_names in os.walk(dir_name):
+        sub_dir_names.sort()
+        for file_name in sorted(file_names):
             yield os.path.join(sub_dir_name, file_name)
 
 
+def get_stale_spec_files(swagger_files: List[str], cached_fingerprints: Dict[str, SpecFileFingerprint]) \
+        -> Tuple[Dict[str, SpecFileFingerprint], List[str], List[str]]:
+    """ The files' fingerprints now, and the files which were added or changed and which were removed """
+    fingerprints: Dict[str, SpecFileFingerprint] = OrderedDict()
+    stale_files: List[str] = []
+    for file in swagger_files:
+        file_stat = os.stat(file)
+        cached_fingerprint = cached_fingerprints.get(file)
+        if cached_fingerprint is not None and cached_fingerprint.mtime == file_stat.st_mtime \
+                and cached_fingerprint.size == file_stat.st_size:
+            fingerprints[file] = cached_fingerprint
+        else:
+            fingerprint = SpecFileFingerprint(
+                mtime=file_stat.st_mtime,
+                size=file_stat.st_size,
+                content_hash=get_file_content_hash(file)
+            )
+            fingerprints[file] = fingerprint
+            if cached_fingerprint is None or cached_fingerprint.content_hash != fingerprint.content_hash:
+                stale_files.append(file)
+    removed_files = [f for f in cached_fingerprints.keys() if f not in fingerprints]
+    return fingerprints, stale_files, removed_files
+
+
+def get_fingerprints_digest(fingerprints: Dict[str, SpecFileFingerprint]) -> bytes:
+    """ Identifies the spec files' contents and the tables a snapshot was compiled from """
+    frozen_fingerprints = json.dumps({
+        'tables': SNAPSHOT_TABLES,
+        'content_hashes': {file: fingerprint.content_hash for file, fingerprint in fingerprints.items()}
+    })
+    return md5(frozen_fingerprints.encode()).digest()
+
+
+def get_spec_snapshot_path() -> str:
+    return os.path.join(CACHE_DIR, SPEC_SNAPSHOT_FILE_NAME)
+
+
+def get_url_search_key(url: str) -> str:
+    """ Like the entries in build_url_prefix_index(), these sort by the lower-cased url """
+    return url.lower() + URL_PREFIX_INDEX_SEPARATOR + url
+
+
+def get_endpoint_key(url: str, method: Method) -> str:
+    return json.dumps([url, method.value])
+
+
+def get_file_content_hash(file: str) -> str:
+    with open(file, 'rb') as fh:
+        return md5(fh.read()).hexdigest()
+
+
 def get_command_description() -> str:
     unformatted_text = \
         f"A Utility to cleanly take command-line arguments, for an endpoint you have the OpenAPI specification for," \
         f" and convert them into an appropriate curl command.  Spec files should be in {OPEN_API_DIR_ENV.default}" \
-        f" directory or directory defined by env variables (See below)"
+        f" directory or directory defined by env variables (See below).  Use `--help <prefix>` to only list the urls" \
+        f" starting with a prefix"
     return wrap_text(unformatted_text)
 
 
@@ -1223,12 +2168,38 @@ def wrap_text(unformatted_text, **kwargs):
     return return_str
 
 
-def get_arg_parser() -> argparse.ArgumentParser:
-    return argparse.ArgumentParser(
+def get_arg_parser(help_text: Optional[HelpText] = None) -> argparse.ArgumentParser:
+    kwargs: Dict[str, Any] = dict(
         description=get_command_description(),
         epilog=get_command_epilogue(),
         formatter_class=argparse.RawDescriptionHelpFormatter
     )
+    if help_text is not None:
+        return CachedHelpArgumentParser(help_text=help_text, **kwargs)
+    else:
+        return argparse.ArgumentParser(**kwargs)
+
+
+def get_no_url_parser(possible_urls: Iterable[UrlToCache]) -> argparse.ArgumentParser:
+    """ The parser for when the first arg isn't a url, which only gets used for help and errors """
+    no_url_parser = get_arg_parser()
+    url_subparsers = no_url_parser.add_subparsers(dest='url', required=True)
+
+    url_subparsers = add_utils_parser(url_subparsers)
+    for possible_url in possible_urls:
+        possible_url_desc = possible_url.description or possible_url.summary
+        url_subparsers.add_parser(possible_url.url, help=possible_url_desc)
+    return no_url_parser
+
+
+def get_help_text_key() -> HelpTextKey:
+    return HelpTextKey(
+        # what argparse uses for the default prog and width
+        prog=os.path.basename(sys.argv[0]),
+        terminal_width=shutil.get_terminal_size().columns,
+        # what we use to wrap our own text
+        text_width=get_width()
+    )
 
 
 def get_command_epilogue() -> str:
@@ -1244,24 +2215,34 @@ def get_command_epilogue() -> str:
 
 ZSH_COMPLETION_ITEM = CompletionItem('zsh-completion', 'Return completions for zsh')
 ZSH_PRINT_SCRIPT_COMPLETION = CompletionItem('zsh-print-script', 'Print the zsh script that enables completions')
+CACHE_STATS_COMPLETION = CompletionItem('cache-stats', 'Show the size and hit rate of each cache')
 REBUILD_CACHE_COMPLETION = CompletionItem('rebuild-spec-cache', 'Clear and rebuild the cache of the OpenAPI spec data')
+DAEMON_COMPLETION = CompletionItem('daemon', 'Run a daemon which keeps the spec caches in memory to answer completions')
+BATCH_COMPLETION = CompletionItem('batch', 'Send the requests for a JSONL stream of invocations, several at a time')
 VALUES_COMPLETION = CompletionItem('cached-values', 'Utilities to help with cached values for completions')
 VALUES_PARAMS_COMPLETION = CompletionItem('params', 'List all the param names that have values cached')
 VALUES_LS_COMPLETION = CompletionItem('ls', 'List all the values cached for a particular param')
 VALUES_RM_COMPLETION = CompletionItem('rm', 'Remove a value for an param from the cache for completions')
 VALUES_ADD_COMPLETION = CompletionItem('add', 'Add one or more values for a param to the cache')
+VALUES_IMPORT_COMPLETION = CompletionItem('import', 'Add values for a param from a file, one per line')
+VALUES_EXPORT_COMPLETION = CompletionItem('export', 'Print the values cached for a param, one per line')
 UTIL_TYPE_COMPLETIONS = [
     ZSH_COMPLETION_ITEM,
     ZSH_PRINT_SCRIPT_COMPLETION,
     REBUILD_CACHE_COMPLETION,
-    VALUES_COMPLETION
+    VALUES_COMPLETION,
+    DAEMON_COMPLETION,
+    CACHE_STATS_COMPLETION,
+    BATCH_COMPLETION
 ]
 
 VALUE_TYPES_COMPLETION = [
     VALUES_PARAMS_COMPLETION,
     VALUES_LS_COMPLETION,
     VALUES_RM_COMPLETION,
-    VALUES_ADD_COMPLETION
+    VALUES_ADD_COMPLETION,
+    VALUES_IMPORT_COMPLETION,
+    VALUES_EXPORT_COMPLETION
 ]
 
 VALUES_SUBPARSER_DEST = 'cached_values_type'
@@ -1304,7 +2285,41 @@ def add_utils_parser(parser: Any) -> Any:
     values_add_parser.add_argument('param_name', help='Name of parameter to cache value for')
     values_add_parser.add_argument('value', nargs='+', help='One or more values to cache')
 
-    util_type_subparsers.add_parser(REBUILD_CACHE_COMPLETION.tag, help=REBUILD_CACHE_COMPLETION.description)
+    values_import_parser = values_subparsers.add_parser(VALUES_IMPORT_COMPLETION.tag,
+                                                        help=VALUES_IMPORT_COMPLETION.description)
+    values_import_parser.add_argument('param_name', help='Name of parameter to cache values for')
+    values_import_parser.add_argument('file', nargs='?', default='-',
+                                      help='File with a value on each line, or "-" for stdin.  Default: -')
+    values_import_parser.add_argument('--jsonl', action='store_true', help='Each line is a json value')
+
+    values_export_parser = values_subparsers.add_parser(VALUES_EXPORT_COMPLETION.tag,
+                                                        help=VALUES_EXPORT_COMPLETION.description)
+    values_export_parser.add_argument('param_name', help='Name of parameter to get cached values for')
+    values_export_parser.add_argument('--jsonl', action='store_true', help='Print each value as json')
+
+    rebuild_cache_parser = util_type_subparsers.add_parser(REBUILD_CACHE_COMPLETION.tag,
+                                                           help=REBUILD_CACHE_COMPLETION.description)
+    rebuild_cache_parser.add_argument('-j', '--jobs', type=non_negative_int_type, default=None,
+                                      help=f"Number of processes used to parse the spec files.  0 means one per CPU."
+                                           f"  Default: ${JOBS_ENV.env_name} or {JOBS_ENV.default}")
+
+    util_type_subparsers.add_parser(CACHE_STATS_COMPLETION.tag, help=CACHE_STATS_COMPLETION.description)
+
+    daemon_parser = util_type_subparsers.add_parser(DAEMON_COMPLETION.tag, help=DAEMON_COMPLETION.description)
+    daemon_parser.add_argument('--socket', dest='socket_path', default=None,
+                               help=f"Unix socket to listen on.  Default: ${DAEMON_SOCKET_ENV.env_name} or"
+                                    f" {DAEMON_SOCKET_ENV.default}")
+
+    batch_parser = util_type_subparsers.add_parser(BATCH_COMPLETION.tag, help=BATCH_COMPLETION.description)
+    batch_parser.add_argument('file', nargs='?', default='-',
+                              help='File with an invocation on each line, or "-" for stdin.  Default: -')
+    batch_parser.add_argument('-c', '--concurrency', type=positive_int_type, default=DEFAULT_CONCURRENCY,
+                              help=f"Number of requests sent at a time.  Default: {DEFAULT_CONCURRENCY}")
+    batch_parser.add_argument('--ordered', action='store_true',
+                              help='Print the results in the order of the invocations, instead of as they finish')
+    batch_parser.add_argument('--curl-config', action='store_true',
+                              help='Print a curl config for all the requests, to send them with `curl --config FILE`,'
+                                   ' instead of sending them')
 
     return parser
 
@@ -1319,18 +2334,123 @@ def namespace_to_zsh_completion_args(namespace: argparse.Namespace) -> Optional[
         return None
 
 
-class ArgCache(FileCache[str, List[ParamValue]]):
-    def freeze(self, value: List[ParamValue]) -> str:
-        return json.dumps(value)
+def namespace_to_values_import_args(namespace: argparse.Namespace) -> Optional[ValuesImportArgs]:
+    if namespace.util_type == VALUES_COMPLETION.tag and namespace.cached_values_type == VALUES_IMPORT_COMPLETION.tag:
+        return ValuesImportArgs(
+            param_name=namespace.param_name,
+            file=namespace.file,
+            jsonl=namespace.jsonl
+        )
+    else:
+        return None
+
+
+def namespace_to_values_export_args(namespace: argparse.Namespace) -> Optional[ValuesExportArgs]:
+    if namespace.util_type == VALUES_COMPLETION.tag and namespace.cached_values_type == VALUES_EXPORT_COMPLETION.tag:
+        return ValuesExportArgs(
+            param_name=namespace.param_name,
+            jsonl=namespace.jsonl
+        )
+    else:
+        return None
+
+
+def namespace_to_daemon_args(namespace: argparse.Namespace) -> Optional[DaemonArgs]:
+    if namespace.util_type == DAEMON_COMPLETION.tag:
+        return DaemonArgs(
+            socket_path=namespace.socket_path or DAEMON_SOCKET_ENV.get_value()
+        )
+    else:
+        return None
+
+
+def namespace_to_batch_args(namespace: argparse.Namespace) -> Optional[BatchArgs]:
+    if namespace.util_type == BATCH_COMPLETION.tag:
+        return BatchArgs(
+            file=namespace.file,
+            concurrency=namespace.concurrency,
+            ordered=namespace.ordered,
+            curl_config=namespace.curl_config
+        )
+    else:
+        return None
+
 
-    def thaw(self, frozen_value: io.TextIOWrapper) -> List[ParamValue]:
-        return cast(List[ParamValue], json.loads(frozen_value.read()))
+# requests sent at a time, for `carl utils batch` and --fan-out
+DEFAULT_CONCURRENCY = 8
+
+
+def get_max_history() -> int:
+    return int(MAX_HISTORY_ENV.get_value())
+
+
+class ArgCache(FileCache[str, ArgValuesHistory]):
+    """ Each param's values, as a log with a line for each time a value was used (see arg_values) """
+
+    def freeze(self, value: ArgValuesHistory) -> str:
+        return freeze_log(value)
+
+    def thaw(self, frozen_value: TextIO) -> ArgValuesHistory:
+        return thaw_log(frozen_value.read(), get_max_history())
 
     def freeze_key(self, key: str) -> str:
         return key
 
+    def __getitem__(self, key: str) -> ArgValuesHistory:
+        is_loaded = key in self._process_cache
+        history = super().__getitem__(key)
+        if not is_loaded:
+            self._backend.touch(self._get_key_hash(key))
+        if not is_loaded and needs_compaction(history, get_max_history()):
+            with self._store.transaction():
+                # read again now that no other process can append, so the compacted log has everything
+                del self._process_cache[key]
+                history = super().__getitem__(key)
+                self[key] = history
+            history.appended_count = 0
+        return history
+
+    def append(self, key: str, value: ParamValue, log_score: float) -> None:
+        self._backend.append(self._get_key_hash(key), get_log_line(value, log_score))
+        if key in self._process_cache:
+            self._process_cache[key].record(value, log_score)
+
+    def search(self, key: str, prefix: str) -> List[str]:
+        """ Like ArgValuesHistory.search(), but without loading all the values unless they already are """
+        if key in self._process_cache:
+            return self[key].search(prefix)
+        fh = self._backend.open(self._get_key_hash(key))
+        if fh is None:
+            self.misses += 1
+            return []
+        try:
+            frozen_log = fh.read()
+        finally:
+            fh.close()
+        self.hits += 1
+        self._backend.touch(self._get_key_hash(key))
+
+        matches = search_log(frozen_log, prefix, get_max_history())
+        if matches is None:
+            # due to be compacted, which happens when all of it is loaded
+            return self[key].search(prefix)
+        return matches
+
+
+def arg_pairs_to_request(url_template: str, method: str, param_args: ArgPairs, initial_post_data: Dict[str, Any],
+                         curl_args: List[str]) -> CarlRequest:
+    headers, param_args = format_headers(param_args)
+    post_data, param_args = format_post_data(param_args, initial_post_data)
+    return CarlRequest(
+        method=method,
+        url=format_url(url_template, param_args),
+        headers=headers,
+        body=post_data,
+        curl_args=curl_args
+    )
+
 
-def format_post_data(param_args: ArgPairs, initial_post_data: Dict[str, Any]) -> Tuple[List[str], ArgPairs]:
+def format_post_data(param_args: ArgPairs, initial_post_data: Dict[str, Any]) -> Tuple[Optional[str], ArgPairs]:
     remaining_argpairs: ArgPairs = []
     post_data = deepcopy(initial_post_data)
     passed_array_params: Set[str] = set()  # needed to correctly overwrite params in the initial_post_data
@@ -1354,19 +2474,19 @@ def format_post_data(param_args: ArgPairs, initial_post_data: Dict[str, Any]) ->
             remaining_argpairs.append((param, arg_value),)
 
     if post_data:
-        formatted_postdata = ['-H', 'Content-Type: application/json', '--data-binary', json.dumps(post_data)]
+        formatted_postdata: Optional[str] = json.dumps(post_data)
     else:
-        formatted_postdata = []
+        formatted_postdata = None
 
     return formatted_postdata, remaining_argpairs
 
 
-def format_headers(param_args: ArgPairs) -> Tuple[List[str], ArgPairs]:
+def format_headers(param_args: ArgPairs) -> Tuple[List[Tuple[str, str]], ArgPairs]:
     remaining_argpairs: ArgPairs = []
-    headers: List[str] = []
+    headers: List[Tuple[str, str]] = []
     for param, arg_value in param_args:
         if param.param_type == ParamType.header:
-            headers.extend(['-H', f"{param.name}: {arg_value}"])
+            headers.append((param.name, str(arg_value)),)
         else:
             remaining_argpairs.append((param, arg_value),)
 
@@ -1457,8 +2577,34 @@ GENERIC_OPTIONAL_ARGS = [
                                              help='Print the resulting curl command to standard out')),
     ArgParserArg(['-n', '--no-run'], dict(action='store_false', dest='run_cmd', default=True,
                                           help='Don\'t run the curl command.  Useful with -p')),
+    ArgParserArg(['--print-curl-config'], dict(action='store_true', default=False,
+                                               help='Print a curl config for the request (or all of them, with'
+                                                    ' --fan-out), to run with `curl --config FILE`, instead of'
+                                                    ' running it')),
+    ArgParserArg(['--in-process'], dict(action='store_true', default=False,
+                                        help='Send the request from carl itself instead of running curl, which is'
+                                             ' faster but can\'t take curl\'s arguments')),
     REQUIRES_ARG,
-    BODY_JSON_ARG
+    BODY_JSON_ARG,
+    ArgParserArg(['--fan-out'], dict(action='append', metavar='PARAM', default=[],
+                                     help='Send a separate request for each value of the param (or each combination of'
+                                          ' values, if given more than once), several at a time.  PARAM is without'
+                                          ' the "+"')),
+    ArgParserArg(['--fan-out-file'], dict(default=None, metavar='FILE',
+                                          help='Send a separate request for each row of the file, several at a time:'
+                                               ' csv with a header of param names (without the "+"), or a json object'
+                                               ' of param values on each line.  "-" for stdin')),
+    ArgParserArg(['--concurrency'], dict(type=positive_int_type, default=DEFAULT_CONCURRENCY,
+                                         help=f"Number of requests sent at a time with --fan-out, --fan-out-file or"
+                                              f" --bench.  Default: {DEFAULT_CONCURRENCY}")),
+    ArgParserArg(['--bench'], dict(action='store_true', default=False,
+                                   help='Load-test the endpoint: send the request over and over, in-process, and report'
+                                        ' the throughput and latencies instead of the response')),
+    ArgParserArg(['--bench-requests'], dict(type=int, default=None, metavar='N',
+                                            help='Number of requests sent with --bench.  Default: 100, or as many as'
+                                                 ' can be sent in --bench-duration')),
+    ArgParserArg(['--bench-duration'], dict(type=float, default=None, metavar='SECONDS',
+                                            help='Keep sending requests with --bench for this long'))
 ]
 
 
@@ -1468,6 +2614,105 @@ def add_generic_args(parser: argparse.ArgumentParser) -> argparse.ArgumentParser
     return parser
 
 
+# whether each generic flag takes a value
+GENERIC_FLAGS: Dict[str, bool] = {
+    **{
+        flag: arg.kwargs.get('action') not in ('store_true', 'store_false')
+        for arg in GENERIC_OPTIONAL_ARGS for flag in arg.name_or_flags
+    },
+    **{flag: False for flag in HELP_FLAGS}
+}
+
+
+class GenericFlagType(Enum):
+    complete = 'complete'
+    expecting_value = 'expecting_value'
+
+
+def get_generic_flag_type(word: str) -> Optional[GenericFlagType]:
+    """ None if the word isn't generic args, or else whether the next word is the last one's value """
+    if word.startswith('--'):
+        flag, equals, _ = word.partition('=')
+        if flag in GENERIC_FLAGS:
+            takes_value = GENERIC_FLAGS[flag]
+        else:
+            possible_flags = [f for f in GENERIC_FLAGS if f.startswith(flag) and f.startswith('--')]
+            if len(possible_flags) != 1:
+                return None
+            takes_value = GENERIC_FLAGS[possible_flags[0]]
+        if takes_value and not equals:
+            return GenericFlagType.expecting_value
+        else:
+            return GenericFlagType.complete
+    elif word.startswith('-') and len(word) > 1:
+        # compound short flags: any flag which takes a value takes the rest of the word, or the next word
+        for i, char in enumerate(word[1:], start=1):
+            short_flag = '-' + char
+            if short_flag not in GENERIC_FLAGS:
+                # not generic args (could be a negative number, for instance)
+                return None
+            if GENERIC_FLAGS[short_flag]:
+                return GenericFlagType.expecting_value if i == len(word) - 1 else GenericFlagType.complete
+        return GenericFlagType.complete
+    else:
+        return None
+
+
+class CompletionContextType(Enum):
+    # a +param or a generic arg
+    param = 'param'
+    param_value = 'param_value'
+    generic_arg_value = 'generic_arg_value'
+    # after "--"
+    curl_arg = 'curl_arg'
+
+
+class CompletionContext(NamedTuple):
+    type_: CompletionContextType
+    param_ref: Optional[CarlParamReference] = None
+
+
+def get_completion_context(words: Sequence[str]) -> CompletionContext:
+    """ What the last of the words after the method is, as get_path_arg_parser() would parse them """
+    param_arg: Optional[str] = None
+    param_value_count = 0
+    expecting_generic_value = False
+    for word in words[:-1]:
+        if expecting_generic_value:
+            expecting_generic_value = False
+        elif word == '--':
+            return CompletionContext(CompletionContextType.curl_arg)
+        elif word.startswith('+'):
+            param_arg, equals, _ = word.partition('=')
+            param_value_count = 1 if equals else 0
+        elif not word.startswith('-'):
+            param_value_count += 1
+        else:
+            generic_flag_type = get_generic_flag_type(word)
+            if generic_flag_type is None:
+                param_value_count += 1
+            else:
+                expecting_generic_value = generic_flag_type == GenericFlagType.expecting_value
+
+    prefix = words[-1]
+    if expecting_generic_value:
+        return CompletionContext(CompletionContextType.generic_arg_value)
+    elif param_arg is None or prefix.startswith('+') or (prefix.startswith('-') and param_value_count > 0):
+        # a "-" once the param has a value starts a generic arg
+        return CompletionContext(CompletionContextType.param)
+    else:
+        return CompletionContext(CompletionContextType.param_value, CarlParam.param_ref_from_arg_name(param_arg))
+
+
+def get_fan_out_params(words: Sequence[str]) -> List[str]:
+    """ Like get_use_requires(), needed before building the other args, since these params can take several values """
+    arg_parser = argparse.ArgumentParser(add_help=False)
+    arg_parser = add_generic_args(arg_parser)
+    args, _ = arg_parser.parse_known_args(words)
+
+    return list(dict.fromkeys(args.fan_out))
+
+
 def get_use_requires(words: Sequence[str]) -> bool:
     """
     See's if we have the --no-requires flag set.  Needed before building other args because it's used to determine
@@ -0,0 +1,113 @@
+"""
+Completion daemon.  Keeps a SwaggerRepo, and the caches it has read, in memory so completions don't pay for starting
+python and reading the caches from disk on every tab press.
+
+The protocol is deliberately simple enough for zsh to speak it with `zsocket` (see the script in cli.py): the client
+sends the word index and the line, each terminated by a NUL, and the daemon answers with a status line ("OK" or "ERROR")
+followed by the completion lines, then closes the connection.
+"""
+import os
+import signal
+import socket
+import socketserver
+import sys
+import traceback
+from typing import Callable, Iterable, List, Optional
+
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+
+GetCompletionLines = Callable[[SwaggerRepo, int, str], Iterable[str]]
+
+STATUS_OK = 'OK'
+STATUS_ERROR = 'ERROR'
+CLIENT_TIMEOUT = 2.0
+
+
+class CompletionRequestHandler(socketserver.StreamRequestHandler):
+    # so a client that never finishes its request can't hang the daemon
+    timeout = CLIENT_TIMEOUT
+    server: 'CompletionDaemon'
+
+    def handle(self) -> None:
+        request = b''
+        while request.count(b'\0') < 2:
+            chunk = self.request.recv(4096)
+            if not chunk:
+                # client went away
+                return
+            request += chunk
+        word_index_str, line, _ = request.decode().split('\0', 2)
+
+        try:
+            self.server.swagger.reload()
+            lines = list(self.server.get_completion_lines(self.server.swagger, int(word_index_str), line))
+            response = STATUS_OK + '\n' + ''.join(line_ + '\n' for line_ in lines)
+        except Exception:
+            traceback.print_exc(file=sys.stderr)
+            response = STATUS_ERROR + '\n'
+        self.wfile.write(response.encode())
+
+
+class CompletionDaemon(socketserver.UnixStreamServer):
+    """
+    Requests are handled one at a time, so the SwaggerRepo and its caches never need to be thread-safe
+    """
+
+    def __init__(self, socket_path: str, swagger: SwaggerRepo, get_completion_lines: GetCompletionLines):
+        self.swagger = swagger
+        self.get_completion_lines = get_completion_lines
+        self.socket_path = socket_path
+
+        if os.path.exists(socket_path):
+            if request_completion_lines(socket_path, 0, '') is not None:
+                raise RuntimeError(f"A daemon is already listening on {socket_path}")
+            # left behind by a daemon which didn't exit cleanly
+            os.remove(socket_path)
+        os.makedirs(os.path.dirname(os.path.abspath(socket_path)), exist_ok=True)
+
+        super().__init__(socket_path, CompletionRequestHandler)
+        # the completions include cached values, which aren't anyone else's business
+        os.chmod(socket_path, 0o600)
+
+    def server_close(self) -> None:
+        super().server_close()
+        try:
+            os.remove(self.socket_path)
+        except FileNotFoundError:
+            pass
+
+
+def run_daemon(socket_path: str, swagger: SwaggerRepo, get_completion_lines: GetCompletionLines) -> None:
+    # so the socket gets cleaned up when the daemon is killed
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    with CompletionDaemon(socket_path, swagger, get_completion_lines) as daemon:
+        print(f"Listening for completion requests on {socket_path}", file=sys.stderr)
+        try:
+            daemon.serve_forever()
+        except KeyboardInterrupt:
+            pass
+
+
+def request_completion_lines(socket_path: str, word_index: int, line: str) -> Optional[List[str]]:
+    """
+    Returns None if the daemon isn't running or couldn't answer, in which case the caller should fall back to
+    computing the completions itself
+    """
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(CLIENT_TIMEOUT)
+            sock.connect(socket_path)
+            sock.sendall(f"{word_index}\0{line}\0".encode())
+            response = b''
+            while True:
+                chunk = sock.recv(65536)
+                if not chunk:
+                    break
+                response += chunk
+    except OSError:
+        return None
+
+    status, _, body = response.decode().partition('\n')
+    if status != STATUS_OK:
+        return None
+    return body.splitlines()
@@ -0,0 +1,147 @@
+"""
+Sends CarlRequests from carl itself (`--in-process`), instead of running curl for each one.  Connections are kept open
+and reused for later requests to the same host, so those skip the DNS lookup and the TCP (and TLS) handshakes, which is
+where most of the time goes for a small request to a nearby server.
+
+Like curl without `--fail`, any response, whatever its status, counts as success: only not getting a response is an
+error.
+"""
+import http.client
+import threading
+from typing import Dict, List, NamedTuple, Optional, Tuple
+from urllib.parse import urlsplit
+
+from curl_arguments_url import __version__
+from curl_arguments_url.curl_arguments_url import CarlRequest
+
+DEFAULT_TIMEOUT = 60.0
+# what curl sends, other than the user agent
+DEFAULT_HEADERS = [('Accept', '*/*'), ('User-Agent', f"carl/{__version__}")]
+
+# (scheme, host, port)
+ConnectionKey = Tuple[str, str, int]
+
+
+class HttpResponse(NamedTuple):
+    status: int
+    reason: str
+    headers: List[Tuple[str, str]]
+    body: bytes
+
+
+class InProcessError(Exception):
+    """ The request couldn't be sent, or no response came back """
+
+
+def split_request_url(url: str) -> Tuple[ConnectionKey, str]:
+    """ Like curl, a url without a scheme is http.  Returns the connection key and the path with the query """
+    if '://' not in url:
+        url = 'http://' + url
+    parts = urlsplit(url)
+    if parts.scheme not in ('http', 'https'):
+        raise InProcessError(f"Can't send {parts.scheme} requests in-process")
+    if not parts.hostname:
+        raise InProcessError(f"No host in url {url!r}")
+    port = parts.port or (443 if parts.scheme == 'https' else 80)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    return (parts.scheme, parts.hostname, port), path
+
+
+class ConnectionPool:
+    """
+    Idle keep-alive connections for each host.  A request takes a connection out of the pool for as long as it's using
+    it, so any number of threads can share the pool
+    """
+
+    def __init__(self, timeout: float = DEFAULT_TIMEOUT, max_idle_per_host: int = 16):
+        self.timeout = timeout
+        self.max_idle_per_host = max_idle_per_host
+        self._idle: Dict[ConnectionKey, List[http.client.HTTPConnection]] = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, key: ConnectionKey) -> http.client.HTTPConnection:
+        scheme, host, port = key
+        if scheme == 'https':
+            return http.client.HTTPSConnection(host, port, timeout=self.timeout)
+        else:
+            return http.client.HTTPConnection(host, port, timeout=self.timeout)
+
+    def _take_connection(self, key: ConnectionKey) -> Tuple[http.client.HTTPConnection, bool]:
+        """ Returns the connection and whether it was reused """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(key), False
+
+    def _return_connection(self, key: ConnectionKey, connection: http.client.HTTPConnection) -> None:
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle_per_host:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def send(self, request: CarlRequest) -> HttpResponse:
+        if request.curl_args:
+            raise InProcessError(f"Can't pass arguments to curl in-process: {' '.join(request.curl_args)}")
+        key, path = split_request_url(request.url)
+        headers: Dict[str, str] = dict(DEFAULT_HEADERS)
+        headers.update(request.get_all_headers())
+        body = request.body.encode() if request.body is not None else None
+
+        connection, reused = self._take_connection(key)
+        try:
+            try:
+                response = self._send_on(connection, request.method, path, body, headers)
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                if not reused:
+                    raise
+                # the server closed the idle connection, which isn't the request's fault, so try once more on a new one
+                connection.close()
+                connection = self._new_connection(key)
+                response = self._send_on(connection, request.method, path, body, headers)
+        except (OSError, http.client.HTTPException) as e:
+            connection.close()
+            raise InProcessError(f"{request.method} {request.url} failed: {e!r}") from e
+
+        http_response, will_close = response
+        if will_close:
+            connection.close()
+        else:
+            self._return_connection(key, connection)
+        return http_response
+
+    @staticmethod
+    def _send_on(connection: http.client.HTTPConnection, method: str, path: str, body: Optional[bytes],
+                 headers: Dict[str, str]) -> Tuple[HttpResponse, bool]:
+        connection.request(method, path, body=body, headers=headers)
+        response = connection.getresponse()
+        # the whole body has to be read before the connection can be used again
+        response_body = response.read()
+        return HttpResponse(
+            status=response.status,
+            reason=response.reason,
+            headers=response.getheaders(),
+            body=response_body
+        ), response.will_close
+
+    def close(self) -> None:
+        with self._lock:
+            idle_connections = [c for idle in self._idle.values() for c in idle]
+            self._idle.clear()
+        for connection in idle_connections:
+            connection.close()
+
+
+_default_pool: Optional[ConnectionPool] = None
+
+
+def get_connection_pool() -> ConnectionPool:
+    """ Shared by everything in the process which sends requests """
+    global _default_pool
+    if _default_pool is None:
+        _default_pool = ConnectionPool()
+    return _default_pool
@@ -0,0 +1,150 @@
+"""
+A compiled, read-only snapshot of the spec caches, in a single binary file which is read with mmap.  Looking up a key is
+a binary search over fixed-size records, so a lookup only touches the pages for the records it compares and the value
+it returns, no matter how large the specs are.
+
+Layout (all integers little-endian):
+
+    header:           magic, format version, digest of what the snapshot was compiled from, number of tables
+    table directory:  for each table, its name and the offset and number of its records
+    records:          for each table, one record per key, sorted by the key's utf-8 bytes, each with the offset and
+                      length of its key and its value in the string table
+    string table:     the utf-8 encoded keys and values, each stored once
+"""
+import mmap
+import os
+import struct
+import tempfile
+from bisect import bisect_left
+from typing import Dict, Iterable, Iterator, Mapping, Optional, Sequence, Tuple
+
+MAGIC = b'CARLSNAP'
+FORMAT_VERSION = 4
+
+HEADER = struct.Struct('<8sI16sI')
+TABLE_ENTRY = struct.Struct('<16sQI')
+RECORD = struct.Struct('<QIQI')
+
+
+class _TableKeys(Sequence[bytes]):
+    """ The sorted keys of a table, read from the mmap as they are needed, so they can be searched with bisect """
+
+    def __init__(self, snapshot: 'Snapshot', records_offset: int, record_count: int):
+        self._snapshot = snapshot
+        self._records_offset = records_offset
+        self._record_count = record_count
+
+    def __len__(self) -> int:
+        return self._record_count
+
+    def __getitem__(self, i):  # type: ignore
+        key_offset, key_length, _, _ = self.record(i)
+        return self._snapshot.read_bytes(key_offset, key_length)
+
+    def record(self, i: int) -> Tuple[int, int, int, int]:
+        return RECORD.unpack_from(self._snapshot.data, self._records_offset + i * RECORD.size)
+
+
+class Snapshot:
+    def __init__(self, data: mmap.mmap, digest: bytes, tables: Dict[str, _TableKeys]):
+        self.data = data
+        self.digest = digest
+        self._tables = tables
+
+    @classmethod
+    def open(cls, path: str) -> Optional['Snapshot']:
+        """ Returns None if there is no snapshot at the path, or it was written by a different version of carl """
+        try:
+            with open(path, 'rb') as fh:
+                data = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        except (FileNotFoundError, ValueError):
+            # ValueError: the file is empty
+            return None
+
+        if len(data) < HEADER.size:
+            data.close()
+            return None
+        magic, version, digest, table_count = HEADER.unpack_from(data, 0)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            data.close()
+            return None
+
+        snapshot = cls(data, digest, {})
+        for i in range(table_count):
+            name, records_offset, record_count = TABLE_ENTRY.unpack_from(data, HEADER.size + i * TABLE_ENTRY.size)
+            snapshot._tables[name.rstrip(b'\0').decode()] = _TableKeys(snapshot, records_offset, record_count)
+        return snapshot
+
+    def close(self) -> None:
+        self.data.close()
+
+    def read_bytes(self, offset: int, length: int) -> bytes:
+        return self.data[offset:offset + length]
+
+    def get(self, table: str, key: str) -> Optional[str]:
+        """ None if the key, or its whole table, isn't in the snapshot """
+        keys = self._tables.get(table)
+        if keys is None:
+            return None
+        key_bytes = key.encode()
+        i = bisect_left(keys, key_bytes)
+        if i < len(keys) and keys[i] == key_bytes:
+            _, _, value_offset, value_length = keys.record(i)
+            return self.read_bytes(value_offset, value_length).decode()
+        else:
+            return None
+
+    def iter_prefix(self, table: str, prefix: str) -> Iterator[Tuple[str, str]]:
+        """ The keys which start with the prefix, and their values, in sorted order """
+        keys = self._tables.get(table)
+        if keys is None:
+            return
+        prefix_bytes = prefix.encode()
+        for i in range(bisect_left(keys, prefix_bytes), len(keys)):
+            key_offset, key_length, value_offset, value_length = keys.record(i)
+            key = self.read_bytes(key_offset, key_length)
+            if not key.startswith(prefix_bytes):
+                break
+            yield key.decode(), self.read_bytes(value_offset, value_length).decode()
+
+
+def write_snapshot(path: str, digest: bytes, tables: Mapping[str, Iterable[Tuple[str, str]]]) -> None:
+    """
+    Writes to a temporary file which then replaces the snapshot, so processes which have the old snapshot mapped can
+    keep reading it, and nobody ever sees a partially written one
+    """
+    sorted_tables = [
+        (name, sorted((key.encode(), value.encode()) for key, value in items))
+        for name, items in tables.items()
+    ]
+
+    records_offset = HEADER.size + len(sorted_tables) * TABLE_ENTRY.size
+    strings_offset = records_offset + sum(len(items) for _, items in sorted_tables) * RECORD.size
+    string_offsets: Dict[bytes, int] = {}
+    strings = bytearray()
+
+    def add_string(string: bytes) -> Tuple[int, int]:
+        if string not in string_offsets:
+            string_offsets[string] = strings_offset + len(strings)
+            strings.extend(string)
+        return string_offsets[string], len(string)
+
+    header = bytearray(HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(sorted_tables)))
+    records = bytearray()
+    for name, items in sorted_tables:
+        header.extend(TABLE_ENTRY.pack(name.encode(), records_offset + len(records), len(items)))
+        for key, value in items:
+            records.extend(RECORD.pack(*add_string(key), *add_string(value)))
+
+    dir_ = os.path.dirname(os.path.abspath(path))
+    os.makedirs(dir_, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=dir_, prefix='.snapshot-')
+    try:
+        with os.fdopen(fd, 'wb') as fh:
+            fh.write(header)
+            fh.write(records)
+            fh.write(strings)
+        os.replace(temp_path, path)
+    except BaseException:
+        os.remove(temp_path)
+        raise
@@ -0,0 +1,258 @@
+"""
+Parses the OpenApi specifications into what gets cached.  This is the only part of carl which needs yaml, jsonref and
+the OpenApi models, so it's only imported when the spec caches are (re)built
+"""
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, List, MutableMapping, NamedTuple, Optional, cast
+
+from jsonref import replace_refs as replace_json_refs  # type: ignore
+import yaml
+import yaml.parser
+
+from curl_arguments_url.curl_arguments_url import ArgTypeEnum, ArgTypeModel, CarlParam, EndpointToCache, \
+    ParamType, ParamValue, SpecFileContents, UrlToCache
+from curl_arguments_url.models import open_api
+from curl_arguments_url.models.methods import Method
+from curl_arguments_url.yaml import load_yaml
+
+
+class SpecialSwaggerTypeStrs:
+    object = 'object'
+    array = 'array'
+
+
+class CarlServer(NamedTuple):
+    url: str
+    params: List[CarlParam]
+
+
+def parse_spec_file(file: str, warnings: bool) -> SpecFileContents:
+    urls: MutableMapping[str, UrlToCache] = OrderedDict()
+    endpoints: List[EndpointToCache] = []
+
+    swagger_data_ = parse_swagger_file(file, warnings=warnings)
+    if swagger_data_ is None:
+        return SpecFileContents(urls=[], endpoints=[])
+
+    root_description = swagger_data_.info.description
+    root_summary = swagger_data_.info.summary or swagger_data_.info.title
+
+    carl_servers = list(to_carl_servers(swagger_data_.servers))
+    for path_str, path_spec in swagger_data_.get_lazy_paths(warnings=warnings):
+        # Note: this doesn't deal with relative servers, we might need to deal with that
+        # when fetching the spec
+        if path_spec.servers:
+            servers_for_path = list(to_carl_servers(path_spec.servers))
+        else:
+            servers_for_path = carl_servers
+
+        path_description = path_spec.description or root_description
+        path_summary = path_spec.summary or root_summary
+
+        for method in Method.__members__.values():
+            operation = get_operation(path_spec, method)
+            if operation:
+                if operation.servers:
+                    servers_for_op = list(to_carl_servers(operation.servers))
+                else:
+                    servers_for_op = servers_for_path
+                op_params: List[CarlParam] = []
+                for parameter in operation.parameters or []:
+                    if isinstance(parameter, open_api.Parameter):
+                        param_type = schema_to_arg_type(parameter.param_schema)
+                        enums: Optional[List[ParamValue]]
+                        if isinstance(parameter.param_schema, open_api.Schema):
+                            enums = to_enums(parameter.param_schema.enum)
+                        else:
+                            enums = None
+                        op_params.append(CarlParam(
+                            name=parameter.name,
+                            param_type=ParamType(parameter.param_in),
+                            description=parameter.description,
+                            required_=bool(parameter.required),
+                            type_=param_type,
+                            enums=enums
+                        ))
+                    else:  # is a Reference
+                        # Hopefully we have already resolved the references
+                        pass
+                if isinstance(operation.requestBody, open_api.RequestBody):
+                    params_from_body = get_params_from_body(operation.requestBody)
+                    op_params.extend(params_from_body)
+
+                op_description = operation.description or path_description
+                op_summary = operation.summary or path_summary
+                for server in servers_for_op:
+                    endpoint_url = server.url + path_str
+                    parameters = server.params + op_params
+                    endpoints.append(EndpointToCache(
+                        endpoint_url=endpoint_url,
+                        method=method,
+                        parameters=parameters,
+                        summary=op_summary,
+                        description=op_description
+                    ))
+                    if endpoint_url not in urls:
+                        urls[endpoint_url] = UrlToCache(
+                            url=endpoint_url,
+                            summary=path_summary,
+                            description=path_description
+                        )
+
+    return SpecFileContents(urls=list(urls.values()), endpoints=endpoints)
+
+
+def parse_swagger_file(file: str, warnings: bool) -> Optional[open_api.OpenApiLazy]:
+    with open(file, 'r') as fh:
+        loaded: Optional[Dict[str, Any]]
+        try:
+            loaded = load_yaml(fh)
+        except yaml.parser.ParserError as e:
+            if warnings:
+                print('WARNING: ' + str(e), file=sys.stderr)
+            loaded = None
+        if loaded is not None:
+            try:
+                loaded = cast(Dict[str, Any], replace_json_refs(loaded, merge_props=True))
+                loaded['unparsed_paths'] = loaded.pop('paths', {})
+                return open_api.OpenApiLazy.parse_obj(loaded)
+            except Exception as e:
+                if warnings:
+                    print(f"WARNING: Error in file {file!r}: {str(e)}", file=sys.stderr)
+                else:
+                    # fail silently
+                    pass
+        elif warnings:
+            print(f"WARNING: Yaml error in file {file!r}", file=sys.stderr)
+        else:
+            # fail silently
+            pass
+    return None
+
+
+def to_carl_servers(servers: List[open_api.Server]) -> Iterable[CarlServer]:
+    for server in servers:
+        server_params: List[CarlParam] = []
+        defaulted_url: Optional[str] = None
+        if server.variables is not None:
+            defaults: Dict[str, str] = {}
+            for variable_name, variable_spec in server.variables.items():
+                # this casting shouldn't be necessary, but mypy isn't happy it without it
+                variable_enums = cast(Optional[List[ParamValue]], variable_spec.enum)
+                server_params.append(CarlParam(
+                    name=variable_name,
+                    param_type=ParamType.path,
+                    description=variable_spec.description,
+                    enums=variable_enums,
+                    required_=False,
+                    default=variable_spec.default
+                ))
+                if variable_spec.default is not None:
+                    defaults[variable_name] = variable_spec.default
+            try:
+                defaulted_url = server.url.format(**defaults)
+            except KeyError:
+                pass
+        if defaulted_url is not None:
+            yield CarlServer(defaulted_url, [])
+        yield CarlServer(server.url, server_params)
+
+
+def get_operation(path_spec: open_api.PathItem, method: Method) -> Optional[open_api.Operation]:
+    # maybe someday make this more type-safe
+    return getattr(path_spec, method.value.lower())
+
+
+def schema_to_arg_type(schema: Optional[open_api.Schema]) -> ArgTypeModel:
+    if schema is None:
+        return ArgTypeModel(type_=ArgTypeEnum.string)
+    schema_type = schema.type
+    schema_items = schema.items
+    if schema_type is None or schema_type == []:
+        # default
+        return ArgTypeModel(type_=ArgTypeEnum.string)
+    else:
+        schema_type_: str
+        if isinstance(schema_type, List):
+            # don't know how to handle multiple types yet
+            schema_type_ = schema_type[0]
+        else:
+            schema_type_ = schema_type
+
+        if schema_type_ == SpecialSwaggerTypeStrs.object:
+            return ArgTypeModel(type_=ArgTypeEnum.json)
+        elif schema_type_ == SpecialSwaggerTypeStrs.array:
+            if schema_items is None:
+                return ArgTypeModel(type_=ArgTypeEnum.string, is_array=True)
+            else:
+                items_type = schema_to_arg_type(open_api.Schema(
+                    type=schema_items.type,
+                    items=None
+                ))
+                if items_type.is_array:
+                    return ArgTypeModel(
+                        type_=ArgTypeEnum.json,
+                        is_array=True
+                    )
+                else:
+                    return ArgTypeModel(
+                        type_=items_type.type_,
+                        is_array=True
+                    )
+        else:
+            arg_type_enum = ArgTypeEnum(schema_type_)
+            return ArgTypeModel(
+                type_=arg_type_enum,
+                is_array=False
+            )
+
+
+def to_enums(schema_enums: Optional[List[Any]]) -> Optional[List[ParamValue]]:
+    """
+    Numbers and booleans in enums have always been turned into strings (this used to be done by pydantic validation
+    of the cached models), so keep doing that
+    """
+    if schema_enums is None:
+        return None
+    else:
+        return [
+            e if isinstance(e, (str, dict, list)) else str(e)
+            for e in schema_enums
+        ]
+
+
+def get_params_from_body(request_body: open_api.RequestBody) -> Iterable[CarlParam]:
+    for json_mime_type in ('application/json', 'json'):
+        if json_mime_type in request_body.content:
+            schema = request_body.content[json_mime_type].media_type_schema
+            if isinstance(schema, open_api.Schema) \
+                    and schema.type == SpecialSwaggerTypeStrs.object \
+                    and schema.properties:
+                if schema.required is not None:
+                    required_props = set(schema.required)
+                else:
+                    required_props = set()
+                for prop_name, prop_schema in schema.properties.items():
+                    carl_param_type = schema_to_arg_type(prop_schema)
+                    if isinstance(prop_schema, open_api.Schema):
+                        description = prop_schema.description
+                        enums = to_enums(prop_schema.enum)
+                    else:
+                        description = None
+                        enums = None
+
+                    yield CarlParam(
+                        name=prop_name,
+                        param_type=ParamType.json_body,
+                        description=description,
+                        required_=(prop_name in required_props),
+                        type_=carl_param_type,
+                        enums=enums
+                    )
+            else:
+                # Can't handle these yet
+                pass
+        else:
+            # Can't handle anything else yet
+            pass
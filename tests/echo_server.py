@@ -0,0 +1,53 @@
+"""
+A stand-in for the Flask app the docker tests use (tests/dockerfiles/flask_src/app.py), for tests which send real
+requests
+"""
+import json
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Set
+from urllib.parse import parse_qs, urlsplit
+
+
+class EchoServer(ThreadingHTTPServer):
+    """ Like tests/dockerfiles/flask_src/app.py, answers with what was requested """
+    daemon_threads = True
+    # closes each connection after answering, without saying so, like a server whose keep-alive timeout ran out
+    close_after_response = False
+
+    def __init__(self) -> None:
+        super().__init__(('127.0.0.1', 0), EchoRequestHandler)
+        self.client_ports: Set[int] = set()
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class EchoRequestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    server: EchoServer
+
+    def handle_one_request(self) -> None:
+        self.server.client_ports.add(self.client_address[1])
+        super().handle_one_request()
+        if self.server.close_after_response:
+            self.close_connection = True
+
+    def echo(self) -> None:
+        url_parts = urlsplit(self.path)
+        response = {'path': url_parts.path, 'method': self.command, 'query': parse_qs(url_parts.query)}
+        content_length = int(self.headers.get('Content-Length', 0))
+        if content_length:
+            response['json_body'] = json.loads(self.rfile.read(content_length))
+        response['headers'] = dict(self.headers)
+        body = json.dumps(response).encode()
+        self.send_response(200 if url_parts.path != '/missing' else 404)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    do_GET = do_POST = do_PUT = do_DELETE = echo
+
+    def log_message(self, *args) -> None:
+        pass
@@ -0,0 +1,33 @@
+from typing import List
+
+import pytest
+
+from curl_arguments_url.arg_values import ArgValuesHistory, get_frecency_log_score
+
+
+@pytest.mark.parametrize('weeks_ago,expected', [
+    (1, ['often', 'recent']),
+    (4, ['recent', 'often']),
+])
+def test_frecency(weeks_ago: int, expected: List[str]):
+    now = 1_000_000_000
+    history = ArgValuesHistory(10)
+    for _ in range(3):
+        history.record('often', get_frecency_log_score(now - weeks_ago * 7 * 24 * 60 * 60))
+    history.record('recent', get_frecency_log_score(now))
+    assert list(history) == expected
+    assert history.search('') == expected
+    assert history.search('REC') == ['recent']
+
+
+def test_arg_values_history_search():
+    history = ArgValuesHistory(1000)
+    for i in range(2000):
+        history.record(f"ID-{i % 1500:04}", float(i % 7))
+    assert len(history) == 1000
+    for i in range(2000, 2100):
+        history.record(f"ID-{i:04}", 10.0)
+    assert len(history) == 1000
+    assert history.search('id-20') == [f"ID-{i:04}" for i in reversed(range(2000, 2100))]
+    history.remove('ID-2099')
+    assert history.search('id-209') == [f"ID-{i:04}" for i in reversed(range(2090, 2099))]
@@ -0,0 +1,205 @@
+import json
+import shutil
+import subprocess
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from curl_arguments_url.batch import BatchError, BatchResult, invocation_to_cli_args, run_batch
+from curl_arguments_url.cli import run_fan_out, print_batch_results
+from curl_arguments_url.curl_arguments_url import BatchArgs
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+from curl_arguments_url.http_executor import ConnectionPool
+from tests.echo_server import EchoServer
+
+
+@pytest.mark.parametrize('invocation,expected', [
+    ({'url': 'fake.com/get', 'method': 'GET'}, ['fake.com/get', 'GET', '--']),
+    (
+        {
+            'url': 'fake.com/posting/raw/stuff', 'method': 'POST',
+            'params': {'arg_list': ['A', 'B'], 'arg_nested': {'A': 1}, 'arg_int': 2},
+            'body': {'base': True}, 'curl_args': ['--verbose']
+        },
+        [
+            'fake.com/posting/raw/stuff', 'POST', '+arg_list', 'A', 'B', '+arg_nested', '{"A": 1}', '+arg_int', '2',
+            '--body', '{"base": true}', '--', '--verbose'
+        ]
+    ),
+])
+def test_invocation_to_cli_args(invocation: dict, expected: List[str]):
+    assert invocation_to_cli_args(invocation) == expected
+
+
+@pytest.mark.parametrize('invocation,match', [
+    (['fake.com/get', 'GET'], 'needs to be an object'),
+    ({'url': 'fake.com/get'}, 'needs to be an object'),
+    ({'url': 'fake.com/get', 'method': 'GET', 'params': ['+thing', 'one']}, '"params" needs to be an object'),
+    ({'url': 123, 'method': 'GET'}, 'need to be strings'),
+    ({'url': 'fake.com/get', 'method': 5}, 'need to be strings'),
+    ({'url': 'fake.com/get', 'method': 'GET', 'curl_args': ['-v', 2]}, '"curl_args" need to be strings'),
+    ({'url': 'fake.com/get', 'method': 'GET', 'params': {'thing': {'one', 'two'}}}, "Can't be serialized"),
+    ({'url': 'fake.com/get', 'method': 'GET', 'body': {'thing': b'one'}}, "Can't be serialized"),
+])
+def test_invocation_to_cli_args_error(invocation, match: str):
+    with pytest.raises(BatchError, match=match):
+        invocation_to_cli_args(invocation)
+
+
+ECHO_SPEC_TEMPLATE = """\
+openapi: 3.0.0
+info:
+  title: Echo
+servers:
+  - url: {url}
+paths:
+  /posting/stuff:
+    post:
+      requestBody:
+        content:
+          application/json:
+            schema:
+              type: object
+              properties:
+                arg_one:
+                  type: string
+                arg_two:
+                  type: integer
+"""
+
+
+@pytest.fixture()
+def echo_swagger_model(echo_server: EchoServer, tmp_path: Path) -> SwaggerRepo:
+    """ With the echo server's urls """
+    spec_file = tmp_path / 'echo.yml'
+    spec_file.write_text(ECHO_SPEC_TEMPLATE.format(url=echo_server.url))
+    return SwaggerRepo(files=[str(spec_file)], ephemeral=True)
+
+
+def get_batch_lines(echo_server: EchoServer, count: int) -> List[str]:
+    return [
+        json.dumps({
+            'url': echo_server.url + '/posting/stuff', 'method': 'POST', 'params': {'arg_one': str(i), 'arg_two': i}
+        }) + '\n'
+        for i in range(count)
+    ]
+
+
+@pytest.mark.parametrize('ordered', [True, False])
+def test_run_batch(echo_swagger_model: SwaggerRepo, echo_server: EchoServer, ordered: bool, capsys):
+    lines = get_batch_lines(echo_server, 20)
+    lines[3] = '\n'
+    lines[5] = '{"url": \n'
+    lines[7] = json.dumps({
+        'url': echo_server.url + '/posting/stuff', 'method': 'POST', 'params': {'arg_two': 'two'}
+    }) + '\n'
+    # argparse prints help for it, and exits without an error
+    lines[9] = json.dumps({'url': '-h', 'method': 'GET'}) + '\n'
+    lines[11] = json.dumps({'url': 123, 'method': 'GET'}) + '\n'
+    pool = ConnectionPool()
+
+    results = list(run_batch(echo_swagger_model, lines, pool, concurrency=4, ordered=ordered))
+    pool.close()
+    assert capsys.readouterr().out == ''
+    if ordered:
+        assert [r.line for r in results] == [i + 1 for i in range(20) if i != 3]
+    else:
+        assert sorted(int(r.line or 0) for r in results) == [i + 1 for i in range(20) if i != 3]
+
+    results_by_line = {r.line: r for r in results}
+    assert str(results_by_line[6].error).startswith("Isn't valid json")
+    # the same, however carl was run
+    assert results_by_line[8].error == "argument +arg_two: invalid type_ value: 'two'"
+    assert results_by_line[10].error == 'Invalid arguments'
+    assert results_by_line[12].error == '"url" and "method" need to be strings'
+    for i in range(20):
+        if i in (3, 5, 7, 9, 11):
+            continue
+        result = results_by_line[i + 1]
+        assert (result.status, result.error) == (200, None)
+        assert result.elapsed is not None and result.elapsed >= 0
+        assert result.body is not None
+        assert json.loads(result.body)['json_body'] == {'arg_one': str(i), 'arg_two': i}
+    # one connection for each request sent at a time
+    assert len(echo_server.client_ports) <= 4
+
+    # the values were cached, like for any other carl command
+    assert '19' in echo_swagger_model.get_ls_values_for_param('arg_one')
+
+
+def test_run_batch_streams(echo_swagger_model: SwaggerRepo, echo_server: EchoServer):
+    """ Results come out before all the input is read """
+    read_lines = []
+
+    def lines():
+        for i, line in enumerate(get_batch_lines(echo_server, 100)):
+            read_lines.append(i)
+            if i == 10:
+                # give the first requests time to finish
+                time.sleep(0.5)
+            yield line
+
+    pool = ConnectionPool()
+    results = run_batch(echo_swagger_model, lines(), pool, concurrency=2)
+    assert next(results).status == 200
+    assert len(read_lines) < 100
+    assert len(list(results)) == 99
+    pool.close()
+
+
+def test_batch_result_to_obj():
+    assert BatchResult(line=2, error='bad').to_obj() == {'line': 2, 'error': 'bad'}
+    assert BatchResult(line=1, status=200, elapsed=0.5, body='{}').to_obj() == {
+        'line': 1, 'status': 200, 'elapsed': 0.5, 'body': '{}'
+    }
+
+
+def test_fan_out(echo_swagger_model: SwaggerRepo, echo_server: EchoServer, tmp_path: Path, capsys):
+    rows_file = tmp_path / 'rows.csv'
+    rows_file.write_text('arg_two\n1\n2\n')
+    _, generic_args = echo_swagger_model.cli_args_to_request([
+        echo_server.url + '/posting/stuff', 'POST', '+arg_one', 'a', 'b', '--fan-out', 'arg_one', '--fan-out-file',
+        str(rows_file)
+    ])
+    assert generic_args.fan_out is not None
+    assert run_fan_out(generic_args.fan_out, generic_args) == 0
+
+    results = [json.loads(line) for line in capsys.readouterr().out.splitlines()]
+    assert sorted((r['params']['arg_one'], r['params']['arg_two']) for r in results) == [
+        ('a', 1), ('a', 2), ('b', 1), ('b', 2)
+    ]
+    for result in results:
+        assert result['status'] == 200
+        assert json.loads(result['body'])['json_body'] == result['params']
+
+
+@pytest.mark.skipif(shutil.which('curl') is None, reason='Needs curl')
+def test_curl_config(echo_swagger_model: SwaggerRepo, echo_server: EchoServer, tmp_path: Path, capsys):
+    """ The requests are sent by one curl, over as many connections as it's allowed to send at a time """
+    lines = get_batch_lines(echo_server, 10)
+    lines[0] = json.dumps({
+        'url': echo_server.url + '/posting/stuff', 'method': 'POST', 'params': {'arg_one': 'quotes " and \\\n too'}
+    }) + '\n'
+    lines[1] = json.dumps({'url': echo_server.url + '/posting/stuff', 'method': 'POST', 'curl_args': ['-v']}) + '\n'
+    batch_args = BatchArgs(file='-', concurrency=2, ordered=False, curl_config=True)
+    assert print_batch_results(echo_swagger_model, lines, batch_args) == 1
+    captured = capsys.readouterr()
+    assert 'line 2: ' in captured.err
+    config_file = tmp_path / 'requests.curl'
+    config_file.write_text(captured.out)
+
+    output = subprocess.run(['curl', '--silent', '--config', str(config_file)],
+                            capture_output=True, text=True, check=True).stdout
+    # the bodies, one after the other
+    json_bodies = []
+    decoder = json.JSONDecoder()
+    while output:
+        echoed, end = decoder.raw_decode(output)
+        json_bodies.append(echoed['json_body'])
+        output = output[end:]
+    assert sorted(json_bodies, key=json.dumps) == sorted([{'arg_one': 'quotes " and \\\n too'}] + [
+        {'arg_one': str(i), 'arg_two': i} for i in range(2, 10)
+    ], key=json.dumps)
+    assert len(echo_server.client_ports) <= 2
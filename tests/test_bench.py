@@ -0,0 +1,61 @@
+from curl_arguments_url.bench import BenchReport, get_bench_report_lines, run_bench
+from curl_arguments_url.curl_arguments_url import BenchArgs, CarlRequest, SwaggerRepo
+from curl_arguments_url.http_executor import ConnectionPool
+from tests.echo_server import EchoServer
+
+
+def test_run_bench(swagger_model: SwaggerRepo, echo_server: EchoServer):
+    request, generic_args = swagger_model.cli_args_to_request([
+        'fake.com/posting/stuff', 'POST', '+arg_one', 'this', '--bench', '--bench-requests', '20', '--concurrency', '4'
+    ])
+    assert request is not None
+    assert generic_args.bench_args == BenchArgs(requests=20, duration=None, concurrency=4)
+    request = request._replace(url=request.url.replace('fake.com', echo_server.url))
+    pool = ConnectionPool()
+
+    report = run_bench(request, pool, generic_args.bench_args)
+    assert (report.request_count, report.status_counts, report.error_counts) == (20, {200: 20}, {})
+    assert report.latencies == sorted(report.latencies)
+    # a connection for each request sent at a time, reused for the rest
+    assert len(echo_server.client_ports) <= 4
+
+    missing_request = CarlRequest('GET', f"{echo_server.url}/missing", headers=[])
+    report = run_bench(missing_request, pool, BenchArgs(requests=None, duration=0.2, concurrency=2))
+    assert report.elapsed >= 0.2
+    assert report.request_count > 0 and report.status_counts == {404: report.request_count}
+
+    echo_server.shutdown()
+    echo_server.server_close()
+    pool.close()
+    report = run_bench(missing_request, pool, BenchArgs(requests=3, duration=None, concurrency=2))
+    assert report.latencies == [] and sum(report.error_counts.values()) == 3
+
+
+def test_get_bench_report_lines():
+    report = BenchReport(
+        elapsed=2.0,
+        concurrency=2,
+        latencies=[0.001 * i for i in range(1, 11)],
+        status_counts={200: 9, 503: 1},
+        error_counts={'ConnectionResetError()': 2}
+    )
+    assert report.get_percentile(50) == 0.005
+    assert report.get_percentile(99) == 0.01
+    assert list(get_bench_report_lines(report)) == [
+        '12 requests in 2.00s, 6.0 requests/s, concurrency 2',
+        '',
+        'latency        min       p50       p90       p99       max',
+        '            1.00ms    5.00ms    9.00ms   10.00ms   10.00ms',
+        '',
+        '     1.00ms - 2.00ms    |########                                 1',
+        '     2.00ms - 5.00ms    |########################                 3',
+        '     5.00ms - 10.00ms   |######################################## 5',
+        '    10.00ms - 20.00ms   |########                                 1',
+        '',
+        'status     count',
+        '200            9',
+        '503            1  (error)',
+        '',
+        'no response',
+        '  ConnectionResetError(): 2',
+    ]
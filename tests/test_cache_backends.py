@@ -0,0 +1,222 @@
+import os
+import shutil
+import sqlite3
+import time
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from curl_arguments_url import cache_backends
+from curl_arguments_url.cache_backends import CacheStore, DirCacheStore, SqliteCacheStore
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+
+
+@pytest.mark.parametrize('store_type', [DirCacheStore, SqliteCacheStore])
+def test_cache_backend(tmp_path: Path, store_type: type):
+    store: CacheStore = store_type(str(tmp_path))
+    backend = store.get_backend('some_cache')
+
+    assert backend.open('key') is None
+    assert not backend.exists('key')
+    assert not backend.delete('key')
+
+    backend.write('key', 'value')
+    backend.write('key', 'new value')
+    assert backend.exists('key')
+    fh = backend.open('key')
+    assert fh is not None
+    assert fh.read() == 'new value'
+    fh.close()
+
+    assert [(e.key_hash, e.size) for e in backend.entries()] == [('key', len('new value'))]
+
+    assert backend.delete('key')
+    assert not backend.exists('key')
+
+    backend.append('log', 'one\n')
+    backend.append('log', 'two\n')
+    fh = backend.open('log')
+    assert fh is not None
+    assert fh.read() == 'one\ntwo\n'
+    fh.close()
+
+    backend.write('key', 'value')
+    backend.clear()
+    assert not backend.exists('key')
+
+
+def test_sqlite_transaction_rollback(tmp_path: Path):
+    store = SqliteCacheStore(str(tmp_path))
+    backend = store.get_backend('some_cache')
+    backend.write('kept', 'value')
+
+    with pytest.raises(RuntimeError):
+        with store.transaction():
+            backend.write('rolled-back', 'value')
+            with store.transaction():
+                backend.delete('kept')
+            raise RuntimeError()
+
+    assert backend.exists('kept')
+    assert not backend.exists('rolled-back')
+
+
+def test_sqlite_backend_without_last_used(tmp_path: Path):
+    connection = sqlite3.connect(str(tmp_path / SqliteCacheStore.DB_FILE_NAME))
+    connection.execute('CREATE TABLE "some_cache" (key_hash TEXT PRIMARY KEY, value TEXT NOT NULL)')
+    connection.execute('INSERT INTO "some_cache" (key_hash, value) VALUES (\'old\', \'value\')')
+    connection.commit()
+    connection.close()
+
+    backend = SqliteCacheStore(str(tmp_path)).get_backend('some_cache')
+    backend.write('new', 'value')
+    assert sorted((e.key_hash, e.last_used > 0) for e in backend.entries()) == [('new', True), ('old', False)]
+
+
+def get_spec_files(content_root: str) -> List[str]:
+    return [os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')]
+
+
+def test_sqlite_backend_migration(content_root: str, cache_dir: str, monkeypatch):
+    monkeypatch.setenv('CARL_CACHE_BACKEND', 'files')
+    SwaggerRepo(files=get_spec_files(content_root)).add_values('param', ['one', 'two'])
+    assert os.path.isdir(os.path.join(cache_dir, 'arg_values'))
+
+    monkeypatch.setenv('CARL_CACHE_BACKEND', 'sqlite')
+    swagger_model = SwaggerRepo(files=get_spec_files(content_root))
+    assert sorted(swagger_model.get_ls_values_for_param('param')) == ['one', 'two']
+    assert not os.path.exists(os.path.join(cache_dir, 'arg_values'))
+    assert os.path.isfile(os.path.join(cache_dir, SqliteCacheStore.DB_FILE_NAME))
+
+    swagger_model.add_values('param', ['three'])
+    swagger_model = SwaggerRepo(files=get_spec_files(content_root))
+    assert sorted(swagger_model.get_ls_values_for_param('param')) == ['one', 'three', 'two']
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+@pytest.mark.parametrize('spec_snapshot', ['0', '1'])
+def test_baseline_cache(content_root: str, cache_dir: str, monkeypatch, backend_type: str, spec_snapshot: str):
+    """
+    A cache written by carl before the spec caches had fingerprints, completion tables, etc. (by running a couple of
+    requests and `carl utils cached-values add`): the spec caches are rebuilt over it, and the values are kept
+    """
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    monkeypatch.setenv('CARL_SPEC_SNAPSHOT', spec_snapshot)
+    shutil.copytree(os.path.join(content_root, 'tests', 'resources', 'baseline_cache'), cache_dir)
+    files = get_spec_files(content_root)
+    ephemeral_model = SwaggerRepo(files=files, ephemeral=True)
+    swagger_model = SwaggerRepo(files=files)
+
+    assert list(swagger_model.get_params_with_cached_values()) == ['arg_one', 'arg_two', 'foo']
+    assert list(swagger_model.get_ls_values_for_param('arg_one')) == ['that', 'this']
+    for index, words in [
+        (1, ['carl', 'fake.com/']),
+        (2, ['carl', 'fake.com/completer', '']),
+        (3, ['carl', 'fake.com/posting/stuff', 'POST', '+']),
+    ]:
+        assert [c.tag for c in swagger_model.get_completions(index, words)] == \
+            [c.tag for c in ephemeral_model.get_completions(index, words)]
+    assert [c.tag for c in swagger_model.get_completions(4, ['carl', 'fake.com/completer', 'DELETE', '+foo', 'f'])] \
+        == ['foo1', 'foo2']
+    request, _ = swagger_model.cli_args_to_request(['fake.com/posting/stuff', 'POST', '+arg_one', 'that'])
+    assert request is not None and request.body == '{"arg_one": "that"}'
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+def test_swagger_repo_with_backend(content_root: str, cache_dir: str, monkeypatch, backend_type: str):
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    # so the completions are read from the cache store, not the snapshot compiled from it
+    monkeypatch.setenv('CARL_SPEC_SNAPSHOT', '0')
+    files = get_spec_files(content_root)
+    ephemeral_model = SwaggerRepo(files=files, ephemeral=True)
+    SwaggerRepo(files=files)
+    # a new repo, so everything is read from the cache store, not the process caches
+    swagger_model = SwaggerRepo(files=files)
+
+    def completion_tags(model: SwaggerRepo, index: int, words: List[str]) -> List[str]:
+        return [c.tag for c in model.get_completions(index, words)]
+
+    for index, words in [
+        (1, ['carl', 'fake.com/']),
+        (2, ['carl', 'fake.com/has/multiple/methods', '']),
+        (3, ['carl', 'fake.com/posting/stuff', 'POST', '+']),
+    ]:
+        assert completion_tags(swagger_model, index, words) == completion_tags(ephemeral_model, index, words)
+    monkeypatch.setenv('CARL_URL_COMPLETION', 'segments')
+    assert completion_tags(swagger_model, 1, ['carl', 'fake.com/']) == \
+        completion_tags(ephemeral_model, 1, ['carl', 'fake.com/'])
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+def test_cache_budget(content_root: str, cache_dir: str, monkeypatch, backend_type: str):
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    monkeypatch.setenv('CARL_CACHE_MAX_ENTRIES', '2')
+    swagger_model = SwaggerRepo(files=get_spec_files(content_root))
+
+    def add_value(param_name: str, value: str) -> None:
+        swagger_model.add_values(param_name, [value])
+        time.sleep(0.01)  # so they aren't all used at the same time
+
+    for param_name in ['a', 'b', 'c']:
+        add_value(param_name, f"{param_name}-value")
+    # "a" was the least recently used
+    assert swagger_model.get_params_with_cached_values() == ['b', 'c']
+    assert list(swagger_model.get_ls_values_for_param('a')) == []
+    assert len(swagger_model.arg_value_cache.entries()) == 2
+
+    add_value('b', 'b-value-2')
+    add_value('d', 'd-value')
+    assert swagger_model.get_params_with_cached_values() == ['b', 'd']
+    assert list(swagger_model.get_ls_values_for_param('b')) == ['b-value-2', 'b-value']
+
+    entry_sizes = sorted(e.size for e in swagger_model.arg_value_cache.entries())
+    monkeypatch.setenv('CARL_CACHE_MAX_ENTRIES', '0')
+    monkeypatch.setenv('CARL_CACHE_MAX_BYTES', str(sum(entry_sizes)))
+    # "e" is as big as "d", so "b" doesn't fit anymore
+    add_value('e', 'e-value')
+    assert swagger_model.get_params_with_cached_values() == ['d', 'e']
+    assert SwaggerRepo(files=get_spec_files(content_root)).get_params_with_cached_values() == ['d', 'e']
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+def test_cache_budget_reads(content_root: str, cache_dir: str, monkeypatch, backend_type: str):
+    """ A param whose values are completed counts as used, even if none were cached since """
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    monkeypatch.setenv('CARL_CACHE_MAX_ENTRIES', '2')
+    monkeypatch.setattr(cache_backends, 'TOUCH_INTERVAL_SECONDS', 0.0)
+    files = get_spec_files(content_root)
+    for param_name in ['a', 'b']:
+        SwaggerRepo(files=files).add_values(param_name, [f"{param_name}-value"])
+        time.sleep(0.01)
+    # from a new repo, so the values are read from the cache store
+    assert [c.tag for c in SwaggerRepo(files=files).get_completions_for_values_for_param('a', '')] == ['a-value']
+    time.sleep(0.01)
+    SwaggerRepo(files=files).add_values('c', ['c-value'])
+    assert SwaggerRepo(files=files).get_params_with_cached_values() == ['a', 'c']
+
+    # but not more often than TOUCH_INTERVAL_SECONDS
+    monkeypatch.setattr(cache_backends, 'TOUCH_INTERVAL_SECONDS', 60.0)
+    time.sleep(0.01)
+    assert list(SwaggerRepo(files=files).get_ls_values_for_param('a')) == ['a-value']
+    SwaggerRepo(files=files).add_values('d', ['d-value'])
+    assert SwaggerRepo(files=files).get_params_with_cached_values() == ['c', 'd']
+
+
+def test_cache_stats(content_root: str, cache_dir: str):
+    swagger_model = SwaggerRepo(files=get_spec_files(content_root))
+    swagger_model.add_values('param', ['one', 'two'])
+    assert list(SwaggerRepo(files=get_spec_files(content_root)).get_ls_values_for_param('param')) == ['two', 'one']
+    swagger_model.remove_cached_value_for_param('param', 'one')
+    assert list(swagger_model.get_ls_values_for_param('missing')) == []
+    swagger_model.record_cache_hits()
+    # ... as though from another process
+    swagger_model.record_cache_hits()
+
+    cache_stats = {s.name: s for s in SwaggerRepo(files=get_spec_files(content_root)).get_cache_stats()}
+    assert cache_stats['arg_values'].entries == 1
+    assert cache_stats['arg_values'].bytes == len(f"\"two\"\t"
+                                                  f"{swagger_model.arg_value_cache['param'].entries_by_rank()[0][1]!r}"
+                                                  f"\t0\t\"two\"\n")
+    assert (cache_stats['arg_values'].hits, cache_stats['arg_values'].misses) == (2, 2)
+    assert cache_stats['endpoint'].entries > 0
@@ -1,8 +1,13 @@
+import os
+import shutil
+from pathlib import Path
 from typing import List
 
 import pytest
 
-from curl_arguments_url.cli import line_to_words
+from curl_arguments_url import curl_arguments_url
+from curl_arguments_url.cli import line_to_words, get_cache_stats_lines, get_zsh_script, main
+from curl_arguments_url.curl_arguments_url import CacheStats, SwaggerRepo
 
 
 @pytest.mark.parametrize('line,expected', [
@@ -10,8 +15,46 @@ from curl_arguments_url.cli import line_to_words
     ('+arg1 sp\\ ace +arg2 "arg two" +arg3 \'arg "3"\'', ['+arg1', 'sp ace', '+arg2', 'arg two', '+arg3', 'arg "3"']),
     ('end with backslash\\', ['end', 'with', 'backslash']),
     ('"open double quotes', ['open double quotes']),
-    ('open \'single\\ quotes', ['open', 'single\\ quotes'])
+    ('open \'single\\ quotes', ['open', 'single\\ quotes']),
+    ('"open \\"double\\" quotes\\', ['open "double" quotes']),
+    ('escaped backslash\\\\', ['escaped', 'backslash\\']),
+    ("empty '' quotes \"", ['empty', '', 'quotes', '']),
 ])
 def test_line_to_words(line: str, expected: List[str]):
     actual = line_to_words(line)
     assert actual == expected
+
+
+def test_get_zsh_script():
+    script = get_zsh_script()
+    assert '__CARL_' not in script
+    # so a wedged daemon can't hang the shell
+    assert 'read -r -t 2.0 status_line' in script
+
+
+def test_get_cache_stats_lines():
+    assert list(get_cache_stats_lines([
+        CacheStats(name='arg_values', entries=3, bytes=2048, hits=3, misses=1),
+        CacheStats(name='endpoint', entries=0, bytes=0, hits=0, misses=0),
+    ])) == [
+        'cache                     entries       size     hits   misses hit rate',
+        'arg_values                      3     2.0KiB        3        1    75.0%',
+        'endpoint                        0         0B        0        0        -',
+    ]
+
+
+def test_rebuild_spec_cache_parses_once(content_root: str, cache_dir: str, tmp_path: Path, monkeypatch):
+    """ A cold `carl utils rebuild-spec-cache --jobs 2` parses each spec file once, all of them in the pool """
+    open_api_dir = tmp_path / 'open_api'
+    shutil.copytree(os.path.join(content_root, 'tests', 'resources', 'open_api'), open_api_dir)
+    monkeypatch.setattr(curl_arguments_url, 'OPEN_API_DIR', str(open_api_dir))
+    parsed_files: List[str] = []
+    original_parse_spec_files = SwaggerRepo.parse_spec_files
+
+    def parse_spec_files(self: SwaggerRepo, files: List[str], warnings: bool):
+        parsed_files.extend(files)
+        return original_parse_spec_files(self, files, warnings)
+
+    monkeypatch.setattr(SwaggerRepo, 'parse_spec_files', parse_spec_files)
+    assert main(['carl', 'utils', 'rebuild-spec-cache', '--jobs', '2']) == 0
+    assert sorted(os.path.basename(f) for f in parsed_files) == sorted(os.listdir(open_api_dir))
@@ -0,0 +1,69 @@
+"""
+Regression benchmark for how much `carl` imports before it can answer a completion (or print a command).  This runs
+on every tab press, so heavy dependencies should only be imported when the spec caches need to be rebuilt.
+"""
+import os
+import re
+import subprocess
+import sys
+from pathlib import Path
+from typing import Dict, List
+
+import pytest
+
+# Only needed to (re)build the spec caches
+REBUILD_ONLY_MODULES = [
+    'yaml',
+    'jsonref',
+    'pydantic',
+    'curl_arguments_url.models.open_api',
+    'curl_arguments_url.spec_parser',
+    'concurrent.futures.process',
+]
+# total import time, as measured by `python -X importtime`
+COLD_START_IMPORT_BUDGET_MS = 300
+
+
+def get_import_times(stderr: str) -> Dict[str, int]:
+    """ Module name -> self import time in microseconds """
+    import_times: Dict[str, int] = {}
+    for line in stderr.splitlines():
+        match = re.match(r'^import time:\s+(\d+) \|\s+\d+ \|(\s*)(\S+)$', line)
+        if match:
+            self_time, _, module = match.groups()
+            import_times[module] = int(self_time)
+    return import_times
+
+
+@pytest.fixture()
+def carl_env(content_root: str, tmp_path: Path) -> Dict[str, str]:
+    open_api_dir = tmp_path / 'open_api'
+    open_api_dir.mkdir()
+    spec = Path(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    (open_api_dir / spec.name).write_text(spec.read_text())
+
+    env = dict(os.environ)
+    env['CARL_DIR'] = str(tmp_path)
+    env['PYTHONPATH'] = content_root
+    # make sure the caches are built, since that does need the heavy imports
+    subprocess.run([sys.executable, '-m', 'curl_arguments_url.cli', 'utils', 'rebuild-spec-cache'], env=env,
+                   check=True, capture_output=True)
+    return env
+
+
+@pytest.mark.parametrize('carl_args', [
+    ['utils', 'zsh-completion', '4', 'carl fake.com/completer GET +f'],
+    ['fake.com/{thing}/do', 'GET', '+thing', 'a', '--print-cmd', '--no-run'],
+])
+def test_cold_start_imports(carl_env: Dict[str, str], carl_args: List[str]):
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-m', 'curl_arguments_url.cli', *carl_args],
+                            env=carl_env, check=True, capture_output=True, text=True)
+    import_times = get_import_times(result.stderr)
+
+    assert 'curl_arguments_url.curl_arguments_url' in import_times
+    for module in REBUILD_ONLY_MODULES:
+        assert module not in import_times, f"{module} should only be imported when rebuilding the spec caches"
+
+    total_ms = sum(import_times.values()) / 1000
+    assert total_ms < COLD_START_IMPORT_BUDGET_MS, \
+        f"Imports took {total_ms:.0f}ms, more than the budget of {COLD_START_IMPORT_BUDGET_MS}ms"
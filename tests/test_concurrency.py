@@ -0,0 +1,116 @@
+"""
+Runs a lot of carl processes against the same cache at once, like `xargs -P 32 carl ...` does, to check that none of
+their writes are lost or seen half-written by the others
+"""
+import os
+import subprocess
+import sys
+import threading
+from pathlib import Path
+from typing import Callable, Dict, List
+
+import pytest
+
+from curl_arguments_url import spec_parser
+from curl_arguments_url.cache_backends import CacheStore, DirCacheStore, SqliteCacheStore
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, SpecFileContents
+
+WORKERS = 16
+PARAMS = 4
+VALUES_PER_WORKER = 20
+# each worker also uses this value several times a command, so the params' logs get long enough to be compacted
+SHARED_VALUE = 'shared'
+SHARED_VALUE_USES = 3
+
+WORKER_SCRIPT = f"""
+import sys
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+
+worker_i = int(sys.argv[1])
+param_name = f"param_{{worker_i % {PARAMS}}}"
+for value_i in range({VALUES_PER_WORKER}):
+    # a new repo each time, like a new carl process, which finds the spec caches out of date the first time
+    swagger_model = SwaggerRepo()
+    swagger_model.add_values(param_name, [f"value-{{worker_i}}-{{value_i}}", *[{SHARED_VALUE!r}] * {SHARED_VALUE_USES}])
+    assert {SHARED_VALUE!r} in swagger_model.get_ls_values_for_param(param_name)
+    completions = swagger_model.get_completions(3, ['carl', 'fake.com/completer', 'GET', '+'])
+    assert len(list(completions)) > 0
+"""
+
+
+@pytest.fixture()
+def carl_env(content_root: str, tmp_path: Path) -> Dict[str, str]:
+    open_api_dir = tmp_path / 'open_api'
+    open_api_dir.mkdir()
+    spec = Path(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    (open_api_dir / spec.name).write_text(spec.read_text())
+
+    env = dict(os.environ)
+    env['CARL_DIR'] = str(tmp_path)
+    env['CARL_OPEN_API_DIR'] = str(open_api_dir)
+    env['CARL_CACHE_DIR'] = str(tmp_path / 'cache')
+    env['PYTHONPATH'] = content_root
+    # enough to keep every value, but few enough that the logs are compacted
+    env['CARL_MAX_HISTORY'] = str(WORKERS // PARAMS * VALUES_PER_WORKER + 20)
+    return env
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+def test_parallel_carl_processes(carl_env: Dict[str, str], monkeypatch, backend_type: str):
+    carl_env['CARL_CACHE_BACKEND'] = backend_type
+    workers = [
+        subprocess.Popen([sys.executable, '-c', WORKER_SCRIPT, str(worker_i)], env=carl_env,
+                         stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        for worker_i in range(WORKERS)
+    ]
+    for worker in workers:
+        _, stderr = worker.communicate(timeout=300)
+        assert worker.returncode == 0, stderr
+
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    monkeypatch.setenv('CARL_MAX_HISTORY', carl_env['CARL_MAX_HISTORY'])
+    monkeypatch.setattr('curl_arguments_url.curl_arguments_url.CACHE_DIR', carl_env['CARL_CACHE_DIR'])
+    spec_files = [os.path.join(carl_env['CARL_OPEN_API_DIR'], 'openapi-test.yml')]
+    swagger_model = SwaggerRepo(files=spec_files)
+    assert swagger_model.get_params_with_cached_values() == [f"param_{i}" for i in range(PARAMS)]
+    for param_i in range(PARAMS):
+        expected_values = {
+            f"value-{worker_i}-{value_i}"
+            for worker_i in range(param_i, WORKERS, PARAMS) for value_i in range(VALUES_PER_WORKER)
+        }
+        values = list(swagger_model.get_ls_values_for_param(f"param_{param_i}"))
+        # used the most often
+        assert values[0] == SHARED_VALUE
+        assert set(values[1:]) == expected_values
+
+    ephemeral_model = SwaggerRepo(files=spec_files, ephemeral=True)
+    words = ['carl', 'fake.com/completer', 'GET', '+']
+    assert list(swagger_model.get_completions(3, words)) == list(ephemeral_model.get_completions(3, words))
+
+
+@pytest.mark.parametrize('backend_type,store_type', [('files', DirCacheStore), ('sqlite', SqliteCacheStore)])
+def test_parsing_outside_cache_transaction(content_root: str, cache_dir: str, monkeypatch, backend_type: str,
+                                           store_type: Callable[[str], CacheStore]):
+    """ Other processes can write to the cache while the spec files are being parsed """
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    original_parse_spec_file = spec_parser.parse_spec_file
+    # for each file, whether the value was cached while it was being parsed
+    values_cached: List[bool] = []
+
+    def cache_value() -> None:
+        # with a store of its own, like another process
+        cache_store = store_type(cache_dir)
+        with cache_store.transaction():
+            cache_store.get_backend('arg_values').append('param', '0.0\t"value"\n')
+
+    def parse_spec_file(file: str, warnings: bool) -> SpecFileContents:
+        thread = threading.Thread(target=cache_value, daemon=True)
+        thread.start()
+        thread.join(timeout=2)
+        values_cached.append(not thread.is_alive())
+        return original_parse_spec_file(file, warnings)
+
+    monkeypatch.setattr(spec_parser, 'parse_spec_file', parse_spec_file)
+    spec_file = os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    SwaggerRepo(files=[spec_file], jobs=1)
+    assert values_cached == [True]
@@ -4,15 +4,27 @@
 import argparse
 import io
 import itertools
+import json
+import math
+import os
 import re
 import sys
 from copy import deepcopy
-from typing import List, Tuple, Optional, Iterable, NamedTuple, Any
+from pathlib import Path
+from typing import List, Tuple, Optional, Iterable, NamedTuple, Any, TextIO
 from unittest.mock import MagicMock, ANY
 
 import pytest
 
-from curl_arguments_url.curl_arguments_url import SwaggerRepo, CompletionItem, GENERIC_OPTIONAL_ARGS
+from curl_arguments_url import arg_values, spec_parser, curl_arguments_url
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, CompletionItem, GENERIC_OPTIONAL_ARGS, UrlToCache, \
+    EndpointToCache, build_url_prefix_index, search_url_prefix_index, get_no_url_parser, build_url_tree, UrlSegment, \
+    get_completion_context, CompletionContext, CompletionContextType, CarlParamReference, ParamType, CarlParam, \
+    build_endpoint_completion_table, EnumChoices, ParamArg, \
+    ArgCache, ParamValue, ArgValuesHistory, read_values, read_fan_out_rows, \
+    CarlRequest, get_curl_config_lines, get_jobs, non_negative_int_type, positive_int_type
+from curl_arguments_url.completion_tables import search_completion_table, build_enum_index, search_enum_index
+from curl_arguments_url.models.methods import Method
 
 ALL_PATHS = [
     '/completer',
@@ -133,6 +145,7 @@ def escape_help_re(help_text: str) -> str:
 
 @pytest.mark.parametrize('args,expected_regexes', [  # expected is a list of regexes to match to
     (['--help'], ALL_URLS),
+    (['--help', 'FAKE.com/p'], [re.escape(u) for u in ['fake.com/posting/raw/stuff', 'fake.com/posting/stuff']]),
     (['fake.com/completer', '--help'], ['GET', 'POST', 'DELETE', 'PATCH']),
     (['fake.com/completer', 'GET', '--help'],
      GENERIC_OPTIONAL_NAME_OR_FLAGS
@@ -197,12 +210,27 @@ ARG_PATH_AND_BODY_COMPLETIONS = [
     CompletionItem(tag='+arg:PATH', description=None),
 ]
 ALL_GENERIC_COMPLETIONS = [
+    CompletionItem(tag='--bench', description='Load-test the endpoint: send the request over and over, in-process, and'
+                                              ' report the throughput and latencies instead of the response'),
+    CompletionItem(tag='--bench-duration', description='Keep sending requests with --bench for this long'),
+    CompletionItem(tag='--bench-requests', description='Number of requests sent with --bench.  Default: 100, or as'
+                                                       ' many as can be sent in --bench-duration'),
     CompletionItem(tag='--body', description='Base json object to send in the body.  Required body params are still'
                                              ' required unless -R option passed.  Useful for dealing with incomplete'
                                              ' specs.'),
     CompletionItem(tag='--body-json', description='Base json object to send in the body.  Required body params are'
                                                   ' still required unless -R option passed.  Useful for dealing with'
                                                   ' incomplete specs.'),
+    CompletionItem(tag='--concurrency', description='Number of requests sent at a time with --fan-out, --fan-out-file'
+                                                    ' or --bench.  Default: 8'),
+    CompletionItem(tag='--fan-out', description='Send a separate request for each value of the param (or each'
+                                                ' combination of values, if given more than once), several at a time.'
+                                                '  PARAM is without the "+"'),
+    CompletionItem(tag='--fan-out-file', description='Send a separate request for each row of the file, several at a'
+                                                     ' time: csv with a header of param names (without the "+"), or a'
+                                                     ' json object of param values on each line.  "-" for stdin'),
+    CompletionItem(tag='--in-process', description="Send the request from carl itself instead of running curl, which"
+                                                   " is faster but can't take curl's arguments"),
     CompletionItem(
         tag='--no-requires',
         description="Don't check to see if required parameter values are missing or if values are one of the"
@@ -210,6 +238,9 @@ ALL_GENERIC_COMPLETIONS = [
     ),
     CompletionItem(tag='--no-run', description="Don't run the curl command.  Useful with -p"),
     CompletionItem(tag='--print-cmd', description='Print the resulting curl command to standard out'),
+    CompletionItem(tag='--print-curl-config', description='Print a curl config for the request (or all of them, with'
+                                                          ' --fan-out), to run with `curl --config FILE`, instead of'
+                                                          ' running it'),
     CompletionItem(
         tag='-R',
         description="Don't check to see if required parameter values are missing or if values are one of the"
@@ -263,18 +294,21 @@ get_completions_parametrize = GetCompletionsParametrize(
         (3, ['carl', 'fake.com/completer', 'GET', '+foobar'], [FOOBAR_COMPLETION]),
         (5, ['carl', 'fake.com/completer', 'GET', '+barfoo', 'foo', '+foo'], FOO_PREFIXED_COMPLETIONS),
         (3, ['carl', 'fake.com/{arg}/in/path/and/body', 'POST', '+'], ARG_PATH_AND_BODY_COMPLETIONS),
+        # the cached values are the most recently used first
         (4, ['carl', 'fake.com/{thing}/do', 'GET', '+thing', ''], [
             CompletionItem(tag=t, description=None) for t in (
-                'bar-thing', 'barfoo-thing', 'foo-thing', 'foobar-thing'
+                'barfoo-thing', 'foobar-thing', 'bar-thing', 'foo-thing'
             )
         ]),
         (7, ['carl', 'fake.com/{thing}/do', 'GET', '+thing', 'block', '+bang', 'bar', 'foo'], [
-            CompletionItem(tag=t, description=None) for t in ('foo-bang', 'foobar-bang')
+            CompletionItem(tag=t, description=None) for t in ('foobar-bang', 'foo-bang')
         ]),
         (3, ['carl', 'fake.com/completer', 'POST', '-'], ALL_GENERIC_COMPLETIONS),
         (5, ['carl', 'fake.com/completer', 'POST', '+foo', 'some-val', '-'], ALL_GENERIC_COMPLETIONS),
         (3, ['carl', 'utils', 'cached-values', ''], [
             CompletionItem(tag='add', description='Add one or more values for a param to the cache'),
+            CompletionItem(tag='export', description='Print the values cached for a param, one per line'),
+            CompletionItem(tag='import', description='Add values for a param from a file, one per line'),
             CompletionItem(tag='ls', description='List all the values cached for a particular param'),
             CompletionItem(tag='params', description='List all the param names that have values cached'),
             CompletionItem(tag='rm', description='Remove a value for an param from the cache for completions')
@@ -283,8 +317,8 @@ get_completions_parametrize = GetCompletionsParametrize(
             CompletionItem(tag=t, description=None) for t in ('foo-bang', 'foobar-bang')
         ]),
         (4, ['carl', 'fake.com/posting/raw/stuff', 'POST', '+arg_nested', '{"A": 1, "B": "foo'], [
-            CompletionItem(tag='{"A": 1, "B": "foo-B-nested"}', description=None),
             CompletionItem(tag='{"A": 1, "B": "foobar-B-nested"}', description=None),
+            CompletionItem(tag='{"A": 1, "B": "foo-B-nested"}', description=None),
         ]),
         (4, ['carl', 'fake.com/completer', 'DELETE', '+foo', ''], [
             CompletionItem(tag=t, description=None) for t in ('bar1', 'bar2', 'foo1', 'foo2')
@@ -292,6 +326,9 @@ get_completions_parametrize = GetCompletionsParametrize(
         (4, ['carl', 'fake.com/completer', 'DELETE', '+foo', 'ba'], [
             CompletionItem(tag=t, description=None) for t in ('bar1', 'bar2')
         ]),
+        (4, ['carl', 'fake.com/completer', 'DELETE', '+foo:QUERY', 'ba'], [
+            CompletionItem(tag=t, description=None) for t in ('bar1', 'bar2')
+        ]),
         (1, ['carl', 'http:'], [
             CompletionItem(tag=t, description=ANY) for t in ALL_URLS if t.startswith('http://')
         ])
@@ -411,6 +448,100 @@ def test_add_complex_value(swagger_model: SwaggerRepo):
     assert [v.tag for v in actual_remaining_values] == remaining_values
 
 
+@pytest.mark.usefixtures('cache_param_values')
+def test_import_export_values(swagger_model: SwaggerRepo):
+    imported = swagger_model.import_values('bang', read_values(io.StringIO(
+        'imported-1\n\nfoo-bang\nimported-2\r\nimported-1\n'
+    )))
+    assert (imported.read, imported.kept, imported.dropped) == (3, 3, 0)
+    # "foo-bang" has now been used twice
+    assert list(swagger_model.get_ls_values_for_param('bang')) == [
+        'foo-bang', 'imported-2', 'imported-1', 'barfoo-bang', 'foobar-bang', 'bar-bang'
+    ]
+    # exported lowest ranked first, so importing them again keeps them in order
+    exported = ''.join(swagger_model.export_values('bang'))
+    assert exported == 'bar-bang\nfoobar-bang\nbarfoo-bang\nimported-1\nimported-2\nfoo-bang\n'
+
+    imported = swagger_model.import_values('new_param', read_values(
+        ['{"A": 1}\n', '"1"\n', '1\n', '{"A": 1}\n'], jsonl=True
+    ))
+    assert imported.read == 3
+    assert 'new_param' in swagger_model.get_params_with_cached_values()
+    assert list(swagger_model.export_values('new_param', jsonl=True)) == ['{"A": 1}\n', '"1"\n', '1\n']
+
+    with pytest.raises(ValueError, match='Line 2'):
+        list(read_values(['1\n', '{\n'], jsonl=True))
+
+
+@pytest.mark.usefixtures('cache_param_values')
+def test_import_values_past_max_history(swagger_model: SwaggerRepo, monkeypatch):
+    monkeypatch.setenv('CARL_MAX_HISTORY', '4')
+    imported = swagger_model.import_values('new_param', [f"imported-{i}" for i in range(6)])
+    # the earliest ones are dropped
+    assert (imported.read, imported.kept, imported.dropped) == (6, 4, 2)
+    assert list(swagger_model.get_ls_values_for_param('new_param')) == [f"imported-{i}" for i in range(5, 1, -1)]
+
+
+def test_fan_out(swagger_model: SwaggerRepo):
+    request, generic_args = swagger_model.cli_args_to_request([
+        'fake.com/{thing}/do', 'GET', '+thing', 'a', 'b', '+bang', '1', '2', '3', '--fan-out', 'thing', '--fan-out',
+        'bang', '--concurrency', '2'
+    ])
+    fan_out = generic_args.fan_out
+    assert fan_out is not None and fan_out.concurrency == 2
+    assert [(p, r.url) for p, r in fan_out.get_requests()] == [
+        ({'thing': thing, 'bang': bang}, f"fake.com/{thing}/do?bang={bang}")
+        for thing in ['a', 'b'] for bang in ['1', '2', '3']
+    ]
+    # without --fan-out, both values are in the one request
+    assert request is not None and request.url == 'fake.com/a/do?bang=1&bang=2&bang=3'
+
+    _, generic_args = swagger_model.cli_args_to_request([
+        'fake.com/posting/raw/stuff', 'POST', '+arg_list', 'A', '+arg_list_int', '1', '--fan-out-file', 'rows.csv'
+    ])
+    fan_out = generic_args.fan_out
+    assert fan_out is not None and fan_out.file == 'rows.csv'
+    rows = read_fan_out_rows(['arg_list_int,arg_nested\n', '2,"{""A"": 2}"\n', '3,\n'], fan_out.params_by_name)
+    assert [(p, json.loads(r.body or '')) for p, r in fan_out.get_requests(rows)] == [
+        ({'arg_list_int': 2, 'arg_nested': {'A': 2}}, {'arg_list': ['A'], 'arg_list_int': [2], 'arg_nested': {'A': 2}}),
+        ({'arg_list_int': 3}, {'arg_list': ['A'], 'arg_list_int': [3]}),
+    ]
+    rows = read_fan_out_rows(['{"arg_list": ["B", "C"]}\n', '\n', '{"arg_list_int": "4"}\n'], fan_out.params_by_name)
+    assert [(p, json.loads(r.body or '')) for p, r in fan_out.get_requests(rows)] == [
+        ({'arg_list': ['B', 'C']}, {'arg_list': ['B', 'C'], 'arg_list_int': [1]}),
+        ({'arg_list_int': 4}, {'arg_list': ['A'], 'arg_list_int': [4]}),
+    ]
+
+    with pytest.raises(ValueError, match="Line 2: 'nope' isn't a param"):
+        list(read_fan_out_rows(['arg_list,nope\n', 'A,B\n'], fan_out.params_by_name))
+    with pytest.raises(ValueError, match='Line 2: invalid value for \\+arg_list_int'):
+        list(read_fan_out_rows(['{"arg_list_int": 1}\n', '{"arg_list_int": "one"}\n'], fan_out.params_by_name))
+    with pytest.raises(SystemExit):
+        swagger_model.cli_args_to_request(['fake.com/{thing}/do', 'GET', '+thing', 'a', '--fan-out', 'bang'])
+    with pytest.raises(SystemExit):
+        swagger_model.cli_args_to_request([
+            'fake.com/{thing}/do', 'GET', '+thing', 'a', '--fan-out', 'thing', '--concurrency', '0'
+        ])
+
+
+def test_curl_config():
+    request = CarlRequest('POST', 'fake.com/post?a=b c', headers=[('X-Quoted', 'say "hi"')], body='{"A": "1\\\\2\\n"}')
+    assert request.to_curl_config() == [
+        'request = "POST"\n',
+        'url = "fake.com/post?a=b c"\n',
+        'header = "X-Quoted: say \\"hi\\""\n',
+        'header = "Content-Type: application/json"\n',
+        'data-binary = "{\\"A\\": \\"1\\\\\\\\2\\\\n\\"}"\n',
+    ]
+    get_request = CarlRequest('GET', 'fake.com/get', headers=[])
+    assert list(get_curl_config_lines([get_request, get_request], parallel_max=4)) == [
+        'parallel\n', 'parallel-max = 4\n',
+        'request = "GET"\n', 'url = "fake.com/get"\n', 'next\n', 'request = "GET"\n', 'url = "fake.com/get"\n'
+    ]
+    with pytest.raises(ValueError, match='--verbose'):
+        get_request._replace(curl_args=['--verbose']).to_curl_config()
+
+
 def test_empty(monkeypatch):
     """ Don't error if there are no files """
     swagger_model = SwaggerRepo(files=[], ephemeral=True)
@@ -424,3 +555,402 @@ def test_empty(monkeypatch):
     assert list(swagger_model.get_completions(1, ['carl', ''])) == [
         CompletionItem('utils', description='Utilities')
     ]
+
+
+INCREMENTAL_SPEC_TEMPLATE = """\
+openapi: 3.0.0
+info:
+  title: {title}
+servers:
+  - url: incremental.com
+paths:
+  /shared:
+    {shared_method}: {{}}
+  {path}:
+    get: {{}}
+"""
+
+
+def test_incremental_spec_cache_rebuild(tmp_path: Path, monkeypatch) -> None:
+    file_a = tmp_path / 'a.yml'
+    file_b = tmp_path / 'b.yml'
+    file_a.write_text(INCREMENTAL_SPEC_TEMPLATE.format(title='A', shared_method='get', path='/from-a'))
+    file_b.write_text(INCREMENTAL_SPEC_TEMPLATE.format(title='B', shared_method='post', path='/from-b'))
+    files = [str(file_a), str(file_b)]
+    swagger_model = SwaggerRepo(files=files, ephemeral=True)
+
+    def url_tags() -> List[str]:
+        return [c.tag for c in swagger_model.get_completions(1, ['carl', 'incremental.com'])]
+
+    def method_tags() -> List[str]:
+        return [c.tag for c in swagger_model.get_completions(2, ['carl', 'incremental.com/shared', ''])]
+
+    assert url_tags() == ['incremental.com/from-a', 'incremental.com/from-b', 'incremental.com/shared']
+    assert method_tags() == ['GET', 'POST']
+
+    parsed_files: List[str] = []
+    original_parse_spec_file = spec_parser.parse_spec_file
+
+    def mock_parse_spec_file(file: str, warnings: bool) -> Any:
+        parsed_files.append(file)
+        return original_parse_spec_file(file, warnings)
+
+    monkeypatch.setattr(spec_parser, 'parse_spec_file', mock_parse_spec_file)
+
+    # nothing changed, so nothing is parsed
+    swagger_model.refresh_spec_caches(files)
+    assert parsed_files == []
+
+    # only the changed file is reparsed
+    file_b.write_text(INCREMENTAL_SPEC_TEMPLATE.format(title='B', shared_method='post', path='/from-b-changed'))
+    swagger_model.refresh_spec_caches(files)
+    assert parsed_files == [str(file_b)]
+    assert url_tags() == ['incremental.com/from-a', 'incremental.com/from-b-changed', 'incremental.com/shared']
+
+    # deleted files are detected, but the urls they share with other files remain
+    file_b.unlink()
+    swagger_model.refresh_spec_caches([str(file_a)])
+    assert parsed_files == [str(file_b)]
+    assert url_tags() == ['incremental.com/from-a', 'incremental.com/shared']
+    assert method_tags() == ['GET']
+
+
+def test_parallel_spec_parsing(content_root: str):
+    open_api_dir = os.path.join(content_root, 'tests', 'resources', 'open_api')
+    files = [os.path.join(open_api_dir, f) for f in ('openapi-test.yml', 'openapi-test-2.yml', 'openapi-demo.yml')]
+    serial_model = SwaggerRepo(files=files, ephemeral=True, jobs=1)
+    parallel_model = SwaggerRepo(files=files, ephemeral=True, jobs=2)
+
+    assert list(parallel_model.urls_cache.get_value()) == list(serial_model.urls_cache.get_value())
+    assert parallel_model.methods_cache == serial_model.methods_cache
+    assert parallel_model.endpoint_cache == serial_model.endpoint_cache
+
+
+@pytest.mark.parametrize('env_value,expected', [('4', 4), ('0', 0), ('-2', 1), ('lots', 1)])
+def test_get_jobs(env_value: str, expected: int, monkeypatch, capsys):
+    monkeypatch.setenv('CARL_JOBS', env_value)
+    assert get_jobs() == expected
+    assert ('CARL_JOBS is ignored' in capsys.readouterr().err) == (env_value in ('-2', 'lots'))
+
+
+def test_non_negative_int_type():
+    assert non_negative_int_type('0') == 0
+    for value in ('-1', '1.5'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            non_negative_int_type(value)
+
+
+def test_positive_int_type():
+    assert positive_int_type('1') == 1
+    for value in ('0', '-1', 'two'):
+        with pytest.raises(argparse.ArgumentTypeError):
+            positive_int_type(value)
+
+
+PREFIX_INDEX_URLS = ['a.com/Foo', 'a.com/foo/bar', 'a.com/foo-bar', 'a.com/fop', 'B.com/foo', 'a.com', 'a.co/foo']
+
+
+@pytest.mark.parametrize('prefix,expected', [
+    ('', PREFIX_INDEX_URLS),
+    ('A.COM/FOO', ['a.com/Foo', 'a.com/foo/bar', 'a.com/foo-bar']),
+    ('a.com/foo/', ['a.com/foo/bar']),
+    ('a.com', ['a.com/Foo', 'a.com/foo/bar', 'a.com/foo-bar', 'a.com/fop', 'a.com']),
+    ('b', ['B.com/foo']),
+    ('c', []),
+])
+def test_url_prefix_index(prefix: str, expected: List[str]):
+    index = build_url_prefix_index(UrlToCache(url=u, summary=None, description=None) for u in PREFIX_INDEX_URLS)
+    actual = [u.url for u in search_url_prefix_index(index, prefix)]
+    assert sorted(actual) == sorted(expected)
+
+
+def value_context(param_name: str, param_type: Optional[ParamType] = None) -> CompletionContext:
+    return CompletionContext(CompletionContextType.param_value, CarlParamReference(param_name, param_type))
+
+
+PARAM_CONTEXT = CompletionContext(CompletionContextType.param)
+
+
+@pytest.mark.parametrize('words,expected', [
+    ([''], PARAM_CONTEXT),
+    (['+fo'], PARAM_CONTEXT),
+    (['+foo', ''], value_context('foo')),
+    (['+foo:QUERY', 'a', 'b', ''], value_context('foo', ParamType.query)),
+    (['+foo:BODY', '-'], value_context('foo', ParamType.json_body)),
+    (['+foo', 'a', '-'], PARAM_CONTEXT),
+    (['+foo', 'a', '+'], PARAM_CONTEXT),
+    (['+foo=a', ''], value_context('foo')),
+    (['+foo=a', '-'], PARAM_CONTEXT),
+    (['+foo', '-npR', 'a', ''], value_context('foo')),
+    (['+foo', '-pb', ''], CompletionContext(CompletionContextType.generic_arg_value)),
+    (['+foo', '--body', ''], CompletionContext(CompletionContextType.generic_arg_value)),
+    (['+foo', '--bo', '{}', ''], value_context('foo')),
+    (['+foo', '--body={}', ''], value_context('foo')),
+    (['+foo', '-pb{}', ''], value_context('foo')),
+    (['+foo', '-1', ''], value_context('foo')),
+    (['-p', '+foo', 'a', '+bar', 'b', ''], value_context('bar')),
+    (['+foo', 'a', '--', ''], CompletionContext(CompletionContextType.curl_arg)),
+    (['+foo', 'a', '--', '-H', ''], CompletionContext(CompletionContextType.curl_arg)),
+])
+def test_get_completion_context(words: List[str], expected: CompletionContext):
+    assert get_completion_context(words) == expected
+
+
+def test_completion_table():
+    endpoint = EndpointToCache(endpoint_url='a.com/{Id}', method=Method.GET, parameters=[
+        CarlParam(name='Id', param_type=ParamType.query, enums=['a', 'b']),
+        CarlParam(name='idea', param_type=ParamType.header, description='An idea'),
+    ])
+    table = build_endpoint_completion_table(endpoint)
+    assert [e.tag for e in search_completion_table(table, '+i')] == ['+Id:PATH', '+Id:QUERY', '+idea']
+    assert [e.tag for e in search_completion_table(table, '+ID:Q')] == ['+Id:QUERY']
+    assert list(search_completion_table(table, '+IDEA')) == [('+idea', 'An idea', 'header', None)]
+    assert list(search_completion_table(table, '+Id:QUERY'))[0].enum_index == [['a', 'a'], ['b', 'b']]
+    assert list(search_completion_table(table, '+x')) == []
+
+    swagger_model = SwaggerRepo(files=[], ephemeral=True)
+    swagger_model.completion_table_cache[endpoint.endpoint_url, endpoint.method] = table
+    assert swagger_model.get_enum_index(endpoint.endpoint_url, Method.GET, CarlParamReference('Id', ParamType.query)) \
+        == [['a', 'a'], ['b', 'b']]
+    assert swagger_model.get_enum_index(endpoint.endpoint_url, Method.GET, CarlParamReference('Id', None)) is None
+    assert swagger_model.get_enum_index(endpoint.endpoint_url, Method.GET, CarlParamReference('idea', None)) is None
+
+
+@pytest.mark.parametrize('prefix,expected', [
+    ('', ['EU-West', 'eu-central', 'us-east', 'us-east-2', '{"zone": 1}']),
+    ('EU', ['eu-central', 'EU-West']),
+    ('us-east', ['us-east', 'us-east-2']),
+    ('{', ['{"zone": 1}']),
+    ('x', []),
+])
+def test_enum_index(prefix: str, expected: List[str]):
+    enum_index = build_enum_index(['us-east', 'EU-West', 'eu-central', {'zone': 1}, 'us-east-2'])
+    assert sorted(search_enum_index(enum_index, prefix)) == sorted(expected)
+
+
+def test_enum_choices():
+    param = CarlParam(name='region', param_type=ParamType.query, enums=['us-east', 'eu-west', {'zone': [1, 2]}])
+    choices = EnumChoices(param)
+    assert ParamArg(param, ['eu-west']) in choices
+    assert ParamArg(param, ['eu-west', 'us-east']) in choices
+    assert ParamArg(param, [{'zone': [1, 2]}]) in choices
+    assert ParamArg(param, ['eu-west', 'eu-east']) not in choices
+    assert ParamArg(param._replace(), ['eu-west']) not in choices
+    assert [repr(c) for c in choices] == ['us-east', 'eu-west', '{"zone": [1, 2]}']
+    assert hash(ParamArg(param, [{'zone': [1, 2]}])) == hash(ParamArg(param, [{'zone': [1, 2]}]))
+
+
+@pytest.mark.parametrize('backend_type', ['files', 'sqlite'])
+def test_arg_cache_log(cache_dir: str, monkeypatch, backend_type: str):
+    monkeypatch.setenv('CARL_CACHE_BACKEND', backend_type)
+    monkeypatch.setenv('CARL_MAX_HISTORY', '3')
+    arg_cache = ArgCache('arg_values')
+    values: List[ParamValue] = ['a', {'b': 1}, 'c', 'a']
+    for value in values:
+        arg_cache.append('param', value, 0.0)
+    # "a" was used twice
+    assert list(ArgCache('arg_values')['param']) == ['a', 'c', {'b': 1}]
+
+    # only the 3 with the highest frecency
+    arg_cache.append('param', 'd', 0.0)
+    assert list(ArgCache('arg_values')['param']) == ['a', 'd', 'c']
+
+    # ... and the log is compacted once it gets long enough
+    for value in ['e', 'f']:
+        arg_cache.append('param', value, 0.0)
+    assert list(ArgCache('arg_values')['param']) == ['a', 'f', 'e']
+    frozen_values = arg_cache._backend.open(arg_cache._get_key_hash('param'))
+    assert frozen_values is not None
+    assert frozen_values.read() == f"\"a\"\t{math.log(2)!r}\t0\t\"a\"\n\"e\"\t0.0\t1\t\"e\"\n\"f\"\t0.0\t2\t\"f\"\n"
+    frozen_values.close()
+    assert list(ArgCache('arg_values')['param']) == ['a', 'f', 'e']
+
+
+def test_arg_cache_log_compacted_then_appended(cache_dir: str, monkeypatch):
+    """ Values used after the log was compacted rank as more recent than the ones which were compacted """
+    monkeypatch.setenv('CARL_MAX_HISTORY', '3')
+    arg_cache = ArgCache('arg_values')
+    for value in ['a', 'b', 'c', 'd', 'e', 'f', 'g']:
+        arg_cache.append('param', value, 0.0)
+    # compacted when it's read
+    assert list(arg_cache['param']) == ['g', 'f', 'e']
+    arg_cache.append('param', 'h', 0.0)
+    assert list(arg_cache['param']) == ['h', 'g', 'f']
+    assert list(ArgCache('arg_values')['param']) == ['h', 'g', 'f']
+
+
+def test_completions_after_compaction(content_root: str, cache_dir: str, monkeypatch):
+    """ Values completed after their log was compacted are in the order they were used, without loading all of them """
+    monkeypatch.setenv('CARL_MAX_HISTORY', '3')
+    # so the values only rank by when they were used
+    monkeypatch.setattr(curl_arguments_url, 'get_frecency_log_score', lambda timestamp: 0.0)
+    files = [os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')]
+
+    def completion_tags(swagger_model: SwaggerRepo, prefix: str) -> List[str]:
+        return [c.tag for c in swagger_model.get_completions_for_values_for_param('param', prefix)]
+
+    swagger_model = SwaggerRepo(files=files)
+    swagger_model.add_values('param', ['a1', 'b1', 'a2', 'b2', 'a3', 'b3', 'a4'])
+    # compacted when it's loaded
+    assert list(swagger_model.get_ls_values_for_param('param')) == ['a4', 'b3', 'a3']
+    swagger_model.add_values('param', ['b4'])
+    assert completion_tags(swagger_model, '') == ['b4', 'a4', 'b3']
+    swagger_model.add_values('param', ['a3'])
+    assert completion_tags(swagger_model, 'a') == ['a3', 'a4']
+
+    def thaw(self: ArgCache, frozen_value: TextIO) -> ArgValuesHistory:
+        raise AssertionError('Loaded all the values')
+
+    monkeypatch.setattr(ArgCache, 'thaw', thaw)
+    swagger_model = SwaggerRepo(files=files)
+    assert completion_tags(swagger_model, '') == ['a3', 'b4', 'a4', 'b3']
+    assert completion_tags(swagger_model, 'A') == ['a3', 'a4']
+
+
+@pytest.mark.parametrize('prefix', ['', 'id-', 'ID-1', 'id-12', 'x', '"', 'ä', '{"', 'id-0007'])
+def test_arg_cache_search(cache_dir: str, monkeypatch, prefix: str):
+    """ Searching the log finds what loading all of it and searching that would, compacted or not """
+    monkeypatch.setenv('CARL_MAX_HISTORY', '50')
+    monkeypatch.setattr(arg_values, 'MAX_APPENDED_LOG_LINES', 20)
+    values: List[ParamValue] = [f"ID-{i:04}" for i in range(40)]
+    values += ['"quoted"', 'Ärger', 'äpfel', {'id': 1}, 'id-0007']
+    arg_cache = ArgCache('arg_values')
+    for i, value in enumerate(values * 2):
+        arg_cache.append('param', value, float(i % 3))
+        if i % 10 == 0:
+            assert ArgCache('arg_values').search('param', prefix) == ArgCache('arg_values')['param'].search(prefix)
+    for value in values[:25]:
+        arg_cache.append('param', value, 1.0)
+    # compacted by the search, since it had too many lines appended to it
+    expected = ArgCache('arg_values').search('param', prefix)
+    assert ArgCache('arg_values')['param'].search(prefix) == expected
+    frozen_values = arg_cache._backend.open(arg_cache._get_key_hash('param'))
+    assert frozen_values is not None
+    assert frozen_values.read().count('\n') == len(ArgCache('arg_values')['param'])
+    frozen_values.close()
+
+    for value in ['id-new', 'ä-new', 'ID-0001']:
+        arg_cache.append('param', value, 3.0)
+    arg_cache = ArgCache('arg_values')
+    assert arg_cache.search('param', prefix) == ArgCache('arg_values')['param'].search(prefix)
+    # without loading all the values
+    assert 'param' not in arg_cache._process_cache
+    assert arg_cache.search('missing', prefix) == []
+
+
+def test_arg_cache_log_from_list(cache_dir: str):
+    """ The values used to be stored as a json list, with the most recent first """
+    arg_cache = ArgCache('arg_values')
+    arg_cache._backend.write(arg_cache._get_key_hash('param'), json.dumps(['c', ['b'], 'a']))
+    assert list(ArgCache('arg_values')['param']) == ['c', ['b'], 'a']
+
+    arg_cache.append('param', 'd', 0.0)
+    assert list(ArgCache('arg_values')['param']) == ['d', 'c', ['b'], 'a']
+
+
+def test_url_tree():
+    tree = build_url_tree(UrlToCache(url=u, summary=None, description=None) for u in PREFIX_INDEX_URLS)
+    # the lone urls under "a.co/" and "b.com/" take the place of their segments
+    assert tree[''].segments == [UrlSegment(prefix='a.com/', url_count=4)]
+    assert sorted(u.url for u in tree[''].urls) == ['B.com/foo', 'a.co/foo', 'a.com']
+    assert tree['a.com/'].segments == []
+    assert sorted(u.url for u in tree['a.com/'].urls) == ['a.com/Foo', 'a.com/foo-bar', 'a.com/foo/bar', 'a.com/fop']
+    assert [u.url for u in tree['a.com/foo/'].urls] == ['a.com/foo/bar']
+
+
+@pytest.mark.parametrize('prefix,expected', [
+    ('', [
+        CompletionItem(tag=s + '/', description='11 urls') for s in sorted(ALL_SERVERS)
+    ] + [CompletionItem('utils', 'Utilities')]),
+    ('HTTP://', [
+        CompletionItem(tag=s + '/', description='11 urls') for s in sorted(ALL_SERVERS) if s.startswith('http://')
+    ]),
+    ('fake.com/', [
+        CompletionItem(tag='fake.com' + p, description=ANY) for p in sorted(ALL_PATHS) if not p.startswith('/posting')
+    ] + [CompletionItem(tag='fake.com/posting/', description='2 urls')]),
+    ('Fake.com/p', POSTING_URL_COMPLETIONS),
+    ('fake.com/need/', [CompletionItem(tag='fake.com/need/a/header/{for}/this', description='Testing Spec')]),
+    ('fake.com/nothing', []),
+])
+def test_url_segment_completions(swagger_model: SwaggerRepo, monkeypatch, prefix: str,
+                                 expected: List[CompletionItem]):
+    monkeypatch.setenv('CARL_URL_COMPLETION', 'segments')
+    assert sorted(swagger_model.get_completions(1, ['carl', prefix])) == sorted(expected)
+
+
+@pytest.mark.parametrize('spec_file', ['openapi-test.yml', 'openapi-test-2.yml', 'openapi-demo.yml'])
+def test_cached_model_round_trip(content_root: str, spec_file: str):
+    spec_file_contents = spec_parser.parse_spec_file(
+        os.path.join(content_root, 'tests', 'resources', 'open_api', spec_file), warnings=False
+    )
+    assert len(spec_file_contents.endpoints) > 0
+    for endpoint in spec_file_contents.endpoints:
+        thawed_endpoint = EndpointToCache.from_obj(json.loads(json.dumps(endpoint.to_obj())))
+        assert thawed_endpoint == endpoint
+        assert thawed_endpoint.method is endpoint.method
+        for param, thawed_param in zip(endpoint.parameters, thawed_endpoint.parameters):
+            assert thawed_param.param_type is param.param_type
+            assert thawed_param.type_.type_ is param.type_.type_
+    for url in spec_file_contents.urls:
+        assert UrlToCache.from_obj(json.loads(json.dumps(url.to_obj()))) == url
+
+
+def test_to_enums():
+    assert spec_parser.to_enums(None) is None
+    assert spec_parser.to_enums([1, 2.5, True, 'a', {'b': 1}, [2]]) == ['1', '2.5', 'True', 'a', {'b': 1}, [2]]
+
+
+@pytest.mark.parametrize('args,expected_endpoints_thawed', [
+    (['fake.com/completer', 'POST', '+foo', 'bar'], [('fake.com/completer', Method.POST)]),
+    (['fake.com/completer', 'PATCH', '--help'], [('fake.com/completer', Method.PATCH)]),
+    (['fake.com/completer', '--help'], []),
+    (['fake.com/completer', 'PUT'], []),
+])
+def test_only_selected_method_parser_built(swagger_model: SwaggerRepo, monkeypatch, capsys,
+                                           args: List[str], expected_endpoints_thawed: List[Tuple[str, Method]]):
+    endpoints_thawed: List[Tuple[str, Method]] = []
+    original_get_cached_endpoint = swagger_model.get_cached_endpoint
+
+    def mock_get_cached_endpoint(url: str, method: Method) -> EndpointToCache:
+        endpoints_thawed.append((url, method))
+        return original_get_cached_endpoint(url, method)
+
+    monkeypatch.setattr(swagger_model, 'get_cached_endpoint', mock_get_cached_endpoint)
+    try:
+        swagger_model.cli_args_to_cmd(args)
+    except SystemExit:
+        pass
+    assert endpoints_thawed == expected_endpoints_thawed
+
+
+def get_cli_output(swagger_model: SwaggerRepo, capsys, args: List[str]) -> Tuple[Any, str, str]:
+    code: Any = None
+    try:
+        swagger_model.cli_args_to_cmd(args)
+    except SystemExit as e:
+        code = e.code
+    captured = capsys.readouterr()
+    return code, captured.out, captured.err
+
+
+@pytest.mark.parametrize('args', [['--help'], [], ['not-a-url'], ['not-a-url', '--help'], ['-x']])
+def test_cached_help(swagger_model: SwaggerRepo, monkeypatch, capsys, args: List[str]):
+    expected = get_cli_output(swagger_model, capsys, args)
+
+    def mock_render_help_text() -> Any:
+        raise AssertionError('The help should have been rendered when the caches were built')
+
+    monkeypatch.setattr(swagger_model, 'render_help_text', mock_render_help_text)
+    # the same output as from the parser with a subparser for every url
+    assert get_cli_output(swagger_model, capsys, args) == expected
+    # ... which is what it would get if we rendered everything
+    with pytest.raises(SystemExit):
+        get_no_url_parser(swagger_model.urls_cache.get_value()).parse_args(args)
+    assert capsys.readouterr() == expected[1:]
+
+
+def test_help_prefix_filter(swagger_model: SwaggerRepo, capsys):
+    code, out, _ = get_cli_output(swagger_model, capsys, ['--help', 'fake.com/posting/'])
+    assert code == 0
+    assert 'fake.com/posting/stuff' in out
+    assert 'fake.com/get' not in out
@@ -0,0 +1,49 @@
+import os
+import threading
+from pathlib import Path
+from typing import Iterator
+
+import pytest
+
+from curl_arguments_url.cli import get_zsh_completion_lines
+from curl_arguments_url.curl_arguments_url import SwaggerRepo
+from curl_arguments_url.daemon import CompletionDaemon, request_completion_lines
+
+
+@pytest.fixture()
+def daemon_socket(swagger_model: SwaggerRepo, tmp_path: Path) -> Iterator[str]:
+    socket_path = str(tmp_path / 'daemon.sock')
+    daemon = CompletionDaemon(socket_path, swagger_model, get_zsh_completion_lines)
+    thread = threading.Thread(target=daemon.serve_forever)
+    thread.start()
+    try:
+        yield socket_path
+    finally:
+        daemon.shutdown()
+        thread.join()
+        daemon.server_close()
+
+
+@pytest.mark.parametrize('word_index,line', [
+    (2, 'carl fake.com/posting/'),
+    (3, 'carl fake.com/completer '),
+    (4, 'carl fake.com/completer GET +foo'),
+    (3, 'carl utils '),
+])
+def test_daemon_completions(swagger_model: SwaggerRepo, daemon_socket: str, word_index: int, line: str):
+    expected = list(get_zsh_completion_lines(swagger_model, word_index, line))
+    assert len(expected) > 0
+
+    actual = request_completion_lines(daemon_socket, word_index, line)
+    assert actual == expected
+
+
+def test_daemon_not_running(tmp_path: Path):
+    assert request_completion_lines(str(tmp_path / 'no-daemon.sock'), 2, 'carl fake.com') is None
+
+
+def test_daemon_removes_socket(swagger_model: SwaggerRepo, tmp_path: Path):
+    socket_path = str(tmp_path / 'daemon.sock')
+    with CompletionDaemon(socket_path, swagger_model, get_zsh_completion_lines):
+        assert os.path.exists(socket_path)
+    assert not os.path.exists(socket_path)
@@ -0,0 +1,61 @@
+import json
+from typing import Tuple
+
+import pytest
+
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, CarlRequest
+from curl_arguments_url.http_executor import ConnectionPool, InProcessError, split_request_url
+from tests.echo_server import EchoServer
+
+
+@pytest.mark.parametrize('url,expected', [
+    ('fake.com/get', (('http', 'fake.com', 80), '/get')),
+    ('https://fake.com', (('https', 'fake.com', 443), '/')),
+    ('http://localhost:8080/a/b?c=d&e=f', (('http', 'localhost', 8080), '/a/b?c=d&e=f')),
+])
+def test_split_request_url(url: str, expected: Tuple):
+    assert split_request_url(url) == expected
+
+
+def test_connection_pool(swagger_model: SwaggerRepo, echo_server: EchoServer):
+    request, generic_args = swagger_model.cli_args_to_request([
+        'fake.com/posting/stuff', 'POST', '+arg_one', 'this', '+arg_two', '2', '--in-process'
+    ])
+    assert request is not None
+    assert generic_args.in_process
+    pool = ConnectionPool()
+
+    response = pool.send(request._replace(url=request.url.replace('fake.com', echo_server.url)))
+    assert response.status == 200
+    echoed = json.loads(response.body)
+    assert (echoed['path'], echoed['method']) == ('/posting/stuff', 'POST')
+    assert echoed['json_body'] == {'arg_one': 'this', 'arg_two': 2}
+    assert echoed['headers']['Content-Type'] == 'application/json'
+
+    response = pool.send(CarlRequest('GET', f"{echo_server.url}/missing?a=1&a=2", headers=[('X-Thing', 'thing')]))
+    assert response.status == 404
+    echoed = json.loads(response.body)
+    assert (echoed['query'], echoed['headers']['X-Thing']) == ({'a': ['1', '2']}, 'thing')
+    # the second request reused the first one's connection
+    assert len(echo_server.client_ports) == 1
+
+    echo_server.close_after_response = True
+    for _ in range(3):
+        assert pool.send(CarlRequest('GET', f"{echo_server.url}/get", headers=[])).status == 200
+    # the first still went on the first connection, but then each found its connection closed and retried on a new one
+    assert len(echo_server.client_ports) == 3
+    pool.close()
+
+
+def test_connection_pool_errors(echo_server: EchoServer):
+    pool = ConnectionPool(timeout=5)
+    with pytest.raises(InProcessError, match='--verbose'):
+        pool.send(CarlRequest('GET', f"{echo_server.url}/get", headers=[], curl_args=['--verbose']))
+    with pytest.raises(InProcessError, match='ftp'):
+        pool.send(CarlRequest('GET', 'ftp://fake.com/get', headers=[]))
+
+    url = echo_server.url
+    echo_server.shutdown()
+    echo_server.server_close()
+    with pytest.raises(InProcessError):
+        pool.send(CarlRequest('GET', f"{url}/get", headers=[]))
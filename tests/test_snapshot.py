@@ -0,0 +1,213 @@
+import json
+import os
+import shutil
+from hashlib import md5
+from pathlib import Path
+from typing import List
+
+import pytest
+
+from curl_arguments_url.curl_arguments_url import SwaggerRepo, get_spec_snapshot_path, get_endpoint_key, \
+    SNAPSHOT_COMPLETION_TABLES_TABLE, SNAPSHOT_TABLES, CompletionTableCache, freeze_index, thaw_index
+from curl_arguments_url.models.methods import Method
+from curl_arguments_url.snapshot import Snapshot, write_snapshot, HEADER
+
+DIGEST = b'0123456789abcdef'
+
+
+@pytest.fixture()
+def snapshot_path(tmp_path: Path) -> str:
+    snapshot_path = str(tmp_path / 'test.snapshot')
+    write_snapshot(snapshot_path, DIGEST, {
+        'fruit': [('banana', 'yellow'), ('apple', 'red'), ('apricot', 'orange'), ('äpfel', 'rot')],
+        'colors': [('red', 'apple')],
+        'empty': [],
+    })
+    return snapshot_path
+
+
+def test_snapshot_get(snapshot_path: str):
+    snapshot = Snapshot.open(snapshot_path)
+    assert snapshot is not None
+    assert snapshot.digest == DIGEST
+
+    assert snapshot.get('fruit', 'apple') == 'red'
+    assert snapshot.get('fruit', 'äpfel') == 'rot'
+    assert snapshot.get('fruit', 'banana') == 'yellow'
+    assert snapshot.get('fruit', 'red') is None
+    assert snapshot.get('fruit', 'cherry') is None
+    assert snapshot.get('colors', 'red') == 'apple'
+    assert snapshot.get('empty', 'red') is None
+    assert snapshot.get('missing', 'red') is None
+    assert list(snapshot.iter_prefix('missing', '')) == []
+    snapshot.close()
+
+
+@pytest.mark.parametrize('prefix,expected_keys', [
+    ('', ['apple', 'apricot', 'banana', 'äpfel']),
+    ('ap', ['apple', 'apricot']),
+    ('apr', ['apricot']),
+    ('ä', ['äpfel']),
+    ('c', []),
+])
+def test_snapshot_iter_prefix(snapshot_path: str, prefix: str, expected_keys: List[str]):
+    snapshot = Snapshot.open(snapshot_path)
+    assert snapshot is not None
+    assert [key for key, _ in snapshot.iter_prefix('fruit', prefix)] == expected_keys
+    snapshot.close()
+
+
+def test_snapshot_not_readable(snapshot_path: str, tmp_path: Path):
+    assert Snapshot.open(str(tmp_path / 'missing.snapshot')) is None
+
+    empty_path = tmp_path / 'empty.snapshot'
+    empty_path.write_bytes(b'')
+    assert Snapshot.open(str(empty_path)) is None
+
+    # a snapshot written by another version of carl
+    with open(snapshot_path, 'r+b') as fh:
+        magic, version, digest, table_count = HEADER.unpack(fh.read(HEADER.size))
+        fh.seek(0)
+        fh.write(HEADER.pack(magic, version + 1, digest, table_count))
+    assert Snapshot.open(snapshot_path) is None
+
+
+def test_snapshot_replaced_while_open(snapshot_path: str):
+    snapshot = Snapshot.open(snapshot_path)
+    assert snapshot is not None
+    write_snapshot(snapshot_path, DIGEST, {'fruit': [('apple', 'green')]})
+    # still reading the snapshot as it was when it was opened
+    assert snapshot.get('fruit', 'apple') == 'red'
+    snapshot.close()
+
+
+def completion_tags(swagger_model: SwaggerRepo, index: int, words: List[str]) -> List[str]:
+    return [c.tag for c in swagger_model.get_completions(index, words)]
+
+
+COMPLETION_WORDS = [
+    (1, ['carl', '']),
+    (1, ['carl', 'FAKE.com/{']),
+    (2, ['carl', 'fake.com/has/multiple/methods', '']),
+    (3, ['carl', 'fake.com/posting/stuff', 'POST', '+']),
+    (4, ['carl', 'fake.com/completer', 'DELETE', '+foo', 'f']),
+]
+
+
+def test_swagger_repo_snapshot(content_root: str, cache_dir: str, tmp_path: Path, monkeypatch):
+    open_api_dir = os.path.join(content_root, 'tests', 'resources', 'open_api')
+    spec_file = str(tmp_path / 'openapi-test.yml')
+    shutil.copy(os.path.join(open_api_dir, 'openapi-test.yml'), spec_file)
+    ephemeral_model = SwaggerRepo(files=[spec_file], ephemeral=True)
+
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is not None
+    for index, words in COMPLETION_WORDS:
+        assert completion_tags(swagger_model, index, words) == completion_tags(ephemeral_model, index, words)
+    with monkeypatch.context() as m:
+        m.setenv('CARL_URL_COMPLETION', 'segments')
+        for words in (['carl', ''], ['carl', 'fake.com/'], ['carl', 'http://fake.com/p']):
+            assert completion_tags(swagger_model, 1, words) == completion_tags(ephemeral_model, 1, words)
+    assert swagger_model.cli_args_to_cmd(['fake.com/get', 'POST', '+foo', 'bar'])[0] == \
+        ephemeral_model.cli_args_to_cmd(['fake.com/get', 'POST', '+foo', 'bar'])[0]
+
+    # ... but not when a spec is only touched
+    snapshot_inode = os.stat(get_spec_snapshot_path()).st_ino
+    spec_stat = os.stat(spec_file)
+    os.utime(spec_file, (spec_stat.st_atime + 10, spec_stat.st_mtime + 10))
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is not None
+    assert os.stat(get_spec_snapshot_path()).st_ino == snapshot_inode
+    assert completion_tags(swagger_model, 1, ['carl', '']) == completion_tags(ephemeral_model, 1, ['carl', ''])
+
+    # the snapshot is recompiled when the specs change
+    shutil.copy(os.path.join(open_api_dir, 'openapi-test-2.yml'), spec_file)
+    swagger_model = SwaggerRepo(files=[spec_file])
+    ephemeral_model = SwaggerRepo(files=[spec_file], ephemeral=True)
+    assert completion_tags(swagger_model, 1, ['carl', '']) == completion_tags(ephemeral_model, 1, ['carl', ''])
+
+    # ... or if it was lost
+    os.remove(get_spec_snapshot_path())
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is not None
+    assert completion_tags(swagger_model, 1, ['carl', '']) == completion_tags(ephemeral_model, 1, ['carl', ''])
+
+
+def test_swagger_repo_snapshot_disabled(content_root: str, cache_dir: str, monkeypatch):
+    monkeypatch.setenv('CARL_SPEC_SNAPSHOT', '0')
+    spec_file = os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is None
+    assert not os.path.exists(get_spec_snapshot_path())
+    assert 'fake.com/get' in completion_tags(swagger_model, 1, ['carl', 'fake.com/'])
+
+
+def test_swagger_repo_snapshot_missing_table(content_root: str, cache_dir: str):
+    """ A snapshot compiled before a table was added is recompiled, rather than read as if it had the table """
+    spec_file = os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is not None
+    swagger_model.close_spec_snapshot()
+
+    # what the snapshot looked like before it had completion tables: the digest was only of the fingerprints
+    fingerprints = swagger_model.spec_fingerprints_cache.get_value()
+    old_digest = md5(json.dumps({file: fingerprint.to_obj() for file, fingerprint in fingerprints.items()})
+                     .encode()).digest()
+    snapshot = Snapshot.open(get_spec_snapshot_path())
+    assert snapshot is not None
+    old_tables = {
+        name: list(snapshot.iter_prefix(name, ''))
+        for name in SNAPSHOT_TABLES if name != SNAPSHOT_COMPLETION_TABLES_TABLE
+    }
+    snapshot.close()
+    write_snapshot(get_spec_snapshot_path(), old_digest, old_tables)
+
+    swagger_model = SwaggerRepo(files=[spec_file])
+    assert swagger_model.spec_snapshot is not None
+    endpoint_key = get_endpoint_key('fake.com/posting/stuff', Method.POST)
+    assert swagger_model.spec_snapshot.get(SNAPSHOT_COMPLETION_TABLES_TABLE, endpoint_key) is not None
+    assert '+arg_one' in completion_tags(swagger_model, 3, ['carl', 'fake.com/posting/stuff', 'POST', '+'])
+
+
+def to_completion_table_before_enum_index(table: List[str]) -> List[str]:
+    """ Before enums were indexed, the table had a list of a param's enums where it now has an EnumIndex """
+    old_table = []
+    for entry in table:
+        folded_tag, entry_json = entry.split('\t', 1)
+        tag, description, param_type, enum_index = json.loads(entry_json)
+        enums = [enum for _, enum in enum_index] if enum_index is not None else None
+        old_table.append(folded_tag + '\t' + json.dumps([tag, description, param_type, enums]))
+    return old_table
+
+
+@pytest.mark.parametrize('spec_snapshot', ['0', '1'])
+def test_completion_table_before_enum_index(content_root: str, cache_dir: str, monkeypatch, spec_snapshot: str):
+    """ Completion tables cached before enums were indexed aren't read as if they had the index """
+    monkeypatch.setenv('CARL_SPEC_SNAPSHOT', spec_snapshot)
+    spec_file = os.path.join(content_root, 'tests', 'resources', 'open_api', 'openapi-test.yml')
+    swagger_model = SwaggerRepo(files=[spec_file])
+    words = ['carl', 'fake.com/completer', 'DELETE', '+foo', 'f']
+    assert completion_tags(swagger_model, 4, words) == ['foo1', 'foo2']
+    endpoint_key = get_endpoint_key('fake.com/completer', Method.DELETE)
+
+    # what the cache and the snapshot looked like before
+    old_table = to_completion_table_before_enum_index(swagger_model.get_completion_table('fake.com/completer',
+                                                                                         Method.DELETE))
+    CompletionTableCache('completion_table')['fake.com/completer', Method.DELETE] = old_table
+    if swagger_model.spec_snapshot is not None:
+        snapshot = swagger_model.spec_snapshot
+        old_tables = {name: list(snapshot.iter_prefix(name, '')) for name in SNAPSHOT_TABLES}
+        old_tables[SNAPSHOT_COMPLETION_TABLES_TABLE] = [
+            (key, freeze_index(to_completion_table_before_enum_index(thaw_index(table))))
+            for key, table in old_tables[SNAPSHOT_COMPLETION_TABLES_TABLE]
+        ]
+        assert endpoint_key in dict(old_tables[SNAPSHOT_COMPLETION_TABLES_TABLE])
+        digest = snapshot.digest
+        swagger_model.close_spec_snapshot()
+        write_snapshot(get_spec_snapshot_path(), digest, old_tables)
+        with open(get_spec_snapshot_path(), 'r+b') as fh:
+            magic, version, digest, table_count = HEADER.unpack(fh.read(HEADER.size))
+            fh.seek(0)
+            fh.write(HEADER.pack(magic, version - 1, digest, table_count))
+
+    assert completion_tags(SwaggerRepo(files=[spec_file]), 4, words) == ['foo1', 'foo2']